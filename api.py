@@ -2,51 +2,81 @@ from flask import Flask
 from flask import request, abort
 import json
 import uuid
-from glob import glob
+from collections import defaultdict
 from lib import calc_graph
+from lib import convo_builder
 from lib import convo_fact
+from lib import convo_gain
+from lib import convo_templates
+from lib.barzer.parse_context import ParseContext
+from lib.barzer.fast_path import fast_path
+from config import BarzerSettings, ConvoSettings
 
 
 class ZobotServer(object):
-    def __init__(self, protocols_path='protocols/'):
-        self.protocol_data = {}
+    def __init__(self, protocols_path='protocols/', barzer_svc=None, scheduler=None):
         self.conversations = {}
-
-        for p_name in glob(protocols_path + '*.json'):
-            try:
-                self.protocol_data[p_name.split('/')[-1].split('.')[0]] = json.load(open(p_name))
-                print 'loaded protocol', p_name
-            except Exception, e:
-                print 'can not load protocol', p_name, e
+        # token -> the convo_templates.Template its conversation runs on
+        self.sessions = {}
+        self.barzer_svc = barzer_svc
+        self.scheduler = scheduler or ConvoSettings.SCHEDULER
+        # protocol name -> fact priors learned from its completed conversations
+        self.priors = defaultdict(convo_gain.FactPriors)
+        # protocols compiled on first use and again when their files change,
+        # entity templates shared by all of them
+        self.templates = convo_templates.TemplateStore(
+            protocols_path, pool=convo_builder.FactPool(), interval=ConvoSettings.RELOAD_INTERVAL)
 
     def init_convo(self, protocol_name, external_token=None):
-        if protocol_name in self.protocol_data:
-            if external_token:
-                token = external_token
-            else:
-                token = str(uuid.uuid4())
-            cg = calc_graph.CG(self.protocol_data[protocol_name])
-            self.conversations[token] = cg
-            return token
+        try:
+            template = self.templates.acquire(protocol_name)
+        except KeyError:
+            raise Exception('protocol not found')
+        if external_token:
+            token = external_token
+            self.release(token)
         else:
-            raise Exception('protocol not found') 
+            token = str(uuid.uuid4())
+        cg = calc_graph.CG(template.graph)
+        self.plug_scheduler(cg, protocol_name)
+        self.conversations[token] = cg
+        self.sessions[token] = template
+        return token
+
+    def release(self, token):
+        """ lets go of the template of conversation `token` """
+        template = self.sessions.pop(token, None)
+        if template:
+            self.templates.release(template)
+
+    def plug_scheduler(self, cg, protocol_name):
+        """ puts the configured scheduler into the convo protocols of `cg` """
+        if self.scheduler != 'gain':
+            return
+        for node in cg.nodes.itervalues():
+            if isinstance(node, convo_fact.ConvoProtocol) and node.template.analysis:
+                node.scheduler = convo_gain.GainScheduler(node, self.priors[protocol_name])
 
     def drop_convo(self, token):
         if token in self.conversations:
             del self.conversations[token]
+            self.release(token)
             return 'ok'
         else:
             raise Exception('conversation not found')
 
-    def say(self, token, input=''):
+    def say(self, token, input='', deadline=None):
         if token in self.conversations:
-            value, resp = self.conversations[token].step(input)
+            ctx = ParseContext(
+                input, barzer_svc=self.barzer_svc,
+                deadline=deadline or BarzerSettings.TURN_DEADLINE) if input else input
+            value, resp = self.conversations[token].step(ctx)
             return resp.text
         else:
             raise Exception('conversation not found')
 
     def available_protocols(self):
-        return self.protocol_data.keys()
+        return self.templates.names()
 
 zobot = ZobotServer()
 app = Flask(__name__)
@@ -67,6 +97,16 @@ def login_with_token(protocol, external_token):
     return zobot.init_convo(protocol, external_token)
 
 
+@app.route("/stats/fast_path")
+def fast_path_stats():
+    return json.dumps(fast_path.stats())
+
+
+@app.route("/stats/protocols")
+def protocol_stats():
+    return json.dumps(zobot.templates.stats())
+
+
 @app.route("/convo/<token>/say")
 def say(token):
     # try:
@@ -6,6 +6,84 @@ class BarzerSettings(object):
             'key': 'yTIzlFaf02QBBa3wRNPD2xjeI0R1P1hPHwL3dHtv'
         }
     }
+    # keep-alive connection pool settings (can be overridden per instance)
+    TRANSPORT = {
+        'pool_size': 8,
+        'timeout': 5.0,
+        'gzip': True,
+    }
+    # barzer parse cache - in memory LRU (ttl in seconds) and an optional
+    # sqlite file shared across restarts and worker processes.
+    # failed parses are remembered in memory for `negative_ttl`
+    PARSE_CACHE = {
+        'size': 10000,
+        'ttl': 3600,
+        'path': None,
+        'persistent_ttl': 7 * 24 * 3600,
+        'negative_ttl': 5.0,
+    }
+    # replica routing - an instance with `'replica_of': '<name>'` serves
+    # queries for <name>. hedging sends a duplicate request to the runner up
+    # once the primary runs past its `hedge_percentile` latency. an instance
+    # failing `failure_threshold` times in a row is skipped for `reset_timeout`
+    ROUTING = {
+        'ewma_alpha': 0.2,
+        'window': 256,
+        'max_error_rate': 0.5,
+        'probe_ratio': 0.02,
+        'failure_threshold': 5,
+        'reset_timeout': 10.0,
+        'hedge': False,
+        'hedge_percentile': 95,
+        'hedge_min_delay': 0.01,
+        'hedge_max_delay': 1.0,
+        'workers': 8,
+    }
+    # time budget of a single conversation turn for barzer calls (seconds)
+    TURN_DEADLINE = 3.0
+    # query folding before cache lookup / remote parse
+    # (can be overridden per instance with a `normalize` entry)
+    NORMALIZE = {
+        'unicode_form': 'NFKC',
+        'lower': True,
+        'punctuation': True,
+        'numbers': True,
+        'max_repeat': 2,
+        'aliases': {
+            'yess': 'yes',
+            'yep': 'yes',
+            'yeah': 'yes',
+            'nope': 'no',
+        },
+    }
+    # record mode appends every remote parse to `record`, replay mode serves
+    # parses from a recording (no network), `latency` is seconds per parse
+    # or 'recorded'. see lib/barzer/barzer_replay.py
+    REPLAY = {
+        'record': None,
+        'replay': None,
+        'latency': None,
+    }
+    # local recognizers for answers to numeric, yes/no and string questions
+    # that skip barzer. a string answer is only taken when it is at most
+    # `string_max_tokens` plain words and, there being no entity `dictionary`
+    # here, no entity fact could match it (lib/barzer/fast_path.py)
+    FAST_PATH = {
+        'enabled': True,
+        'yes': ['yes', 'y', 'sure', 'correct', 'right', 'yes please', 'of course'],
+        'no': ['no', 'n', 'not really', 'never', 'no thanks'],
+        'string_max_tokens': 3,
+    }
+
+class ConvoSettings(object):
+    # how conversations pick the next question: 'score' follows the scores
+    # of the facts, 'gain' the highest expected information gain with fact
+    # priors learned from the conversations the server completed (AND/OR
+    # protocols only, see lib/convo_gain.py)
+    SCHEDULER = 'score'
+    # seconds between two looks at the files of a protocol for changes, see
+    # lib/convo_templates.py
+    RELOAD_INTERVAL = 1.0
 
 class RulesSettings(object):
     RULES_STRATEGY = {}
@@ -0,0 +1,53 @@
+# pylint: disable=missing-docstring, invalid-name
+""" non blocking barzer client with single-flight request coalescing
+conversations get a `BarzerFuture` back instead of blocking a thread each.
+a small worker pool talks to barzer and identical in-flight queries
+(the same "yes" from many sessions) share one upstream request
+"""
+from __future__ import absolute_import, division
+from lib.barzer import barzer_objects
+from lib.barzer import barzer_svc
+from lib.barzer.barzer_futures import BarzerFuture, FutureTimeout, SingleFlight, WorkerPool  # pylint: disable=unused-import
+from lib.barzer.barzer_resilience import Deadline
+from lib.barzer.parse_context import ParseContext
+from config import BarzerSettings
+
+
+class AsyncBarzer(object):
+    """ future based front of `lib.barzer.barzer_svc.Barzer`
+    normalization, parse cache and transport are shared with the wrapped client
+    """
+    def __init__(self, barzer=None, workers=None):
+        """
+        Args:
+            barzer (Barzer) - sync client doing the actual work
+            workers (int) - size of the worker pool, defaults to the transport pool size
+        """
+        self.barzer = barzer or barzer_svc.barzer
+        self.pool = WorkerPool(workers or BarzerSettings.TRANSPORT.get('pool_size', 8))
+        self.flight = SingleFlight()
+
+    def close(self):
+        self.pool.close()
+
+    def get_json(self, query, instance=None, deadline=None):
+        """ returns BarzerFuture of the barz dict """
+        instance = self.barzer.resolve_instance(instance)
+        key = self.barzer.normalizers[instance].normalize(query)
+        barz = self.barzer.cache.get(instance, key)
+        if barz is not None:
+            return BarzerFuture.completed(barz)
+
+        return self.flight.do(
+            (key, instance),
+            lambda fut: self.pool.run(fut, self.barzer.fetch_json, key, instance, Deadline.make(deadline), query))
+
+    def get_beads(self, query, instance=None):
+        """ returns BarzerFuture of the bead tuple """
+        return self.get_json(query, instance).then(
+            lambda barz: tuple(barzer_objects.BeadFactory.make_beads_from_barz(barz)))
+
+    def parse(self, text, instance=None):
+        """ returns BarzerFuture of a ready `ParseContext` to be passed to `CG.step` """
+        return self.get_json(text, instance).then(
+            lambda barz: ParseContext(text, barzer_svc=self.barzer, instance=instance, barz=barz))
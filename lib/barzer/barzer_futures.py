@@ -0,0 +1,194 @@
+# pylint: disable=missing-docstring, invalid-name, logging-format-interpolation, broad-except
+""" futures, worker pool and single-flight primitives shared by the barzer clients """
+from __future__ import absolute_import, division
+from collections import Counter
+import heapq
+import logging
+import threading
+import time
+import Queue
+
+
+class FutureTimeout(Exception):
+    """ result not ready within timeout """
+
+
+class BarzerFuture(object):
+    """ minimal thread safe future """
+    def __init__(self):
+        self.event = threading.Event()
+        self.lock = threading.Lock()
+        self.callbacks = []
+        self.value = self.error = None
+
+    @classmethod
+    def completed(cls, value):
+        fut = cls()
+        fut.set_result(value)
+        return fut
+
+    def done(self):
+        return self.event.is_set()
+
+    def _finish(self):
+        with self.lock:
+            self.event.set()
+            callbacks, self.callbacks = self.callbacks, []
+        for fn in callbacks:
+            self._call(fn)
+
+    def _call(self, fn):
+        try:
+            fn(self)
+        except Exception as ex:
+            logging.error('future callback failed: {}'.format(ex))
+
+    def set_result(self, value):
+        self.value = value
+        self._finish()
+
+    def set_exception(self, error):
+        self.error = error
+        self._finish()
+
+    def add_done_callback(self, fn):
+        """ fn(future) is called once the result is ready (immediately if it already is) """
+        with self.lock:
+            if not self.event.is_set():
+                self.callbacks.append(fn)
+                return
+        self._call(fn)
+
+    def result(self, timeout=None):
+        if not self.event.wait(timeout):
+            raise FutureTimeout('barzer result not ready in {}s'.format(timeout))
+        if self.error is not None:
+            raise self.error  # pylint: disable=raising-bad-type
+        return self.value
+
+    def then(self, fn):
+        """ returns a new future holding fn(result) """
+        chained = BarzerFuture()
+
+        def on_done(fut):
+            if fut.error is not None:
+                chained.set_exception(fut.error)
+            else:
+                try:
+                    chained.set_result(fn(fut.value))
+                except Exception as ex:
+                    chained.set_exception(ex)
+        self.add_done_callback(on_done)
+        return chained
+
+
+class SingleFlight(object):
+    """ at most one in-flight call per key, followers share the leader's future """
+    def __init__(self):
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.stats = Counter()
+
+    def do(self, key, submit):
+        """
+        Args:
+            key (hashable)
+            submit (callable) - submit(future) starts the call, invoked for the leader only
+        Returns:
+            BarzerFuture
+        """
+        with self.lock:
+            fut = self.inflight.get(key)
+            if fut is not None:
+                self.stats['coalesced'] += 1
+                return fut
+            fut = self.inflight[key] = BarzerFuture()
+            self.stats['leaders'] += 1
+
+        fut.add_done_callback(lambda _: self.forget(key))
+        submit(fut)
+        return fut
+
+    def forget(self, key):
+        with self.lock:
+            self.inflight.pop(key, None)
+
+
+class WorkerPool(object):
+    """ fixed size pool of daemon threads running submitted calls """
+    def __init__(self, workers=8):
+        self.workers = workers
+        self.queue = Queue.Queue()
+        self.threads = []
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            while len(self.threads) < self.workers:
+                t = threading.Thread(target=self.work)
+                t.daemon = True
+                t.start()
+                self.threads.append(t)
+        return self
+
+    def close(self):
+        with self.lock:
+            for _ in self.threads:
+                self.queue.put(None)
+            self.threads = []
+
+    def work(self):
+        while True:
+            task = self.queue.get()
+            if task is None:
+                return
+            fut, fn, args = task
+            try:
+                fut.set_result(fn(*args))
+            except Exception as ex:
+                fut.set_exception(ex)
+
+    def run(self, fut, fn, *args):
+        """ completes `fut` with fn(*args) on a worker thread """
+        if not self.threads:
+            self.start()
+        self.queue.put((fut, fn, args))
+        return fut
+
+    def submit(self, fn, *args):
+        """ returns BarzerFuture of fn(*args) """
+        return self.run(BarzerFuture(), fn, *args)
+
+
+class DelayedCalls(object):
+    """ single thread running callbacks after a delay (hedge timers and such) """
+    def __init__(self):
+        self.heap = []
+        self.cond = threading.Condition()
+        self.thread = None
+        self.seq = 0
+
+    def schedule(self, delay, fn):
+        """ returns a cancel handle - calling it before the deadline drops the call """
+        cancelled = threading.Event()
+        with self.cond:
+            self.seq += 1
+            heapq.heappush(self.heap, (time.time() + delay, self.seq, fn, cancelled))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.work)
+                self.thread.daemon = True
+                self.thread.start()
+            self.cond.notify()
+        return cancelled.set
+
+    def work(self):
+        while True:
+            with self.cond:
+                while not self.heap or self.heap[0][0] > time.time():
+                    self.cond.wait(self.heap[0][0] - time.time() if self.heap else None)
+                _, _, fn, cancelled = heapq.heappop(self.heap)
+            if not cancelled.is_set():
+                try:
+                    fn()
+                except Exception as ex:
+                    logging.error('delayed call failed: {}'.format(ex))
@@ -11,10 +11,29 @@ _default.default = JSONEncoder().default  # Save unmodified default.
 JSONEncoder.default = _default # replacement
 
 class EntityId(namedtuple('_EntityId', ('eclass', 'subclass', 'id'))):
-    """ barzer entity """
+    """ barzer entity. use `EntityId.make` - the first INTERN_MAX distinct ids
+    are interned so that equal ids are mostly the same object, compare with
+    `==` (which tries `is` first)
+    """
+    __slots__ = ()
+    # tuples can not be weakly referenced, the table is bounded instead. the
+    # entities of the protocols are interned first, when they are compiled
+    INTERN_MAX = 1 << 16
+    interned = {}
+
+    @classmethod
+    def make(cls, eclass, subclass, entid):
+        key = (eclass, subclass, entid)
+        eid = cls.interned.get(key)
+        if eid is None:
+            eid = cls(eclass, subclass, entid)
+            if len(cls.interned) < cls.INTERN_MAX:
+                eid = cls.interned.setdefault(key, eid)
+        return eid
 
 class Bead(object):
     """ bead class  - bead is a single element of structured output """
+    __slots__ = ('origmarkup', 'src')
     type_name = ""
 
     def __init__(self, data=None):
@@ -31,6 +50,7 @@ class Bead(object):
 
 
 class ValueBead(Bead):
+    __slots__ = ('value',)
     type_name = 'number'
 
     def __init__(self, data):
@@ -46,30 +66,37 @@ class ValueBead(Bead):
 
 class Token(ValueBead):
     """ regular token """
+    __slots__ = ()
     type_name = 'token'
 
     def value_str(self):
         return "{}".format(str(self.value))
 
 class Fluff(Token):
+    __slots__ = ()
     type_name = 'fluff'
 
 
 class Punct(Token):
+    __slots__ = ()
     type_name = 'punct'
 
 
 class Number(ValueBead):
+    __slots__ = ()
     type_name = 'number'
 
 class EntityBase(Bead):
     """ parent type for entity based types Entity, ERC, EVR """
+    __slots__ = ()
+
+    def ent_id(self):
+        """ EntityId of the main entity, the Entity in `ent` of EVR and ERC """
+        return self.ent.ent_id()  # pylint: disable=no-member
+
     def match_ent(self, ent):
         """ given another entbase object compares the main entity """
-        return (
-            self.eclass == ent.eclass and  # pylint: disable=no-member
-            self.subclass == self.subclass and  # pylint: disable=no-member
-            self.id == ent.id)  # pylint: disable=no-member
+        return self.ent_id() == ent.ent_id()
 
     @classmethod
     def match_by_template(cls, ent_bead, eclass, subclass, entid):
@@ -86,6 +113,9 @@ class EntityBase(Bead):
         return not entid or entid == ent_bead.id
 
 class Entity(EntityBase):
+    __slots__ = ('eclass', 'subclass', 'id', 'name', 'scope', 'category', 'relevance', '_ent_id')
+    type_name = 'entity'
+
     def __init__(self, data=None):
         """
         Arguments:
@@ -102,6 +132,7 @@ class Entity(EntityBase):
             self.relevance = data.get('rel', 0)
         else:
             self.eclass = self.subclass = self.id = self.name = self.scope = self.category = self.relevance = None # pylint: disable=line-too-long
+        self._ent_id = None
 
     def match_template(self, eclass, subclass, entid):
         return self.match_by_template(self, eclass, subclass, entid)
@@ -127,9 +158,12 @@ class Entity(EntityBase):
         return ret
 
     def ent_id(self):
-        return EntityId(self.eclass, self.subclass, self.id)
+        if self._ent_id is None:
+            self._ent_id = EntityId.make(self.eclass, self.subclass, self.id)
+        return self._ent_id
 
 class Range(Bead):
+    __slots__ = ('rangetype', 'order', 'lo', 'hi')
     type_name = "range"
 
     def __init__(self, data=None):
@@ -179,40 +213,45 @@ class Range(Bead):
             return (pair[0] + pair[1]) / 2
 
 class EVR(EntityBase):
-    """ entity value range """
+    """ entity value range. `values` are decoded on first access """
+    __slots__ = ('ent', 'raw_values', '_values')
     type_name = "evr"
 
     def __init__(self, data=None):
         super(EVR, self).__init__(data)
+        self._values = None
         if data:
-            self.ent = Entity(data['ent'])
-            self.values = [
-                BeadFactory.make_bead_from_dict(x) for x in data.get('values', [])]
+            self.ent = Entity(data.get('ent'))
+            self.raw_values = data.get('values') or ()
         else:
-            self.ent = self.values = None
+            self.ent = self.raw_values = None
+
+    @property
+    def values(self):
+        if self._values is None and self.raw_values is not None:
+            self._values = [
+                x for x in (BeadFactory.make_bead_from_dict(v) for v in self.raw_values) if x is not None]
+        return self._values
 
     def match_template(self, eclass, subclass, entid):
         return self.match_by_template(self.ent, eclass, subclass, entid)
 
     @property
     def eclass(self):
-        return self.ent
+        return self.ent.eclass
 
     @property
     def subclass(self):
-        return self.subclass
+        return self.ent.subclass
 
     @property
     def id(self):
-        return self.id
+        return self.ent.id
 
     def __str__(self):
         return '{}:({} [{}])'.format(
             self.type_name, str(self.ent), ','.join(str(x) for x in self.values))
 
-    def ent_id(self):
-        return self.ent.id
-
     def iterate_type(self, the_type=Number):
         """ yields all values of type the_type.
         NOTE: the_type can also be a tuple
@@ -223,12 +262,13 @@ class EVR(EntityBase):
 
 
 class ERC(EntityBase):
-    type_name = "erc"
     """ entity range combo """
+    __slots__ = ('ent', 'range')
+    type_name = "erc"
     def __init__(self, data=None):
         super(ERC, self).__init__(data)
         if data:
-            self.ent = Entity(data['ent'])
+            self.ent = Entity(data.get('ent'))
             self.range = Range(data.get('range'))
         else:
             self.ent = self.range = None
@@ -236,9 +276,6 @@ class ERC(EntityBase):
     def __str__(self):
         return '{}:({}{})'.format(self.type_name, str(self.ent), self.range)
 
-    def ent_id(self):
-        return self.ent.ent_id()
-
     def match_template(self, eclass, subclass, entid):
         return self.match_by_template(self.ent, eclass, subclass, entid)
 
@@ -261,24 +298,31 @@ class ERC(EntityBase):
         }
 
 class Time(ValueBead):
-    type_name = "time"
     """ time of day """
+    __slots__ = ()
+    type_name = "time"
 
 
 class Timestamp(Bead):
-    type_name = "timestamp"
     """ """
+    __slots__ = ('date', 'time')
+    type_name = "timestamp"
     def __init__(self, data):
         super(Timestamp, self).__init__(data)
-        self.date, self.time = data['date'], data['time']
+        self.date, self.time = data.get('date'), data.get('time')
 
     def __str__(self):
         return '{}:{} {}'.format(self.type_name, self.date, self.time)
 
 
 class Date(ValueBead):
-    type_name = "date"
     """ """
+    __slots__ = ()
+    type_name = "date"
+
+
+def decode_entlist(data):
+    return [Entity(x) for x in data.get('data') or ()]
 
 
 class BeadFactory(object):
@@ -294,31 +338,135 @@ class BeadFactory(object):
         'erc': ERC,
         'evr': EVR,
     }
+    # type name -> decoder(data), constructors are tolerant to missing fields
+    DECODERS = dict(NAME_TYPE, entlist=decode_entlist)
+    # value beads are shared between parses - at most SHARED_MAX distinct ones
+    # (same type, value, src and markup) are kept. shared beads must not be modified
+    SHARED_TYPES = frozenset(['token', 'fluff', 'punct', 'number'])
+    SHARED_MAX = 4096
+    shared = {}
+    type_names = {}
 
     @classmethod
     def make_beads_from_barz(cls, barz):
-        result = list()
-        for x in barz.get('beads'):
-            b = cls.make_bead_from_dict(x)
-            if b:
-                result.append(b)
-        return result
+        return list(cls.make_lazy_beads(barz))
+
+    @classmethod
+    def make_lazy_beads(cls, barz):
+        """ returns LazyBeads - beads are decoded when accessed """
+        if 'error' in barz:
+            logging.warning('make_beads_from_barz: {}'.format(barz['error']))
+        return LazyBeads(barz.get('beads') or ())
 
     @classmethod
     def get_type_by_name(cls, name):
         return cls.NAME_TYPE.get(name)
 
+    @classmethod
+    def names_for(cls, types):
+        """ bead type names decoding into a subclass of `types` (class or tuple) """
+        names = cls.type_names.get(types)
+        if names is None:
+            names = cls.type_names[types] = frozenset(
+                k for k, v in cls.NAME_TYPE.iteritems() if issubclass(v, types))
+        return names
+
     @classmethod
     def make_bead_from_dict(cls, data, default_type=None):
         the_type = data.get('type', default_type)
-        if the_type == 'entlist':
-            return [Entity(x) for x in data['data']]
-
-        bead_type = cls.NAME_TYPE.get(the_type)
-        if bead_type:
-            try:
-                return bead_type(data)
-            except Exception as ex:
-                logging.warning('make_bead_from_dict:' + str(ex))
-        else:
+        key = None
+        if the_type in cls.SHARED_TYPES:
+            value = data.get('value')
+            if isinstance(value, (basestring, int, long, float)):
+                key = (the_type, type(value), value, data.get('src'), data.get('origmarkup'))
+                bead = cls.shared.get(key)
+                if bead is not None:
+                    return bead
+
+        decoder = cls.DECODERS.get(the_type)
+        if decoder is None:
             logging.warning('make_bead_from_dict {}'.format(the_type))
+            return None
+        bead = decoder(data)
+        if key is not None and len(cls.shared) < cls.SHARED_MAX:
+            cls.shared[key] = bead
+        return bead
+
+
+_PENDING = object()
+
+
+class LazyBeads(object):
+    """ immutable bead sequence of one barz, each bead is decoded on first
+    access. `of_type` and `type_names` look at the raw type names so beads
+    of other types are never decoded. beads of unknown types are left out
+    """
+    __slots__ = ('raw', 'beads')
+
+    def __init__(self, raw_beads):
+        decoders = BeadFactory.DECODERS
+        self.raw = [x for x in raw_beads if x.get('type') in decoders]
+        if len(self.raw) != len(raw_beads):
+            for x in raw_beads:
+                if x.get('type') not in decoders:
+                    logging.warning('make_bead_from_dict {}'.format(x.get('type')))
+        self.beads = [_PENDING] * len(self.raw)
+
+    def bead(self, i):
+        """ decoded bead at position `i` """
+        b = self.beads[i]
+        if b is _PENDING:
+            b = self.beads[i] = BeadFactory.make_bead_from_dict(self.raw[i])
+        return b
+
+    def __len__(self):
+        return len(self.raw)
+
+    def __nonzero__(self):
+        return bool(self.raw)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.bead(j) for j in xrange(*i.indices(len(self.raw)))]
+        return self.bead(i + len(self.raw) if i < 0 else i)
+
+    def __iter__(self):
+        for i in xrange(len(self.raw)):
+            yield self.bead(i)
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def __eq__(self, other):
+        try:
+            return tuple(self) == tuple(other)
+        except TypeError:
+            return False
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def type_names(self):
+        return [x.get('type') for x in self.raw]
+
+    def of_type(self, types):
+        """ yields decoded beads that are instances of `types` (class or tuple) """
+        names = BeadFactory.names_for(types)
+        for i, x in enumerate(self.raw):
+            if x.get('type') in names:
+                yield self.bead(i)
+
+    def decoded(self):
+        """ number of beads decoded so far """
+        return sum(1 for b in self.beads if b is not _PENDING)
+
+
+def beads_of_type(beads, types):
+    """ beads that are instances of `types`, all beads when `types` is None """
+    if types is None:
+        return iter(beads)
+    if isinstance(beads, LazyBeads):
+        return beads.of_type(types)
+    return (x for x in beads if isinstance(x, types))
@@ -0,0 +1,134 @@
+# pylint: disable=missing-docstring, invalid-name, logging-format-interpolation
+""" record/replay of barzer responses
+
+`ResponseRecorder` appends every (instance, query) -> json response to an
+append-only file, `ReplayStore` memory maps such a file and serves the
+responses back with optional injected latency. a record is
+
+    <key length:uint32><body length:uint32><latency:float32><key><body>
+
+with key = instance + '\\0' + normalized query. later records of the same
+key win. a torn record at the end of the file (crash while recording) is
+ignored
+"""
+from __future__ import absolute_import, division
+from collections import Counter
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+from lib.barzer.barzer_resilience import make_error
+
+MAGIC = 'BZRR1\n'
+HEADER = struct.Struct('<IIf')
+
+
+def make_key(instance, query):
+    if isinstance(query, unicode):
+        query = query.encode('utf-8')
+    return '{}\0{}'.format(instance, query)
+
+
+class ResponseRecorder(object):
+    """ thread safe append-only response log """
+    def __init__(self, path):
+        self.path = path
+        self.fp = open(path, 'ab')
+        if self.fp.tell() == 0:
+            self.fp.write(MAGIC)
+        self.lock = threading.Lock()
+        self.count = 0
+
+    def record(self, instance, query, body, latency=0.0):
+        """
+        Args:
+            body (str|dict) - raw json response, dicts are serialized compactly
+            latency (float) - seconds the remote parse took
+        """
+        if not isinstance(body, str):
+            body = json.dumps(body, separators=(',', ':'))
+        key = make_key(instance, query)
+        with self.lock:
+            self.fp.write(HEADER.pack(len(key), len(body), latency) + key + body)
+            self.fp.flush()
+            self.count += 1
+
+    def close(self):
+        with self.lock:
+            self.fp.close()
+
+
+class ReplayStore(object):
+    """ indexed, memory mapped view of a recorded response file """
+    def __init__(self, path, latency=None, sleep=time.sleep):
+        """
+        Args:
+            path (str) - file written by ResponseRecorder
+            latency (float|str) - seconds added to every response,
+                'recorded' replays the recorded latency, None for full speed
+        """
+        self.path = path
+        self.latency = latency
+        self.sleep = sleep
+        self.index = {}
+        self.stats = Counter()
+        self.fp = open(path, 'rb')
+        size = os.fstat(self.fp.fileno()).st_size
+        self.mm = mmap.mmap(self.fp.fileno(), 0, access=mmap.ACCESS_READ) if size else ''
+        if size and self.mm[:len(MAGIC)] != MAGIC:
+            raise ValueError('{} is not a barzer recording'.format(path))
+        self.build_index(size)
+
+    def build_index(self, size):
+        pos = len(MAGIC)
+        while pos + HEADER.size <= size:
+            key_len, body_len, latency = HEADER.unpack_from(self.mm, pos)
+            start = pos + HEADER.size
+            end = start + key_len + body_len
+            if end > size:
+                logging.warning('replay {}: torn record at {}'.format(self.path, pos))
+                break
+            self.index[self.mm[start:start + key_len]] = (start + key_len, body_len, latency)
+            pos = end
+        logging.info('replay {}: {} responses'.format(self.path, len(self.index)))
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, key):
+        return make_key(*key) in self.index
+
+    def get_raw(self, instance, query):
+        """ (json body, recorded latency) or None """
+        entry = self.index.get(make_key(instance, query))
+        if entry is None:
+            return None
+        offset, length, latency = entry
+        return self.mm[offset:offset + length], latency
+
+    def fetch(self, query, instance, deadline=None):
+        """ barz dict for a recorded query, an error of type `replay` otherwise """
+        found = self.get_raw(instance, query)
+        if found is None:
+            self.stats['misses'] += 1
+            return make_error('{!r} not recorded for {}'.format(query, instance), 'replay')
+        body, recorded_latency = found
+        latency = recorded_latency if self.latency == 'recorded' else self.latency
+        if latency:
+            if deadline is not None:
+                latency = deadline.cap(latency)
+            self.sleep(latency)
+            if deadline is not None and deadline.expired():
+                self.stats['deadline'] += 1
+                return make_error('deadline exceeded replaying {}'.format(instance), 'deadline')
+        self.stats['hits'] += 1
+        return json.loads(body)
+
+    def close(self):
+        if self.mm:
+            self.mm.close()
+        self.fp.close()
@@ -0,0 +1,100 @@
+# pylint: disable=missing-docstring, invalid-name
+""" per turn deadlines and circuit breakers for barzer calls """
+from __future__ import absolute_import, division
+import threading
+import time
+
+
+def make_error(message, error_type='transport'):
+    """ barzer error response, `error_type` tells callers (and the negative cache) what failed """
+    return {'error': message, 'error_type': error_type}
+
+
+class Deadline(object):
+    """ absolute point in time a turn has to be answered by """
+    def __init__(self, timeout=None, clock=time.time):
+        """
+        Args:
+            timeout (float) - seconds from now, None for no deadline
+        """
+        self.clock = clock
+        self.expires = clock() + timeout if timeout is not None else None
+
+    @classmethod
+    def make(cls, deadline):
+        """ accepts a Deadline, seconds or None """
+        if deadline is None or isinstance(deadline, cls):
+            return deadline
+        return cls(deadline)
+
+    def remaining(self):
+        """ seconds left (never negative), None when unbounded """
+        if self.expires is None:
+            return None
+        return max(0.0, self.expires - self.clock())
+
+    def expired(self):
+        return self.expires is not None and self.clock() >= self.expires
+
+    def cap(self, timeout):
+        """ the smaller of `timeout` and the time left """
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def __str__(self):
+        return 'deadline(remaining={})'.format(self.remaining())
+
+
+class CircuitBreaker(object):
+    """ closed -> open after `failure_threshold` consecutive failures,
+    open -> half open after `reset_timeout`, where a single trial request
+    decides between closed and open again
+    """
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=10.0, clock=time.time):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    def __str__(self):
+        return '{} failures={}'.format(self.state, self.failures)
+
+    def allow(self):
+        """ True when a request may be sent now """
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self.trial_running = False
+            if self.state == self.HALF_OPEN and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def is_open(self):
+        with self.lock:
+            return self.state == self.OPEN and self.clock() - self.opened_at < self.reset_timeout
+
+    def release(self):
+        """ the granted request ended without telling anything about the instance """
+        with self.lock:
+            self.trial_running = False
+
+    def record(self, ok):
+        with self.lock:
+            if ok:
+                self.state, self.failures = self.CLOSED, 0
+                return
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state, self.opened_at = self.OPEN, self.clock()
+            self.trial_running = False
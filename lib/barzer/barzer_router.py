@@ -0,0 +1,211 @@
+# pylint: disable=missing-docstring, invalid-name, logging-format-interpolation, broad-except
+""" latency aware routing, circuit breaking and hedged requests across barzer replicas
+an instance declares itself a replica with `'replica_of': '<instance>'` in
+BarzerSettings.BARZER_INSTANCES. queries for an instance are sent to the
+fastest healthy member of its replica group, optionally hedged by a
+duplicate request to the runner up once the primary runs past its p95
+"""
+from __future__ import absolute_import, division
+from collections import Counter, deque
+import logging
+import random
+import threading
+import time
+
+from lib.barzer.barzer_futures import BarzerFuture, DelayedCalls, FutureTimeout, WorkerPool
+from lib.barzer.barzer_resilience import CircuitBreaker, make_error
+from config import BarzerSettings
+
+
+def is_error(barz):
+    return not isinstance(barz, dict) or 'error' in barz
+
+
+class InstanceHealth(object):
+    """ EWMA latency/error rate and a sliding latency window of one instance """
+    def __init__(self, name, alpha=0.2, window=256):
+        self.name = name
+        self.alpha = alpha
+        self.latency = None
+        self.error_rate = 0.0
+        self.samples = deque(maxlen=window)
+        self.stats = Counter()
+        self.lock = threading.Lock()
+
+    def __str__(self):
+        return '{} latency={} error_rate={:.3f} {}'.format(
+            self.name, self.latency, self.error_rate, dict(self.stats))
+
+    def record(self, latency, ok=True):
+        with self.lock:
+            self.stats['requests'] += 1
+            self.error_rate += self.alpha * ((0.0 if ok else 1.0) - self.error_rate)
+            if ok:
+                self.latency = latency if self.latency is None else (
+                    self.latency + self.alpha * (latency - self.latency))
+                self.samples.append(latency)
+            else:
+                self.stats['errors'] += 1
+
+    def percentile(self, p):
+        with self.lock:
+            samples = sorted(self.samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * p / 100.0))]
+
+    def is_healthy(self, max_error_rate):
+        return self.error_rate < max_error_rate
+
+    def score(self, error_penalty=10.0):
+        """ expected latency in seconds penalized by the error rate.
+        instances without history go first so they get measured
+        """
+        latency = self.latency or 0.0
+        return latency * (1.0 + error_penalty * self.error_rate) + self.error_rate
+
+
+class BarzerRouter(object):
+    """ picks the replica to query and optionally hedges slow requests """
+    def __init__(self, instances=None, settings=None, clock=time.time):
+        """
+        Args:
+            instances (dict) - instance configs, defaults to BarzerSettings.BARZER_INSTANCES
+            settings (dict) - overrides of BarzerSettings.ROUTING
+        """
+        self.instances = instances or BarzerSettings.BARZER_INSTANCES
+        self.settings = dict(BarzerSettings.ROUTING)
+        self.settings.update(settings or {})
+        self.clock = clock
+        self.health = {
+            k: InstanceHealth(k, alpha=self.settings['ewma_alpha'], window=self.settings['window'])
+            for k in self.instances}
+        self.breakers = {
+            k: CircuitBreaker(self.settings['failure_threshold'], self.settings['reset_timeout'], clock=clock)
+            for k in self.instances}
+        self.groups = {k: [k] for k in self.instances}
+        for k, v in sorted(self.instances.iteritems()):
+            primary = v.get('replica_of')
+            if primary in self.groups and primary != k:
+                self.groups[primary].append(k)
+        # threads start on the first hedged fetch
+        self.pool = WorkerPool(self.settings['workers'])
+        self.timers = DelayedCalls()
+        self.stats = Counter()
+
+    def candidates(self, instance):
+        """ replica group of `instance`, healthy ones first, fastest first.
+        replicas with an open circuit are left out. a small share of
+        queries probes a random replica so that stale latency/error
+        estimates get refreshed
+        """
+        group = [k for k in self.groups.get(instance, [instance]) if not self.breakers[k].is_open()]
+        max_error_rate = self.settings['max_error_rate']
+        order = sorted(group, key=lambda k: (
+            not self.health[k].is_healthy(max_error_rate), self.health[k].score()))
+        if len(order) > 1 and random.random() < self.settings['probe_ratio']:
+            self.stats['probes'] += 1
+            probe = random.randrange(1, len(order))
+            order.insert(0, order.pop(probe))
+        return order
+
+    def timed_fetch(self, fetch, query, instance, deadline=None):
+        if deadline is not None and deadline.expired():
+            return make_error('deadline exceeded before querying {}'.format(instance), 'deadline')
+        if not self.breakers[instance].allow():
+            self.stats['circuit_open'] += 1
+            return make_error('circuit open for {}'.format(instance), 'circuit_open')
+
+        start = self.clock()
+        try:
+            barz = fetch(query, instance, deadline)
+        except Exception as ex:
+            barz = make_error('barzer {} failed: {}'.format(instance, ex))
+
+        ok = not is_error(barz)
+        if not ok and deadline is not None and deadline.expired():
+            # out of turn budget - says nothing about the instance health
+            barz['error_type'] = 'deadline'
+            self.breakers[instance].release()
+            return barz
+        self.health[instance].record(self.clock() - start, ok=ok)
+        self.breakers[instance].record(ok)
+        return barz
+
+    def hedge_delay(self, instance):
+        delay = self.health[instance].percentile(self.settings['hedge_percentile'])
+        if delay is None:
+            delay = self.settings['hedge_max_delay']
+        return min(max(delay, self.settings['hedge_min_delay']), self.settings['hedge_max_delay'])
+
+    def fetch(self, instance, query, fetch, deadline=None):
+        """ routes a query
+        Args:
+            instance (str) - logical instance
+            query (str) - normalized query
+            fetch (callable) - fetch(query, physical_instance, deadline) returning barz dict
+            deadline (Deadline) - optional turn deadline
+        Returns:
+            barz dict (with `error` when every replica failed)
+        """
+        order = self.candidates(instance)
+        if not order:
+            self.stats['circuit_open'] += 1
+            return make_error('circuit open for every replica of {}'.format(instance), 'circuit_open')
+        if self.settings['hedge'] and len(order) > 1:
+            return self.hedged_fetch(order, query, fetch, deadline)
+
+        barz = None
+        for k in order:
+            barz = self.timed_fetch(fetch, query, k, deadline)
+            if not is_error(barz) or barz.get('error_type') == 'deadline':
+                return barz
+            self.stats['failovers'] += 1
+        return barz
+
+    def hedged_fetch(self, order, query, fetch, deadline=None):
+        """ primary first, a duplicate to the runner up once the primary passes its p95 """
+        primary, secondary = order[0], order[1]
+        winner = BarzerFuture()
+        lock = threading.Lock()
+        pending = [1]
+        hedge_launched = []
+
+        def on_done(fut):
+            with lock:
+                pending[0] -= 1
+                if not winner.done() and (not is_error(fut.value) or pending[0] == 0):
+                    winner.set_result((fut, fut.value))
+
+        def hedge():
+            with lock:
+                if winner.done():
+                    return
+                pending[0] += 1
+                self.stats['hedged'] += 1
+                hedge_launched.append(self.pool.submit(self.timed_fetch, fetch, query, secondary, deadline))
+            hedge_launched[0].add_done_callback(on_done)
+
+        self.pool.submit(self.timed_fetch, fetch, query, primary, deadline).add_done_callback(on_done)
+        cancel = self.timers.schedule(self.hedge_delay(primary), hedge)
+        try:
+            source, barz = winner.result(deadline.remaining() if deadline is not None else None)
+        except FutureTimeout:
+            return make_error('deadline exceeded waiting for {}'.format(primary), 'deadline')
+        finally:
+            cancel()
+
+        if hedge_launched and source is hedge_launched[0]:
+            self.stats['hedge_wins'] += 1
+        elif is_error(barz) and not hedge_launched and barz.get('error_type') != 'deadline':
+            # primary failed before the hedge fired - plain failover
+            self.stats['failovers'] += 1
+            barz = self.timed_fetch(fetch, query, secondary, deadline)
+        return barz
+
+    def report(self):
+        for k in sorted(self.health):
+            logging.info('barzer router {}'.format(self.health[k]))
+        return {
+            k: dict(v.stats, latency=v.latency, error_rate=v.error_rate, circuit=self.breakers[k].state)
+            for k, v in self.health.iteritems()}
@@ -1,10 +1,18 @@
 # pylint: disable=missing-docstring, logging-format-interpolation, invalid-name
 from __future__ import absolute_import, division
+from collections import Counter
 import urllib
 import json
 import logging
-from pylru import lrudecorator
+import threading
+import time
 from lib.barzer import barzer_objects
+from lib.barzer.barzer_replay import ReplayStore, ResponseRecorder
+from lib.barzer.barzer_resilience import Deadline, make_error
+from lib.barzer.barzer_router import BarzerRouter, is_error
+from lib.barzer.barzer_transport import BarzerTransport, TransportError
+from lib.barzer.parse_cache import ParseCache
+from lib.barzer.query_normalizer import QueryNormalizer, raw_text
 
 from config import BarzerSettings
 
@@ -15,11 +23,53 @@ class BarzerError(Exception):
 
 class Barzer(object):
     """ entity extraction layer """
-    def __init__(self, cache_size=10):
+    def __init__(
+            self, cache_size=None, instances=None, transport=None, cache=None, router=None,
+            recorder=None, replay=None
+    ):
+        """
+        Args:
+            cache_size (int) - optional memory tier size overriding BarzerSettings.PARSE_CACHE
+            instances (dict) - instance configs, defaults to BarzerSettings.BARZER_INSTANCES
+            transport (BarzerTransport) - pooled http transport
+            cache (ParseCache) - parse cache, defaults to one built from BarzerSettings.PARSE_CACHE
+            router (BarzerRouter) - replica routing, defaults to one built from BarzerSettings.ROUTING
+            recorder (ResponseRecorder) - records remote parses, defaults to BarzerSettings.REPLAY['record']
+            replay (ReplayStore) - serves parses from a recording instead of barzer,
+                defaults to BarzerSettings.REPLAY['replay']
+        """
         def make_instance_url(url, key):
             return '{}?key={}'.format(url, key)
 
-        self.url = {k: make_instance_url(v['url'], v['key']) for k, v in BarzerSettings.BARZER_INSTANCES.iteritems()}
+        self.instances = instances or BarzerSettings.BARZER_INSTANCES
+        self.url = {k: make_instance_url(v['url'], v['key']) for k, v in self.instances.iteritems()}
+        self.transport = transport or BarzerTransport(self.instances)
+        self.cache = cache if cache is not None else ParseCache.from_settings(size=cache_size)
+        self.router = router or BarzerRouter(self.instances)
+        self.normalizers = {k: QueryNormalizer.from_settings(v) for k, v in self.instances.iteritems()}
+        settings = BarzerSettings.REPLAY
+        if recorder is None and settings.get('record'):
+            recorder = ResponseRecorder(settings['record'])
+        if replay is None and settings.get('replay'):
+            replay = ReplayStore(settings['replay'], latency=settings.get('latency'))
+        self.recorder = recorder
+        self.replay = replay
+        self.stats = Counter()
+        self.stats_lock = threading.Lock()
+
+    def count(self, name, value=1):
+        with self.stats_lock:
+            self.stats[name] += value
+
+    def resolve_instance(self, instance=None):
+        """ returns a valid instance id falling back to `default` """
+        instance = instance or 'default'
+        if instance not in self.url:
+            logging.error('invalid barzer instance {} passed'.format(instance))
+            if 'default' not in self.url:
+                raise BarzerError('no instances found')
+            instance = 'default'
+        return instance
 
     def get_url(self, query, instance=None):
         """
@@ -27,29 +77,56 @@ class Barzer(object):
             query (string) - text ofthe query
             instance (string) - id of the instance
         """
-        instance = instance or 'default'
-        prefix_url = self.url.get(instance)
-        if not prefix_url:
-            logging.error('invalid barzer instance {} passed'.format(instance))
-            if prefix_url != 'default':
-                prefix_url = self.url['default']
-            else:
-                raise BarzerError('no instances found')
-
+        prefix_url = self.url[self.resolve_instance(instance)]
         return '{}&query={}'.format(prefix_url, urllib.quote(query))
 
-    def get_json(self, query, instance=None):
+    def normalize(self, query, instance=None):
+        return self.normalizers[self.resolve_instance(instance)].normalize(query)
+
+    def get_json(self, query, instance=None, deadline=None):
+        """
+        Args:
+            query (str) - raw user input
+            instance (str) - instance id
+            deadline (Deadline|float) - optional time budget
+        Returns:
+            barz dict, on failure a dict with `error` and `error_type`
+        """
+        instance = self.resolve_instance(instance)
+        return self.fetch_json(
+            self.normalizers[instance].normalize(query), instance, Deadline.make(deadline), text=query)
+
+    def fetch_json(self, query, instance, deadline=None, text=None):
+        """ cache lookup and remote parse of an already normalized query
+        Args:
+            query (str) - normalized query, the cache and recording key
+            text (str) - raw query sent to barzer, `query` if None
+        """
+        barz = self.cache.get(instance, query)
+        if barz is None:
+            if self.replay is not None:
+                barz = self.replay.fetch(query, instance, deadline)
+            else:
+                start = time.time()
+                barz = self.router.fetch(instance, raw_text(text) or query, self.get_remote_json, deadline)
+                if self.recorder is not None and not is_error(barz):
+                    self.recorder.record(instance, query, barz, time.time() - start)
+            self.cache.put(instance, query, barz)
+        return barz
+
+    def get_remote_json(self, query, instance, deadline=None):
         url = self.get_url(query=query, instance=instance)
+        self.count('remote_parses')
         try:
-            response = urllib.urlopen(url)
-        except Exception as ex:  # pylint: disable=broad-except
-            return {'error': 'request {} failed with error: {}'.format(url,
-                                                                       str(ex))}
-        return json.loads(response.read())
-
-    @lrudecorator(100)
-    def get_beads(self, query, instance=None):
-        data = self.get_json(query, instance)
+            response = self.transport.get(
+                instance, url, timeout=deadline.remaining() if deadline is not None else None)
+        except TransportError as ex:
+            self.count('remote_errors')
+            return make_error('request {} failed with error: {}'.format(url, str(ex)))
+        return json.loads(response)
+
+    def get_beads(self, query, instance=None, deadline=None):
+        data = self.get_json(query, instance, deadline)
         return barzer_objects.BeadFactory.make_beads_from_barz(data)
 
 barzer = Barzer()
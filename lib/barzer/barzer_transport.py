@@ -0,0 +1,195 @@
+# pylint: disable=missing-docstring, invalid-name, logging-format-interpolation
+""" pooled keep-alive http transport for barzer instances """
+from __future__ import absolute_import, division
+from collections import Counter
+import httplib
+import logging
+import socket
+import threading
+import zlib
+import Queue
+import urlparse
+
+from config import BarzerSettings
+
+
+class TransportError(Exception):
+    """ barzer transport failure (connection, timeout, bad status) """
+
+
+class HTTPConnectionPool(object):
+    """ keep-alive connection pool for a single barzer host
+    connections are reused LIFO so that the hottest connection is
+    picked first and idle ones can time out on the server side
+    """
+    DEFAULT_POOL_SIZE = 8
+    DEFAULT_TIMEOUT = 5.0
+
+    def __init__(self, url, pool_size=None, timeout=None, use_gzip=True):
+        """
+        Args:
+            url (str) - any url on the target host, only scheme/host/port are used
+            pool_size (int) - max number of idle connections kept open
+            timeout (float) - connect/read timeout in seconds
+            use_gzip (bool) - when true asks barzer for gzipped responses
+        """
+        parsed = urlparse.urlsplit(url)
+        self.scheme = parsed.scheme or 'http'
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.pool_size = pool_size or self.DEFAULT_POOL_SIZE
+        self.timeout = timeout or self.DEFAULT_TIMEOUT
+        self.use_gzip = use_gzip
+        self.idle = Queue.LifoQueue(self.pool_size)
+        self.stats = Counter()
+        self.lock = threading.Lock()
+
+    def __str__(self):
+        return '{}://{}:{} {}'.format(self.scheme, self.host, self.port, dict(self.stats))
+
+    def new_connection(self):
+        conn_type = httplib.HTTPSConnection if self.scheme == 'https' else httplib.HTTPConnection
+        with self.lock:
+            self.stats['connections'] += 1
+        return conn_type(self.host, self.port, timeout=self.timeout)
+
+    def get_connection(self):
+        """ returns (connection, is_reused) """
+        try:
+            return self.idle.get_nowait(), True
+        except Queue.Empty:
+            return self.new_connection(), False
+
+    def put_connection(self, conn):
+        try:
+            self.idle.put_nowait(conn)
+        except Queue.Full:
+            conn.close()
+
+    def headers(self):
+        headers = {'Connection': 'keep-alive'}
+        if self.use_gzip:
+            headers['Accept-Encoding'] = 'gzip'
+        return headers
+
+    def _request(self, conn, path, timeout):
+        if timeout is not None:
+            conn.timeout = timeout
+            if conn.sock:
+                conn.sock.settimeout(timeout)
+        conn.request('GET', path, headers=self.headers())
+        response = conn.getresponse()
+        body = response.read()
+        if response.getheader('content-encoding', '') == 'gzip':
+            body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+            with self.lock:
+                self.stats['gzip'] += 1
+        return response, body
+
+    def request(self, path, timeout=None):
+        """ performs GET on `path` (path + query string)
+        Args:
+            path (str)
+            timeout (float) - optional per request timeout, capped by the pool one
+        Returns:
+            response body (str)
+        Raises:
+            TransportError
+        """
+        if timeout is not None:
+            timeout = min(timeout, self.timeout)
+        while True:
+            conn, is_reused = self.get_connection()
+            try:
+                response, body = self._request(conn, path, timeout)
+            except (httplib.HTTPException, socket.error) as ex:
+                conn.close()
+                if is_reused and not isinstance(ex, socket.timeout):
+                    # server dropped an idle keep-alive connection - retry on a fresh one
+                    with self.lock:
+                        self.stats['stale'] += 1
+                    continue
+                with self.lock:
+                    self.stats['errors'] += 1
+                raise TransportError('{}://{} {}'.format(self.scheme, self.host, ex))
+
+            with self.lock:
+                self.stats['requests'] += 1
+                if is_reused:
+                    self.stats['reused'] += 1
+
+            if response.will_close:
+                conn.close()
+            else:
+                # a per request timeout must not stay on the pooled socket
+                conn.timeout = self.timeout
+                if conn.sock:
+                    conn.sock.settimeout(self.timeout)
+                self.put_connection(conn)
+
+            if response.status != httplib.OK:
+                raise TransportError('{}://{} status {}'.format(self.scheme, self.host, response.status))
+            return body
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except Queue.Empty:
+                return
+
+
+class BarzerTransport(object):
+    """ one keep-alive pool per barzer instance
+    pool parameters come from `BarzerSettings.TRANSPORT` and can be
+    overridden per instance in `BarzerSettings.BARZER_INSTANCES`
+    """
+    def __init__(self, instances=None, **kwargs):
+        """
+        Args:
+            instances (dict) - instance configs, defaults to BarzerSettings.BARZER_INSTANCES
+            kwargs - pool_size, timeout, gzip overriding BarzerSettings.TRANSPORT
+        """
+        self.instances = instances or BarzerSettings.BARZER_INSTANCES
+        self.settings = dict(BarzerSettings.TRANSPORT)
+        self.settings.update((k, v) for k, v in kwargs.iteritems() if v is not None)
+        self.pools = {}
+        self.lock = threading.Lock()
+
+    def make_pool(self, instance):
+        settings = dict(self.settings)
+        cfg = self.instances[instance]
+        settings.update((k, cfg[k]) for k in ('pool_size', 'timeout', 'gzip') if k in cfg)
+        return HTTPConnectionPool(
+            cfg['url'],
+            pool_size=settings.get('pool_size'),
+            timeout=settings.get('timeout'),
+            use_gzip=settings.get('gzip', True))
+
+    def get_pool(self, instance):
+        pool = self.pools.get(instance)
+        if not pool:
+            with self.lock:
+                pool = self.pools.get(instance)
+                if not pool:
+                    pool = self.pools[instance] = self.make_pool(instance)
+        return pool
+
+    def get(self, instance, url, timeout=None):
+        """ fetches `url` through the pool of `instance`
+        Returns:
+            response body (str)
+        Raises:
+            TransportError
+        """
+        parsed = urlparse.urlsplit(url)
+        path = '{}?{}'.format(parsed.path or '/', parsed.query) if parsed.query else parsed.path
+        return self.get_pool(instance).request(path, timeout=timeout)
+
+    def stats(self):
+        return {k: dict(v.stats) for k, v in self.pools.iteritems()}
+
+    def close(self):
+        for pool in self.pools.values():
+            pool.close()
+        logging.debug('barzer transport closed {}'.format(self.stats()))
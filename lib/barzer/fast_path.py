@@ -0,0 +1,127 @@
+# pylint: disable=missing-docstring, invalid-name
+""" local fast path for answers to number, yes/no and string questions
+
+when the nodes waiting for an answer expect a number, a yes/no or a short
+string, inputs like "220", "yeah" or "John Smith" are turned into barz
+dicts locally. anything the recognizers are not sure about returns None
+and goes to barzer as usual
+
+a short string could also name an entity some fact is waiting for, so string
+answers are only taken locally when no entity fact could match the answer or
+the entity dictionary finds no entity in it. without a dictionary (the
+default settings) the string recognizer is off while an entity fact could
+match, and those answers are not counted as misses
+"""
+from __future__ import absolute_import, division
+from collections import Counter
+import re
+import threading
+
+from lib.barzer.query_normalizer import QueryNormalizer, TOKEN_RE
+from config import BarzerSettings, RulesSettings
+
+NUMBER_RE = re.compile(r'^\d+(?:\.\d+)?$')
+WORD_RE = re.compile(r"^[^\W\d_]+(?:['-][^\W\d_]+)*$", re.UNICODE)
+
+
+class FastPath(object):
+    """ per value type recognizers keyed by `node_value_type` """
+    def __init__(self, enabled=True, yes=(), no=(), string_max_tokens=3, dictionary=None, normalizer=None):
+        """
+        Args:
+            enabled (bool) - when false every lookup is a miss
+            yes/no (list(str)) - phrases read as YES/NO entities
+            string_max_tokens (int) - longest answer taken as a plain string
+            dictionary (lib.barzer.local_extractor.EntityDictionary) - optional,
+                string answers mentioning a known entity go to barzer. without
+                it string answers go to barzer whenever an entity could match
+            normalizer (QueryNormalizer) - defaults to BarzerSettings.NORMALIZE
+        """
+        self.enabled = enabled
+        self.normalizer = normalizer or QueryNormalizer(**dict(BarzerSettings.NORMALIZE, track=False))
+        self.yes = set(self.normalizer.fold(x) for x in yes)
+        self.no = set(self.normalizer.fold(x) for x in no)
+        self.string_max_tokens = string_max_tokens
+        self.dictionary = dictionary
+        self.recognizers = {
+            'number': self.recognize_number,
+            'bool': self.recognize_yes_no,
+            'string': self.recognize_string,
+        }
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, **kwargs):
+        settings = dict(BarzerSettings.FAST_PATH)
+        settings.update(kwargs)
+        return cls(**settings)
+
+    def recognize_number(self, text, folded, entities):  # pylint: disable=unused-argument
+        if NUMBER_RE.match(folded):
+            return [{'type': 'number', 'value': float(folded) if '.' in folded else int(folded)}]
+
+    def recognize_yes_no(self, text, folded, entities):  # pylint: disable=unused-argument
+        if folded in self.yes:
+            return [dict(RulesSettings.YES_ENTITY, type='entity')]
+        if folded in self.no:
+            return [dict(RulesSettings.NO_ENTITY, type='entity')]
+
+    def recognize_string(self, text, folded, entities):
+        if not folded or folded in self.yes or folded in self.no:
+            return None
+        tokens = TOKEN_RE.findall(text.decode('utf-8', 'replace') if isinstance(text, str) else text)
+        words = [t for t in tokens if t[0].isalnum() or t[0] == '_']
+        if not words or len(words) > self.string_max_tokens or not all(WORD_RE.match(w) for w in words):
+            return None
+        if entities and any(self.dictionary.automaton.find(self.dictionary.tokenize(text))):
+            return None
+        return [
+            {'type': 'token' if t in words else 'punct', 'value': t.encode('utf-8')}
+            for t in tokens]
+
+    def parse(self, text, value_types, entities=True):
+        """ barz dict when one of `value_types` recognizes `text`, None otherwise
+        Args:
+            text (str) - user input
+            value_types (list(lib.calc_node_value_type.NodeValueType)) - types the active nodes expect
+            entities (bool) - whether an entity in `text` could set a fact
+        """
+        kinds = []
+        for vt in value_types:
+            kind = getattr(vt, 'node_value_type', None)
+            if kind == 'string' and entities and self.dictionary is None:
+                # nothing tells a name from an entity barzer would find
+                continue
+            if kind in self.recognizers and kind not in kinds:
+                kinds.append(kind)
+        if not kinds or not text:
+            return None
+
+        folded = self.normalizer.fold(text)
+        beads, tried = None, []
+        for kind in kinds:
+            tried.append(kind)
+            beads = self.recognizers[kind](text, folded, entities) if self.enabled else None
+            if beads:
+                break
+        with self.lock:
+            for k in tried[:-1]:
+                self.counts[k + '_misses'] += 1
+            self.counts[tried[-1] + ('_hits' if beads else '_misses')] += 1
+        return {'beads': beads, 'fast_path': tried[-1]} if beads else None
+
+    def stats(self):
+        """ per value type hits/misses and hit rate """
+        with self.lock:
+            counts = dict(self.counts)
+        result = {}
+        for kind in self.recognizers:
+            hits, misses = counts.get(kind + '_hits', 0), counts.get(kind + '_misses', 0)
+            result[kind] = {
+                'hits': hits, 'misses': misses,
+                'hit_rate': hits / (hits + misses) if hits + misses else 0.0}
+        return result
+
+
+fast_path = FastPath.from_settings()
@@ -0,0 +1,234 @@
+# pylint: disable=missing-docstring, invalid-name, logging-format-interpolation
+""" offline barzer compatible entity extractor
+
+entity dictionaries (`id|name|pattern|...` lines as written by
+scripts/entity_processor.py, or the entities of a protocol) are compiled
+into an Aho-Corasick automaton over normalized tokens. `LocalBarzer`
+emits the same bead dicts barzer does (entity, erc, number, token, punct)
+and can be passed anywhere a `barzer_svc` is expected
+"""
+from __future__ import absolute_import, division
+from collections import Counter, deque
+import logging
+import re
+
+from lib.barzer import barzer_objects
+from lib.barzer.query_normalizer import QueryNormalizer, TOKEN_RE
+from config import BarzerSettings, RulesSettings
+
+NUMBER_RE = re.compile(r'^\d+(?:\.\d+)?$')
+ENTITY_FIELDS = ('class', 'subclass', 'id', 'name', 'scope', 'category')
+
+
+class TokenAutomaton(object):
+    """ Aho-Corasick automaton whose alphabet is normalized tokens """
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.terminal = [[]]
+        self.output = [[]]
+        self.compiled = True
+
+    def add(self, tokens, value):
+        state = 0
+        for tok in tokens:
+            nxt = self.goto[state].get(tok)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][tok] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.terminal.append([])
+            state = nxt
+        self.terminal[state].append((len(tokens), value))
+        self.compiled = False
+
+    def compile(self):
+        """ breadth first fail links, outputs of fail states are merged in """
+        self.output = [list(x) for x in self.terminal]
+        queue = deque(self.goto[0].itervalues())
+        for state in queue:
+            self.fail[state] = 0
+        while queue:
+            state = queue.popleft()
+            for tok, nxt in self.goto[state].iteritems():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and tok not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(tok, 0)
+                self.output[nxt].extend(self.output[self.fail[nxt]])
+        self.compiled = True
+
+    def find(self, tokens):
+        """ yields (start, end, value) for every pattern occurrence """
+        if not self.compiled:
+            self.compile()
+        state = 0
+        for i, tok in enumerate(tokens):
+            while state and tok not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(tok, 0)
+            for length, value in self.output[state]:
+                yield i + 1 - length, i + 1, value
+
+
+class EntityDictionary(object):
+    """ entity patterns -> barzer entity dicts """
+    def __init__(self, normalizer=None):
+        """
+        Args:
+            normalizer (QueryNormalizer) - defaults to BarzerSettings.NORMALIZE keeping punctuation
+        """
+        if normalizer is None:
+            normalizer = QueryNormalizer(**dict(BarzerSettings.NORMALIZE, punctuation=False, track=False))
+        self.normalizer = normalizer
+        self.automaton = TokenAutomaton()
+        self.entities = {}
+        self.stats = Counter()
+
+    def tokenize(self, text):
+        """ folded unicode tokens, hyphenated words are split (blood-pressure) """
+        tokens = []
+        for tok in TOKEN_RE.findall(self.normalizer.fold(text).decode('utf-8')):
+            if '-' in tok and not tok[0].isdigit():
+                tokens.extend(tok.split('-'))
+            else:
+                tokens.append(tok)
+        return tokens
+
+    def add(self, entity, patterns=None):
+        """
+        Args:
+            entity (dict) - barzer entity (class, subclass, id, name, scope, category)
+            patterns (list(str)) - surface forms, defaults to the entity name
+        """
+        ent = {k: entity[k] for k in ENTITY_FIELDS if entity.get(k) is not None}
+        key = (ent.get('class'), ent.get('subclass'), ent.get('id'))
+        ent = self.entities.setdefault(key, ent)
+        for pattern in patterns or [ent.get('name') or ent.get('id')]:
+            tokens = self.tokenize(pattern)
+            if tokens:
+                self.automaton.add(tokens, ent)
+                self.stats['patterns'] += 1
+        return self
+
+    def load(self, fp, eclass, subclass, scope=None, category=None):
+        """ reads `id|name|pattern|...` lines (see scripts/entity_processor.py) """
+        if isinstance(fp, basestring):
+            fp = open(fp)
+        for line in fp:
+            fields = [x.strip() for x in line.strip().split('|')]
+            if len(fields) < 2 or not fields[0]:
+                continue
+            self.add(
+                {'class': eclass, 'subclass': subclass, 'id': fields[0], 'name': fields[1],
+                 'scope': scope, 'category': category},
+                patterns=[x for x in fields[1:] if x])
+        return self
+
+    def add_protocol(self, data):
+        """ every entity used by a protocol (convo_protocol wrapped or bare) """
+        if 'data' in data and 'facts' in data['data']:
+            data = data['data']
+        for fact in data.get('facts', []):
+            ent = fact.get('data')
+            if fact.get('node_type') == 'entity' and ent:
+                self.add(ent, [ent.get('name'), str(ent.get('id', ''))])
+        return self
+
+    def add_yes_no(self, yes=('yes', 'y', 'sure', 'correct', 'right'), no=('no', 'n', 'not', 'never')):
+        self.add(RulesSettings.YES_ENTITY, list(yes))
+        self.add(RulesSettings.NO_ENTITY, list(no))
+        return self
+
+
+class LocalBarzer(object):
+    """ in process drop in for `lib.barzer.barzer_svc.Barzer` """
+    # an entity followed by a number within this many tokens becomes an erc
+    ERC_GAP = 2
+    ERC_FILLERS = frozenset(['is', 'of', 'was', 'at', 'about', 'around', 'equals', 'a', 'my'])
+
+    def __init__(self, dictionary):
+        self.dictionary = dictionary
+        self.stats = Counter()
+
+    def normalize(self, query, instance=None):  # pylint: disable=unused-argument
+        return self.dictionary.normalizer.fold(query)
+
+    def resolve_instance(self, instance=None):  # pylint: disable=no-self-use
+        return instance or 'default'
+
+    def match_entities(self, tokens):
+        """ leftmost longest non overlapping matches: {start: (end, entity)} """
+        best = {}
+        for start, end, ent in self.dictionary.automaton.find(tokens):
+            if start not in best or best[start][0] < end:
+                best[start] = (end, ent)
+        result, pos = {}, 0
+        for start in sorted(best):
+            if start >= pos:
+                result[start] = best[start]
+                pos = best[start][0]
+        return result
+
+    @staticmethod
+    def make_number(tok):
+        return float(tok) if '.' in tok else int(tok)
+
+    def make_beads(self, tokens):
+        matches = self.match_entities(tokens)
+        beads = []
+        i = 0
+        while i < len(tokens):
+            tok = tokens[i]
+            if i in matches:
+                end, ent = matches[i]
+                bead = dict(ent, type='entity', src=' '.join(tokens[i:end]))
+                gap = end
+                while gap < len(tokens) and gap - end < self.ERC_GAP and tokens[gap] in self.ERC_FILLERS:
+                    gap += 1
+                if gap < len(tokens) and NUMBER_RE.match(tokens[gap]) and gap not in matches:
+                    num = self.make_number(tokens[gap])
+                    bead = {
+                        'type': 'erc', 'ent': dict(ent),
+                        'range': {'type': 'range', 'rangetype': 'real' if isinstance(num, float) else 'integer',
+                                  'lo': num, 'hi': num},
+                        'src': ' '.join(tokens[i:gap + 1])}
+                    end = gap + 1
+                beads.append(bead)
+                i = end
+                continue
+
+            if NUMBER_RE.match(tok):
+                beads.append({'type': 'number', 'value': self.make_number(tok), 'src': tok})
+            elif tok[0].isalnum() or tok[0] == '_':
+                beads.append({'type': 'token', 'value': tok, 'src': tok})
+            else:
+                beads.append({'type': 'punct', 'value': tok, 'src': tok})
+            i += 1
+        return beads
+
+    def get_json(self, query, instance=None, deadline=None):  # pylint: disable=unused-argument
+        self.stats['local_parses'] += 1
+        tokens = self.dictionary.tokenize(query)
+        return {'uid': 0, 'beads': self.make_beads([t.encode('utf-8') for t in tokens])}
+
+    def get_beads(self, query, instance=None, deadline=None):
+        return barzer_objects.BeadFactory.make_beads_from_barz(self.get_json(query, instance, deadline))
+
+    @classmethod
+    def from_protocols(cls, protocols, dictionaries=None):
+        """
+        Args:
+            protocols (list(dict)) - protocol json
+            dictionaries (list(dict)) - optional entity files:
+                {'path': ..., 'class': ..., 'subclass': ..., 'scope': ..., 'category': ...}
+        """
+        dictionary = EntityDictionary().add_yes_no()
+        for data in protocols:
+            dictionary.add_protocol(data)
+        for d in dictionaries or []:
+            dictionary.load(d['path'], d['class'], d['subclass'], d.get('scope'), d.get('category'))
+        logging.info('local extractor: {} entities {}'.format(len(dictionary.entities), dict(dictionary.stats)))
+        return cls(dictionary)
@@ -0,0 +1,213 @@
+# pylint: disable=missing-docstring, invalid-name, logging-format-interpolation
+""" two tier barzer parse cache
+memory tier - bounded LRU with TTL, per process
+persistent tier - optional sqlite file shared across restarts and worker processes
+entries are keyed by (instance, query) and hold raw barzer json.
+failed parses are kept in the memory tier for a short `negative_ttl` so
+that a degraded upstream is not hammered with the same query
+"""
+from __future__ import absolute_import, division
+from collections import Counter
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import pylru
+
+from config import BarzerSettings
+
+
+class MemoryCache(object):
+    """ bounded LRU with per entry expiration """
+    def __init__(self, size=1024, ttl=None, clock=time.time):
+        """
+        Args:
+            size (int) - max number of entries
+            ttl (float) - seconds an entry stays valid, None for no expiration
+            clock (callable) - time source
+        """
+        self.ttl = ttl
+        self.clock = clock
+        self.stats = Counter()
+        self.store = pylru.lrucache(size, callback=self.evicted)
+        self.lock = threading.Lock()
+
+    def evicted(self, key, value):  # pylint: disable=unused-argument
+        self.stats['evictions'] += 1
+
+    def __len__(self):
+        return len(self.store)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.store.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires <= self.clock():
+                del self.store[key]
+                self.stats['expirations'] += 1
+                return None
+            return value
+
+    def put(self, key, value, ttl=None):
+        ttl = ttl or self.ttl
+        with self.lock:
+            self.store[key] = (self.clock() + ttl if ttl else None, value)
+
+    def clear(self):
+        with self.lock:
+            self.store.clear()
+
+
+class SqliteCache(object):
+    """ persistent tier, one sqlite file shared by all worker processes
+    connections are opened per process (gunicorn forks after import)
+    """
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS parse_cache ('
+        'instance TEXT, query TEXT, barz TEXT, expires REAL, '
+        'PRIMARY KEY (instance, query))'
+    )
+
+    def __init__(self, path, ttl=None, clock=time.time):
+        """
+        Args:
+            path (str) - sqlite file name
+            ttl (float) - seconds an entry stays valid, None for no expiration
+        """
+        self.path = path
+        self.ttl = ttl
+        self.clock = clock
+        self.pid = self.conn = None
+        self.lock = threading.Lock()
+
+    def connection(self):
+        if self.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(self.SCHEMA)
+            conn.commit()
+            self.pid, self.conn = os.getpid(), conn
+        return self.conn
+
+    @staticmethod
+    def db_key(key):
+        return tuple(x.decode('utf-8') if isinstance(x, str) else x for x in key)
+
+    def get(self, key):
+        with self.lock:
+            row = self.connection().execute(
+                'SELECT barz, expires FROM parse_cache WHERE instance=? AND query=?',
+                self.db_key(key)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= self.clock()):
+            return None
+        return json.loads(row[0])
+
+    def put(self, key, value, ttl=None):
+        ttl = ttl or self.ttl
+        with self.lock:
+            conn = self.connection()
+            conn.execute(
+                'INSERT OR REPLACE INTO parse_cache VALUES (?, ?, ?, ?)',
+                self.db_key(key) + (json.dumps(value), self.clock() + ttl if ttl else None))
+            conn.commit()
+
+    def __len__(self):
+        with self.lock:
+            return self.connection().execute('SELECT COUNT(*) FROM parse_cache').fetchone()[0]
+
+    def close(self):
+        if self.conn and self.pid == os.getpid():
+            self.conn.close()
+        self.pid = self.conn = None
+
+
+class ParseCache(object):
+    """ memory tier in front of an optional persistent tier """
+    # error types worth remembering - deadline misses are the caller's budget, not the upstream
+    NEGATIVE_ERROR_TYPES = frozenset(['transport', 'circuit_open'])
+
+    def __init__(self, size=1024, ttl=None, path=None, persistent_ttl=None, negative_ttl=None, clock=time.time):
+        """
+        Args:
+            size (int) - memory tier size
+            ttl (float) - memory tier ttl
+            path (str) - sqlite file for the persistent tier, None disables it
+            persistent_ttl (float) - persistent tier ttl
+            negative_ttl (float) - seconds a failed parse is served from memory, None disables it
+        """
+        self.negative_ttl = negative_ttl
+        self.memory = MemoryCache(size, ttl=ttl, clock=clock)
+        self.persistent = SqliteCache(path, ttl=persistent_ttl, clock=clock) if path else None
+        self.counts = Counter()
+
+    @classmethod
+    def from_settings(cls, settings=None, **kwargs):
+        """ builds the cache from BarzerSettings.PARSE_CACHE """
+        settings = dict(settings or BarzerSettings.PARSE_CACHE)
+        settings.update((k, v) for k, v in kwargs.iteritems() if v is not None)
+        return cls(
+            size=settings.get('size', 1024),
+            ttl=settings.get('ttl'),
+            path=settings.get('path'),
+            persistent_ttl=settings.get('persistent_ttl'),
+            negative_ttl=settings.get('negative_ttl'))
+
+    @staticmethod
+    def make_key(instance, query):
+        return (instance, query)
+
+    def get(self, instance, query):
+        """ returns cached barz dict or None """
+        key = self.make_key(instance, query)
+        value = self.memory.get(key)
+        if value is not None:
+            self.counts['negative_hits' if 'error' in value else 'memory_hits'] += 1
+            return value
+
+        if self.persistent is not None:
+            try:
+                value = self.persistent.get(key)
+            except sqlite3.Error as ex:
+                logging.warning('parse cache read failed: {}'.format(ex))
+            if value is not None:
+                self.counts['persistent_hits'] += 1
+                self.memory.put(key, value)
+                return value
+
+        self.counts['misses'] += 1
+        return None
+
+    def put(self, instance, query, barz):
+        """ stores a successful barzer response, errors go to the memory tier only """
+        if not isinstance(barz, dict):
+            return
+        key = self.make_key(instance, query)
+        if 'error' in barz:
+            if self.negative_ttl and barz.get('error_type') in self.NEGATIVE_ERROR_TYPES:
+                self.memory.put(key, barz, ttl=self.negative_ttl)
+                self.counts['negative_stores'] += 1
+            return
+        self.memory.put(key, barz)
+        if self.persistent is not None:
+            try:
+                self.persistent.put(key, barz)
+            except sqlite3.Error as ex:
+                logging.warning('parse cache write failed: {}'.format(ex))
+
+    def stats(self):
+        """ hit/miss/eviction counters of both tiers """
+        stats = dict(self.counts)
+        stats.update(self.memory.stats)
+        stats['memory_size'] = len(self.memory)
+        lookups = sum(self.counts[x] for x in ('memory_hits', 'persistent_hits', 'negative_hits', 'misses'))
+        stats['hit_rate'] = (lookups - self.counts['misses']) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        self.memory.clear()
+        self.counts.clear()
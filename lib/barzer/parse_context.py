@@ -0,0 +1,70 @@
+# pylint: disable=missing-docstring, invalid-name
+""" per turn parse context - user input is parsed by barzer at most once per turn """
+from __future__ import absolute_import, division
+from lib.barzer import barzer_objects
+from lib.barzer.barzer_resilience import Deadline
+
+
+class ParseContext(object):
+    """ single user utterance shared by every node analyzing the turn
+    barzer is queried lazily on first access and the beads are kept as
+    an immutable lazily decoded sequence
+    """
+    def __init__(self, text, barzer_svc=None, instance=None, barz=None, deadline=None):
+        """
+        Args:
+            text (str) - user input
+            barzer_svc (lib.barzer.barzer_svc.Barzer) - optional parser, when None
+                the first consumer's parser is used
+            instance (str) - barzer instance id
+            barz (dict) - already available barzer response (e.g. from AsyncBarzer)
+            deadline (Deadline|float) - time budget of the turn
+        """
+        self.text = text
+        self.barzer_svc = barzer_svc
+        self.instance = instance
+        self.barz = barz
+        self.beads = None
+        self.deadline = Deadline.make(deadline)
+
+    @classmethod
+    def make(cls, input_val, barzer_svc=None, deadline=None):
+        """ wraps raw user input into a context (contexts are passed through) """
+        if isinstance(input_val, cls):
+            return input_val
+        return cls(input_val, barzer_svc=barzer_svc, deadline=deadline)
+
+    def is_error(self):
+        """ True when barzer could not parse the input (error, timeout or open circuit) """
+        return self.barz is not None and 'error' in self.barz
+
+    def __nonzero__(self):
+        return bool(self.text)
+
+    def __str__(self):
+        return self.text or ''
+
+    def fast_parse(self, fast_path, value_types, entities=True):
+        """ tries the local recognizers for `value_types` before barzer is queried
+        Args:
+            fast_path (lib.barzer.fast_path.FastPath)
+            value_types (list(NodeValueType)) - types expected by the active nodes
+            entities (bool) - whether an entity in the input could set a fact
+        Returns:
+            True when the input was recognized locally
+        """
+        if self.barz is None and fast_path is not None:
+            self.barz = fast_path.parse(self.text, value_types, entities)
+        return self.barz is not None and 'fast_path' in self.barz
+
+    def get_json(self, barzer_svc=None):
+        if self.barz is None:
+            self.barzer_svc = self.barzer_svc or barzer_svc
+            self.barz = self.barzer_svc.get_json(self.text, self.instance, self.deadline)
+        return self.barz
+
+    def get_beads(self, barzer_svc=None):
+        """ returns lib.barzer.barzer_objects.LazyBeads - consumers decode only what they look at """
+        if self.beads is None:
+            self.beads = barzer_objects.BeadFactory.make_lazy_beads(self.get_json(barzer_svc))
+        return self.beads
@@ -0,0 +1,152 @@
+# pylint: disable=missing-docstring, invalid-name
+""" query normalization in front of barzer
+folds unicode/case/whitespace/punctuation and canonicalizes numbers so
+that "Yes", "yes!!" and " YES " share one cache key and one remote parse.
+the folded form is only a key: barzer is sent the raw query, and folding
+keeps what changes a value (signs, decimal points, percent and currency
+signs)
+"""
+from __future__ import absolute_import, division
+from collections import Counter, defaultdict
+import re
+import threading
+import unicodedata
+
+from config import BarzerSettings
+
+# numbers keep their inner separators (98.6, 1,000, 120/80, 120-80, 10:30),
+# their sign and a leading decimal point (-2, .5) unless glued to a word or number
+TOKEN_RE = re.compile(
+    r'(?<![\w.])[-+]?(?:\d+(?:[-.,/:]\d+)*|\.\d+)|\d+(?:[-.,/:]\d+)*|\w+(?:[\'-]\w+)*|[^\w\s]', re.UNICODE)
+REPEAT_RE = re.compile(r'([^\W\d_])\1{2,}', re.UNICODE)
+THOUSANDS_RE = re.compile(r'^\d{1,3}(?:,\d{3})+(?:\.\d+)?$')
+DECIMAL_RE = re.compile(r'^\d+(?:\.\d+)?$')
+
+
+def raw_text(query):
+    """ the query as sent to barzer: utf-8 str, stripped. None stays None """
+    if query is None:
+        return None
+    return (query.encode('utf-8') if isinstance(query, unicode) else query).strip()
+
+
+def is_kept_symbol(tok):
+    """ punctuation that changes the meaning of a number: percent and currency signs """
+    return tok == '%' or unicodedata.category(tok) == 'Sc'
+
+
+def canonical_number(tok):
+    """ 1,000 -> 1000, 220.0 -> 220, 007 -> 7, +.5 -> 0.5. other numeric forms are kept """
+    sign = ''
+    if tok[0] in '+-':
+        sign, tok = tok[0].replace('+', ''), tok[1:]
+    if tok[0] == '.':
+        tok = '0' + tok
+    return sign + canonical_unsigned(tok)
+
+
+def canonical_unsigned(tok):
+    if THOUSANDS_RE.match(tok):
+        tok = tok.replace(',', '')
+    if not DECIMAL_RE.match(tok):
+        return tok
+    if '.' in tok:
+        tok = tok.rstrip('0').rstrip('.')
+    whole, point, fraction = tok.partition('.')
+    return (whole.lstrip('0') or '0') + point + fraction
+
+
+class QueryNormalizer(object):
+    """ configurable query folding with collapse statistics """
+    MAX_VARIANTS = 64
+    MAX_KEYS = 100000
+
+    def __init__(
+            self,
+            unicode_form='NFKC',
+            lower=True,
+            whitespace=True,
+            punctuation=True,
+            numbers=True,
+            max_repeat=2,
+            aliases=None,
+            track=True,
+            **kwargs
+    ):  # pylint: disable=unused-argument
+        """
+        Args:
+            unicode_form (str) - unicodedata normal form, None to skip
+            lower (bool) - case folding
+            whitespace (bool) - collapse runs of whitespace
+            punctuation (bool) - drop standalone punctuation
+            numbers (bool) - canonical numeric forms
+            max_repeat (int) - letters repeated more than this many times are squeezed
+            aliases (dict) - token -> replacement applied after folding (e.g. yess -> yes)
+            track (bool) - collect collapse statistics
+        """
+        self.unicode_form = unicode_form
+        self.lower = lower
+        self.whitespace = whitespace
+        self.punctuation = punctuation
+        self.numbers = numbers
+        self.max_repeat = max_repeat
+        self.aliases = {k.lower() if lower else k: v for k, v in (aliases or {}).iteritems()}
+        self.track = track
+        self.variants = defaultdict(set)
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, instance_config=None):
+        """ BarzerSettings.NORMALIZE overridden by the instance `normalize` entry """
+        settings = dict(BarzerSettings.NORMALIZE)
+        settings.update((instance_config or {}).get('normalize') or {})
+        return cls(**settings)
+
+    def fold(self, query):
+        """ returns normalized utf-8 str """
+        text = query.decode('utf-8', 'replace') if isinstance(query, str) else query
+        if self.unicode_form:
+            text = unicodedata.normalize(self.unicode_form, text)
+        if self.lower:
+            text = text.lower()
+        if self.max_repeat:
+            text = REPEAT_RE.sub(lambda m: m.group(1) * self.max_repeat, text)
+
+        if self.punctuation or self.numbers or self.aliases:
+            tokens = []
+            for tok in TOKEN_RE.findall(text):
+                if tok[0].isdigit() or tok[-1].isdigit():
+                    tokens.append(canonical_number(tok) if self.numbers else tok)
+                elif tok[0].isalnum() or tok[0] == '_':
+                    tokens.append(self.aliases.get(tok, tok))
+                elif not self.punctuation or is_kept_symbol(tok):
+                    tokens.append(tok)
+            text = ' '.join(tokens)
+        elif self.whitespace:
+            text = ' '.join(text.split())
+
+        return text.encode('utf-8')
+
+    def normalize(self, query):
+        """ folds the query, an input that folds to nothing is passed through stripped """
+        norm = self.fold(query) or (query.encode('utf-8') if isinstance(query, unicode) else query).strip()
+        if self.track and (norm in self.counts or len(self.counts) < self.MAX_KEYS):
+            with self.lock:
+                self.counts[norm] += 1
+                variants = self.variants[norm]
+                if len(variants) < self.MAX_VARIANTS:
+                    variants.add(query)
+        return norm
+
+    def collapse_report(self, top=None):
+        """ list of (normalized key, distinct raw inputs, total inputs) most collapsed first """
+        with self.lock:
+            report = [(k, len(self.variants[k]), n) for k, n in self.counts.iteritems()]
+        report.sort(key=lambda x: (-x[1], -x[2]))
+        return report[:top] if top else report
+
+    def stats(self):
+        with self.lock:
+            raw = sum(len(v) for v in self.variants.itervalues())
+            return {'normalized_keys': len(self.counts), 'raw_inputs': raw, 'queries': sum(self.counts.itervalues())}
@@ -0,0 +1,180 @@
+# pylint: disable=missing-docstring, invalid-name, logging-format-interpolation
+""" local stub barzer server for offline tests and benchmarks
+
+    PYTHONPATH=. python lib/barzer/stub_server.py --port 8765 --responses barz.json
+
+serves `/query/json?key=..&query=..` over HTTP/1.1 keep-alive. canned
+responses are looked up by query text, anything else is tokenized into
+number/punct/token beads or, with `--protocol`, parsed by the local
+entity extractor (lib/barzer/local_extractor.py)
+"""
+from __future__ import absolute_import, division
+from collections import Counter
+import argparse
+import BaseHTTPServer
+import gzip
+import json
+import random
+import re
+import SocketServer
+import StringIO
+import threading
+import time
+import urlparse
+
+TOKEN_RE = re.compile(r'\d+(?:\.\d+)?|\w+|[^\w\s]', re.UNICODE)
+
+
+def default_barz(query):
+    """ poor man's barzer: numbers, punctuation and plain tokens """
+    beads = []
+    for m in TOKEN_RE.finditer(query):
+        tok = m.group(0)
+        bead = {'src': tok, 'origmarkup': '{},{}'.format(m.start(), len(tok))}
+        if tok[0].isdigit():
+            bead.update(type='number', value=float(tok) if '.' in tok else int(tok))
+        elif re.match(r'\w', tok, re.UNICODE):
+            bead.update(type='token', value=tok)
+        else:
+            bead.update(type='punct', value=tok)
+        beads.append(bead)
+    return {'uid': 0, 'beads': beads}
+
+
+class StubBarzerHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        params = urlparse.parse_qs(urlparse.urlsplit(self.path).query)
+        query = params.get('query', [''])[0]
+        status, body = self.server.respond(query)
+
+        if 'gzip' in self.headers.get('accept-encoding', ''):
+            buf = StringIO.StringIO()
+            with gzip.GzipFile(fileobj=buf, mode='wb') as fp:
+                fp.write(body)
+            body = buf.getvalue()
+            encoding = 'gzip'
+        else:
+            encoding = None
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class StubBarzerServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """ threaded stub barzer
+    `connect_latency` is paid once per new connection (emulating tcp/tls
+    setup), `latency` once per request and `tail_latency` on a random
+    `tail_ratio` share of requests
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+            self, address=('127.0.0.1', 0), responses=None, latency=0.0,
+            connect_latency=0.0, tail_latency=0.0, tail_ratio=0.0, extractor=None
+    ):
+        """
+        Args:
+            address (tuple) - (host, port), port 0 picks a free one
+            responses (dict) - query text -> barz dict
+            latency (float) - seconds added to every request
+            connect_latency (float) - seconds added to every new connection
+            tail_latency (float) - seconds added to `tail_ratio` share of requests
+            extractor (LocalBarzer) - optional, parses queries without a canned response
+        """
+        BaseHTTPServer.HTTPServer.__init__(self, address, StubBarzerHandler)
+        self.responses = responses or {}
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.tail_latency = tail_latency
+        self.tail_ratio = tail_ratio
+        self.extractor = extractor
+        self.stats = Counter()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def url(self):
+        return 'http://{}:{}/query/json'.format(*self.server_address)
+
+    def instance_config(self, key='stub'):
+        """ entry suitable for BarzerSettings.BARZER_INSTANCES """
+        return {'url': self.url, 'key': key}
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def respond(self, query):
+        """ returns (status, body) """
+        self.count('requests')
+        self.count('query:' + query)
+        latency = self.latency
+        if self.tail_ratio and random.random() < self.tail_ratio:
+            latency += self.tail_latency
+        if latency:
+            time.sleep(latency)
+        barz = self.responses.get(query)
+        if barz is None and self.extractor is not None:
+            barz = self.extractor.get_json(query)
+        if barz is None:
+            barz = default_barz(query.decode('utf-8'))
+        return 200, json.dumps(barz)
+
+    def process_request_thread(self, request, client_address):
+        self.count('connections')
+        if self.connect_latency:
+            time.sleep(self.connect_latency)
+        SocketServer.ThreadingMixIn.process_request_thread(self, request, client_address)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, kwargs={'poll_interval': 0.05})
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='stub barzer server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--responses', help='json file: query -> barz')
+    parser.add_argument('--protocol', action='append', default=[], help='protocol json for the local extractor')
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--connect-latency', type=float, default=0.0)
+    parser.add_argument('--tail-latency', type=float, default=0.0)
+    parser.add_argument('--tail-ratio', type=float, default=0.0)
+    args = parser.parse_args()
+
+    responses = json.load(open(args.responses)) if args.responses else None
+    extractor = None
+    if args.protocol:
+        from lib.barzer.local_extractor import LocalBarzer
+        extractor = LocalBarzer.from_protocols([json.load(open(fn)) for fn in args.protocol])
+    server = StubBarzerServer(
+        (args.host, args.port), responses=responses,
+        latency=args.latency, connect_latency=args.connect_latency,
+        tail_latency=args.tail_latency, tail_ratio=args.tail_ratio, extractor=extractor)
+    print 'stub barzer listening on', server.url
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
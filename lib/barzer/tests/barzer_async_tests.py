@@ -0,0 +1,42 @@
+# pylint: disable=missing-docstring, no-self-use
+from __future__ import division, absolute_import
+import threading
+import unittest
+from lib.barzer.barzer_async import AsyncBarzer, FutureTimeout
+from lib.barzer.barzer_svc import Barzer
+from lib.barzer.stub_server import StubBarzerServer
+
+
+class AsyncBarzerTest(unittest.TestCase):
+    def setUp(self):
+        self.server = StubBarzerServer(latency=0.1).start()
+        self.barzer = AsyncBarzer(Barzer(instances={'default': self.server.instance_config()}), workers=4)
+
+    def tearDown(self):
+        self.barzer.close()
+        self.server.stop()
+
+    def test_coalescing(self):
+        futures = [self.barzer.get_beads(q) for q in ['yes', 'Yes!', ' YES'] * 20 + ['220']]
+        results = [f.result(timeout=5) for f in futures]
+        self.assertEquals(str(results[0][0]), 'token:yes')
+        self.assertEquals(results[-1][0].value, 220)
+        self.assertEquals(self.server.stats['requests'], 2)
+        self.assertEquals(self.barzer.flight.stats['coalesced'], 59)
+        # cached now - no new flight
+        self.assertTrue(self.barzer.get_json('yes').done())
+
+    def test_callbacks(self):
+        done = threading.Event()
+        texts = []
+        fut = self.barzer.parse('temperature 100')
+        fut.add_done_callback(lambda f: (texts.append(f.value.get_beads()[1].value), done.set()))
+        self.assertTrue(done.wait(5))
+        self.assertEquals(texts, [100])
+        self.assertEquals(self.barzer.barzer.stats['remote_parses'], 1)
+
+    def test_timeout(self):
+        self.assertRaises(FutureTimeout, self.barzer.get_json('slow').result, 0.01)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+# pylint: disable=missing-docstring, no-self-use
+from __future__ import division, absolute_import
+import os
+import shutil
+import tempfile
+import unittest
+from lib.barzer.barzer_replay import ReplayStore, ResponseRecorder
+from lib.barzer.barzer_resilience import Deadline
+from lib.barzer.barzer_svc import Barzer
+from lib.barzer.parse_cache import ParseCache
+from lib.barzer.stub_server import StubBarzerServer
+
+# nothing listens there - replay must not touch the network
+DEAD_INSTANCES = {'default': {'url': 'http://127.0.0.1:9/query/json', 'key': 'x'}}
+
+
+class ReplayTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'barz.bzrr')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def record(self, queries):
+        server = StubBarzerServer().start()
+        recorder = ResponseRecorder(self.path)
+        barzer = Barzer(instances={'default': server.instance_config()}, cache=ParseCache(size=1), recorder=recorder)
+        try:
+            return [barzer.get_json(q) for q in queries]
+        finally:
+            recorder.close()
+            barzer.transport.close()
+            server.stop()
+
+    def test_record_replay(self):
+        recorded = self.record(['Pulse 120', 'headache!', u'caf\xe9'.encode('utf-8')])
+        store = ReplayStore(self.path)
+        self.assertEquals(len(store), 3)
+        barzer = Barzer(instances=DEAD_INSTANCES, cache=ParseCache(size=1), replay=store)
+        self.assertEquals(barzer.get_json('pulse 120'), recorded[0])
+        self.assertEquals(barzer.get_json('Headache'), recorded[1])
+        self.assertEquals(barzer.get_json(u'Caf\xe9'.encode('utf-8')), recorded[2])
+        self.assertEquals(barzer.stats['remote_parses'], 0)
+
+        barz = barzer.get_json('never recorded')
+        self.assertEquals(barz['error_type'], 'replay')
+        self.assertEquals(dict(store.stats), {'hits': 3, 'misses': 1})
+        store.close()
+
+    def test_append_and_torn_record(self):
+        self.record(['one'])
+        self.record(['two'])
+        with open(self.path, 'ab') as fp:
+            fp.write('\x05\x00\x00\x00\xff\x00')
+        store = ReplayStore(self.path)
+        self.assertEquals(len(store), 2)
+        self.assertTrue(('default', 'two') in store)
+        store.close()
+
+    def test_latency(self):
+        recorder = ResponseRecorder(self.path)
+        recorder.record('default', 'slow', {'beads': []}, latency=0.25)
+        recorder.close()
+        sleeps = []
+        self.assertEquals(ReplayStore(self.path, latency='recorded', sleep=sleeps.append).fetch('slow', 'default'),
+                          {'beads': []})
+        ReplayStore(self.path, latency=0.01, sleep=sleeps.append).fetch('slow', 'default')
+        self.assertEquals(sleeps, [0.25, 0.01])
+
+        barz = ReplayStore(self.path, latency=0.05).fetch('slow', 'default', Deadline(0.01))
+        self.assertEquals(barz['error_type'], 'deadline')
+
+    def test_not_a_recording(self):
+        with open(self.path, 'wb') as fp:
+            fp.write('garbage')
+        self.assertRaises(ValueError, ReplayStore, self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+# pylint: disable=missing-docstring, no-self-use
+from __future__ import division, absolute_import
+import time
+import unittest
+from lib.barzer.barzer_objects import BeadFactory
+from lib.barzer.barzer_resilience import CircuitBreaker, Deadline
+from lib.barzer.barzer_router import BarzerRouter
+from lib.barzer.barzer_svc import Barzer
+from lib.barzer.parse_cache import ParseCache
+from lib.barzer.parse_context import ParseContext
+from lib.barzer.stub_server import StubBarzerServer
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def test_states(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+        breaker.record(False)
+        self.assertTrue(breaker.allow())
+        breaker.record(False)
+        self.assertFalse(breaker.allow())
+        clock.now += 10
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record(False)
+        self.assertEquals(breaker.state, CircuitBreaker.OPEN)
+        clock.now += 10
+        self.assertTrue(breaker.allow())
+        breaker.record(True)
+        self.assertEquals(breaker.state, CircuitBreaker.CLOSED)
+
+
+class BarzerResilienceTest(unittest.TestCase):
+    def setUp(self):
+        self.server = StubBarzerServer().start()
+        self.instances = {'default': self.server.instance_config()}
+
+    def tearDown(self):
+        self.server.server_close()
+
+    def make_barzer(self, negative_ttl=None):
+        return Barzer(
+            instances=self.instances,
+            cache=ParseCache(negative_ttl=negative_ttl),
+            router=BarzerRouter(self.instances, settings={'failure_threshold': 3, 'reset_timeout': 60}))
+
+    def test_circuit_breaker(self):
+        barzer = self.make_barzer()
+        self.server.stop()
+        for i in range(10):
+            barz = barzer.get_json(str(i))
+            self.assertTrue('error' in barz)
+            self.assertEquals(BeadFactory.make_beads_from_barz(barz), [])
+        self.assertEquals(barzer.stats['remote_parses'], 3)
+        self.assertEquals(barz['error_type'], 'circuit_open')
+        self.assertEquals(barzer.router.stats['circuit_open'], 7)
+
+    def test_negative_cache(self):
+        barzer = self.make_barzer(negative_ttl=5)
+        self.server.stop()
+        for _ in range(2):
+            self.assertEquals(barzer.get_json('yes')['error_type'], 'transport')
+        self.assertEquals(barzer.stats['remote_parses'], 1)
+        self.assertEquals(barzer.cache.stats()['negative_hits'], 1)
+
+    def test_deadline(self):
+        barzer = self.make_barzer(negative_ttl=5)
+        self.server.latency = 0.5
+        start = time.time()
+        ctx = ParseContext('yes', barzer_svc=barzer, deadline=0.05)
+        self.assertEquals(ctx.get_beads(), ())
+        self.assertTrue(ctx.is_error())
+        self.assertEquals(ctx.barz['error_type'], 'deadline')
+        self.assertTrue(time.time() - start < 0.3)
+        # a blown budget is neither a breaker failure nor negatively cached
+        self.assertEquals(barzer.router.breakers['default'].failures, 0)
+        self.assertEquals(barzer.get_json('no', deadline=Deadline(0))['error_type'], 'deadline')
+        self.assertEquals(barzer.stats['remote_parses'], 1)
+        self.server.latency = 0
+        self.assertTrue('beads' in barzer.get_json('yes'))
+        self.server.stop()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+# pylint: disable=missing-docstring, no-self-use
+from __future__ import division, absolute_import
+import threading
+import time
+import unittest
+from lib.barzer.barzer_router import BarzerRouter
+from lib.barzer.barzer_svc import Barzer
+from lib.barzer.parse_cache import ParseCache
+from lib.barzer.stub_server import StubBarzerServer
+
+
+class BarzerRouterTest(unittest.TestCase):
+    def setUp(self):
+        self.slow = StubBarzerServer(latency=0.05).start()
+        self.fast = StubBarzerServer().start()
+        self.instances = {
+            'default': self.slow.instance_config(),
+            'replica': dict(self.fast.instance_config(), replica_of='default'),
+        }
+
+    def tearDown(self):
+        self.slow.stop()
+        self.fast.stop()
+
+    def make_barzer(self, **settings):
+        settings.setdefault('probe_ratio', 0.0)
+        return Barzer(
+            instances=self.instances,
+            cache=ParseCache(size=1),
+            router=BarzerRouter(self.instances, settings=settings))
+
+    def test_fastest_instance(self):
+        barzer = self.make_barzer()
+        self.assertEquals(barzer.router.candidates('default'), ['default', 'replica'])
+        for i in range(20):
+            self.assertEquals(barzer.get_json(str(i))['beads'][0]['value'], i)
+        self.assertEquals(self.slow.stats['requests'] + self.fast.stats['requests'], 20)
+        self.assertTrue(self.fast.stats['requests'] >= 18)
+        self.assertEquals(barzer.router.candidates('default')[0], 'replica')
+
+    def test_failover(self):
+        barzer = self.make_barzer()
+        self.fast.stop()
+        self.fast = StubBarzerServer().start()
+        for i in range(5):
+            self.assertTrue('beads' in barzer.get_json(str(i)))
+        self.assertEquals(barzer.router.stats['failovers'], 1)
+        self.assertTrue(barzer.router.health['replica'].error_rate > 0)
+        self.assertEquals(barzer.router.candidates('default')[0], 'default')
+
+    def test_hedging(self):
+        barzer = self.make_barzer(hedge=True, hedge_max_delay=0.02)
+        # default gets measured first and is picked again while replica is unknown
+        barzer.router.health['replica'].record(0.5)
+        start = time.time()
+        self.assertEquals(barzer.get_json('1')['beads'][0]['value'], 1)
+        self.assertTrue(time.time() - start < 0.05)
+        self.assertEquals(barzer.router.stats['hedged'], 1)
+        self.assertEquals(barzer.router.stats['hedge_wins'], 1)
+
+    def test_hedging_threads(self):
+        barzer = self.make_barzer(hedge=True, hedge_max_delay=0.02, workers=4)
+        barzer.router.health['replica'].record(0.5)
+        # the pool is there from the start, its threads are not
+        pool = barzer.router.pool
+        self.assertEquals(pool.threads, [])
+        values = []
+        threads = [threading.Thread(target=lambda i=i: values.append(barzer.get_json(str(i))['beads'][0]['value']))
+                   for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEquals(sorted(values), range(8))
+        self.assertIs(barzer.router.pool, pool)
+        self.assertEquals(len(pool.threads), 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,7 +4,7 @@ import unittest
 import sys
 import json
 from lib.barzer.barzer_svc import barzer
-from lib.barzer.barzer_objects import BeadFactory
+from lib.barzer.barzer_objects import BeadFactory, Entity, EntityBase, EntityId, ERC, EVR, LazyBeads, Number
 
 
 class BarzerConnectivityTest(unittest.TestCase):
@@ -20,5 +20,76 @@ class BarzerObjectsTest(unittest.TestCase):
         objbarz = BeadFactory.make_beads_from_barz(barz)
         print >> sys.stderr, "ZZDEBUG >>>>\n", '\n'.join(str(x) for x in objbarz), "<<<<<"
 
+    def test_slots(self):
+        beads = BeadFactory.make_beads_from_barz(json.load(open('lib/barzer/tests/barz.json')))
+        self.assertFalse(any(hasattr(x, '__dict__') for x in beads))
+
+    def test_interned_ent_id(self):
+        barz = json.load(open('lib/barzer/tests/barz.json'))
+        erc = [x for x in BeadFactory.make_beads_from_barz(barz) if isinstance(x, ERC)][0]
+        evr = [x for x in BeadFactory.make_beads_from_barz(barz) if isinstance(x, EVR)][0]
+        temperature = Entity({'class': 459, 'subclass': 9, 'id': 'temperature'})
+        self.assertTrue(erc.ent_id() is temperature.ent_id())
+        self.assertTrue(evr.ent_id() is temperature.ent_id())
+        self.assertTrue(EntityId.make(459, 9, u'temperature') is temperature.ent_id())
+        self.assertEquals((evr.eclass, evr.subclass, evr.id), (459, 9, 'temperature'))
+        self.assertTrue(evr.match_ent(temperature))
+        self.assertFalse(temperature.match_ent(Entity({'class': 459, 'subclass': 3, 'id': 'temperature'})))
+
+    def test_interned_bound(self):
+        interned, limit = EntityId.interned, EntityId.INTERN_MAX
+        EntityId.interned, EntityId.INTERN_MAX = {}, 1
+        try:
+            first = EntityId.make(459, 9, 'first')
+            self.assertIs(EntityId.make(459, 9, 'first'), first)
+            second = Entity({'class': 459, 'subclass': 9, 'id': 'second'})
+            self.assertEquals(len(EntityId.interned), 1)
+            self.assertIsNot(EntityId.make(459, 9, 'second'), second.ent_id())
+            self.assertTrue(second.match_ent(Entity({'class': 459, 'subclass': 9, 'id': 'second'})))
+        finally:
+            EntityId.interned, EntityId.INTERN_MAX = interned, limit
+
+    def test_shared_beads(self):
+        barz = {'beads': [{'type': 'token', 'value': 'yes', 'src': 'yes'}, {'type': 'number', 'value': 1}]}
+        first = BeadFactory.make_beads_from_barz(barz)
+        second = BeadFactory.make_beads_from_barz(barz)
+        self.assertTrue(first[0] is second[0])
+        self.assertTrue(first[1] is second[1])
+        other = BeadFactory.make_beads_from_barz({'beads': [{'type': 'number', 'value': 1.0}]})
+        self.assertTrue(isinstance(other[0].value, float))
+
+    def test_lazy_beads(self):
+        barz = json.load(open('lib/barzer/tests/barz.json'))
+        beads = BeadFactory.make_lazy_beads(barz)
+        self.assertTrue(isinstance(beads, LazyBeads))
+        self.assertEquals(len(beads), len(barz['beads']))
+        self.assertEquals(beads.decoded(), 0)
+        numbers = list(beads.of_type(Number))
+        raw_numbers = [x['value'] for x in barz['beads'] if x['type'] == 'number']
+        self.assertEquals([x.value for x in numbers], raw_numbers)
+        self.assertEquals(beads.decoded(), len(raw_numbers))
+        self.assertEquals(
+            [x.type_name for x in beads.of_type(EntityBase)],
+            [x['type'] for x in barz['beads'] if x['type'] in ('entity', 'erc', 'evr')])
+        self.assertTrue(beads[4] is numbers[0])
+        self.assertEquals([str(x) for x in beads], [str(x) for x in BeadFactory.make_beads_from_barz(barz)])
+        self.assertEquals(beads, list(beads))
+
+    def test_lazy_evr_values(self):
+        barz = json.load(open('lib/barzer/tests/barz.json'))
+        raw = [x for x in barz['beads'] if x['type'] == 'evr'][0]
+        evr = BeadFactory.make_bead_from_dict(raw)
+        self.assertEquals(evr._values, None)  # pylint: disable=protected-access
+        self.assertEquals(len(evr.values), len(raw['values']))
+
+    def test_unknown_and_malformed(self):
+        beads = BeadFactory.make_lazy_beads({'beads': [{'type': 'whatever'}, {'type': 'erc'}]})
+        self.assertEquals(len(beads), 1)
+        self.assertEquals(len(list(beads)), 1)
+        self.assertEquals(beads.type_names(), ['erc'])
+        self.assertEquals(beads[0].ent_id(), EntityId.make(None, None, None))
+        self.assertEquals(beads[-1], beads[0])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,58 @@
+# pylint: disable=missing-docstring, no-self-use
+from __future__ import division, absolute_import
+import unittest
+from lib.barzer.barzer_svc import Barzer
+from lib.barzer.barzer_transport import BarzerTransport
+from lib.barzer.stub_server import StubBarzerServer
+
+
+class BarzerTransportTest(unittest.TestCase):
+    def setUp(self):
+        self.server = StubBarzerServer(responses={'hello': {'beads': [{'type': 'token', 'value': 'hi'}]}}).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def make_barzer(self, **kwargs):
+        instances = {'default': self.server.instance_config()}
+        return Barzer(instances=instances, transport=BarzerTransport(instances, **kwargs))
+
+    def test_connection_reuse(self):
+        barzer = self.make_barzer()
+        for i in range(20):
+            self.assertEquals(barzer.get_json(str(i))['beads'][0]['value'], i)
+        self.assertEquals(self.server.stats['connections'], 1)
+        self.assertEquals(self.server.stats['requests'], 20)
+        self.assertEquals(barzer.transport.stats()['default']['reused'], 19)
+
+    def test_gzip(self):
+        barzer = self.make_barzer(gzip=True)
+        beads = barzer.get_json('temperature 220')['beads']
+        self.assertEquals([b['type'] for b in beads], ['token', 'number'])
+        self.assertEquals(beads[1]['value'], 220)
+        self.assertEquals(barzer.transport.stats()['default']['gzip'], 1)
+
+    def test_timeout(self):
+        self.server.latency = 0.3
+        barzer = self.make_barzer(timeout=0.05)
+        self.assertTrue('error' in barzer.get_json('hello'))
+
+    def test_request_timeout_not_pooled(self):
+        barzer = self.make_barzer(timeout=2)
+        pool = barzer.transport.get_pool('default')
+        # a short deadline is met, its connection goes back to the pool
+        self.assertTrue('beads' in barzer.get_json('hello', deadline=0.2))
+        self.server.latency = 0.3
+        self.assertTrue('beads' in barzer.get_json('hi'))
+        self.assertEquals(pool.stats['reused'], 1)
+
+    def test_stale_connection(self):
+        barzer = self.make_barzer()
+        barzer.get_json('hello')
+        barzer.cache.clear()
+        for conn in list(barzer.transport.get_pool('default').idle.queue):
+            conn.sock.close()
+        self.assertTrue('beads' in barzer.get_json('hello'))
+
+if __name__ == '__main__':
+    unittest.main()
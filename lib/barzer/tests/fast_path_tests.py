@@ -0,0 +1,75 @@
+# pylint: disable=missing-docstring, invalid-name
+import unittest
+import StringIO
+from lib import calc_node_value_type
+from lib.barzer import barzer_objects
+from lib.barzer.fast_path import FastPath
+from lib.barzer.local_extractor import EntityDictionary
+
+NUMBER = calc_node_value_type.NodeValueTypeNumber()
+YES_NO = calc_node_value_type.NodeValueTypeYesNo()
+STRING = calc_node_value_type.NodeValueTypeString()
+
+
+def beads(barz):
+    return barzer_objects.BeadFactory.make_beads_from_barz(barz)
+
+
+class FastPathTestCase(unittest.TestCase):
+    def setUp(self):
+        self.fast_path = FastPath.from_settings()
+
+    def test_number(self):
+        self.assertEquals(beads(self.fast_path.parse(' 220. ', [NUMBER]))[0].value, 220)
+        self.assertEquals(beads(self.fast_path.parse('98.6', [NUMBER]))[0].value, 98.6)
+        self.assertEquals(self.fast_path.parse('about 98', [NUMBER]), None)
+        self.assertEquals(self.fast_path.parse('220', [YES_NO]), None)
+
+    def test_yes_no(self):
+        self.assertEquals(beads(self.fast_path.parse('Yeah', [YES_NO]))[0].id, 'YES')
+        self.assertEquals(beads(self.fast_path.parse('no thanks', [YES_NO]))[0].id, 'NO')
+        self.assertEquals(self.fast_path.parse('maybe', [YES_NO]), None)
+
+    def test_string(self):
+        result = beads(self.fast_path.parse('John Smith', [STRING], entities=False))
+        self.assertEquals(STRING.match_all_beads(result)[:2], (True, 'John Smith'))
+        self.assertEquals(self.fast_path.parse('flat 220', [STRING], entities=False), None)
+        self.assertEquals(self.fast_path.parse('a very long free text answer', [STRING], entities=False), None)
+        self.assertEquals(self.fast_path.parse('yes', [STRING], entities=False), None)
+        # without a dictionary nothing rules out an entity some fact waits for
+        self.assertEquals(self.fast_path.parse('John Smith', [STRING]), None)
+
+    def test_string_without_dictionary(self):
+        # the default settings have no dictionary: while an entity fact could
+        # match, string answers go to barzer without counting as misses
+        self.assertEquals(self.fast_path.parse('John Smith', [STRING]), None)
+        self.assertEquals(self.fast_path.parse('John Smith', [NUMBER, STRING]), None)
+        stats = self.fast_path.stats()
+        self.assertEquals(stats['string'], {'hits': 0, 'misses': 0, 'hit_rate': 0.0})
+        self.assertEquals(stats['number']['misses'], 1)
+        self.assertTrue(self.fast_path.parse('John Smith', [STRING], entities=False))
+        self.assertEquals(self.fast_path.stats()['string']['hits'], 1)
+
+    def test_known_entity_goes_to_barzer(self):
+        dictionary = EntityDictionary().load(StringIO.StringIO(u'HEADACHE|headache\n'), 459, 3)
+        fast_path = FastPath.from_settings(dictionary=dictionary)
+        self.assertEquals(fast_path.parse('bad headache', [STRING]), None)
+        self.assertTrue(fast_path.parse('bad day', [STRING]))
+        self.assertTrue(fast_path.parse('bad headache', [STRING], entities=False))
+
+    def test_stats(self):
+        self.fast_path.parse('220', [NUMBER, YES_NO])
+        self.fast_path.parse('yes', [NUMBER, YES_NO])
+        self.fast_path.parse('hmm', [YES_NO])
+        stats = self.fast_path.stats()
+        self.assertEquals(stats['number'], {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+        self.assertEquals(stats['bool'], {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+    def test_disabled(self):
+        fast_path = FastPath.from_settings(enabled=False)
+        self.assertEquals(fast_path.parse('220', [NUMBER]), None)
+        self.assertEquals(fast_path.stats()['number']['misses'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+# pylint: disable=missing-docstring, invalid-name
+import unittest
+import json
+import StringIO
+from lib import calc_graph, convo_fact
+from lib.barzer import barzer_objects
+from lib.barzer.barzer_svc import Barzer
+from lib.barzer.local_extractor import EntityDictionary, LocalBarzer, TokenAutomaton
+from lib.barzer.stub_server import StubBarzerServer
+
+ENTITIES = u"""HEADACHE|headache|head ache|migraine
+PRESSURE|blood pressure|pressure
+BP_HIGH|high blood pressure
+"""
+
+
+class LocalExtractorTestCase(unittest.TestCase):
+    def setUp(self):
+        dictionary = EntityDictionary().load(StringIO.StringIO(ENTITIES), 459, 3).add_yes_no()
+        self.barzer = LocalBarzer(dictionary)
+
+    def test_automaton(self):
+        automaton = TokenAutomaton()
+        automaton.add(['a', 'b', 'c'], 'abc')
+        automaton.add(['b', 'c'], 'bc')
+        automaton.add(['c'], 'c')
+        self.assertEquals(
+            sorted(automaton.find(['x', 'a', 'b', 'c'])),
+            [(1, 4, 'abc'), (2, 4, 'bc'), (3, 4, 'c')])
+
+    def test_longest_match(self):
+        beads = self.barzer.get_json('I have HIGH blood-pressure and a Head Ache!')['beads']
+        self.assertEquals(
+            [(b['type'], b.get('id', b.get('value'))) for b in beads],
+            [('token', 'i'), ('token', 'have'), ('entity', 'BP_HIGH'), ('token', 'and'),
+             ('token', 'a'), ('entity', 'HEADACHE'), ('punct', '!')])
+
+    def test_beads(self):
+        beads = self.barzer.get_beads('migraine, pressure is 140 yes')
+        self.assertTrue(isinstance(beads[0], barzer_objects.Entity))
+        self.assertEquals(beads[0].id, 'HEADACHE')
+        self.assertEquals(beads[1].value, ',')
+        self.assertTrue(isinstance(beads[2], barzer_objects.ERC))
+        self.assertEquals(beads[2].ent.id, 'PRESSURE')
+        self.assertEquals(beads[2].range.lo, 140)
+        self.assertEquals(beads[3].id, 'YES')
+        self.assertEquals(self.barzer.stats['local_parses'], 1)
+
+    def test_numbers(self):
+        beads = self.barzer.get_beads('about 98.6 or 1,000')
+        self.assertEquals([b.value for b in beads if isinstance(b, barzer_objects.Number)], [98.6, 1000])
+
+    def test_protocol(self):
+        data = json.load(open('lib/tests/test2.json'))
+        barzer = LocalBarzer.from_protocols([data])
+        cg = calc_graph.CG()
+        cg.root = convo_fact.ConvoProtocol(data, barzer_svc=barzer)
+        cg.step()
+        cg.step('220')
+        resp = cg.step('yes')
+        self.assertTrue('flu' in resp[1].text)
+
+    def test_stub_server(self):
+        server = StubBarzerServer(extractor=self.barzer).start()
+        barzer = Barzer(instances={'default': server.instance_config()})
+        try:
+            beads = barzer.get_beads('head ache')
+            self.assertEquals(beads[0].id, 'HEADACHE')
+        finally:
+            barzer.transport.close()
+            server.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+# pylint: disable=missing-docstring, no-self-use
+from __future__ import division, absolute_import
+import os
+import shutil
+import tempfile
+import unittest
+from lib.barzer.barzer_svc import Barzer
+from lib.barzer.parse_cache import MemoryCache, ParseCache
+from lib.barzer.stub_server import StubBarzerServer
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class ParseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'barz.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_lru_ttl(self):
+        clock = FakeClock()
+        cache = MemoryCache(2, ttl=10, clock=clock)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.put('c', 3)
+        self.assertEquals(cache.get('a'), None)
+        self.assertEquals(cache.stats['evictions'], 1)
+        clock.now += 11
+        self.assertEquals(cache.get('b'), None)
+        self.assertEquals(cache.stats['expirations'], 1)
+
+    def test_persistent_tier(self):
+        barz = {'beads': [{'type': 'number', 'value': 220}]}
+        ParseCache(path=self.path).put('default', '220', barz)
+        cache = ParseCache(path=self.path)
+        self.assertEquals(cache.get('default', '220'), barz)
+        self.assertEquals(cache.get('default', '220'), barz)
+        self.assertEquals(cache.get('other', '220'), None)
+        stats = cache.stats()
+        self.assertEquals((stats['persistent_hits'], stats['memory_hits'], stats['misses']), (1, 1, 1))
+
+    def test_barzer_cache(self):
+        server = StubBarzerServer().start()
+        instances = {'default': server.instance_config()}
+        try:
+            for _ in range(2):
+                barzer = Barzer(instances=instances, cache=ParseCache(path=self.path))
+                for _ in range(3):
+                    self.assertEquals(barzer.get_beads('yes')[0].value, 'yes')
+                    barzer.get_json('no')
+            self.assertEquals(server.stats['requests'], 2)
+            server.stop()
+            barzer = Barzer(instances=instances, cache=ParseCache(path=self.path))
+            self.assertTrue('error' in barzer.get_json('maybe'))
+            self.assertTrue('error' in barzer.get_json('maybe'))
+            self.assertEquals(barzer.stats['remote_parses'], 2)
+        finally:
+            server.server_close()
+
+if __name__ == '__main__':
+    unittest.main()
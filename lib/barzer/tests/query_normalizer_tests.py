@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-docstring, no-self-use
+from __future__ import division, absolute_import
+import unittest
+from lib.barzer.barzer_svc import Barzer
+from lib.barzer.query_normalizer import QueryNormalizer
+from lib.barzer.stub_server import StubBarzerServer
+
+
+class QueryNormalizerTest(unittest.TestCase):
+    def test_folding(self):
+        norm = QueryNormalizer(aliases={'yess': 'yes'})
+        for raw in ('Yes', 'yes!!', ' YES ', 'yess', 'yesssss', u'ＹＥＳ'):
+            self.assertEquals(norm.normalize(raw), 'yes')
+        self.assertEquals(norm.collapse_report()[0][:2], ('yes', 6))
+
+    def test_numbers(self):
+        norm = QueryNormalizer()
+        self.assertEquals(norm.normalize('220.0'), '220')
+        self.assertEquals(norm.normalize('1,000 mg'), '1000 mg')
+        self.assertEquals(norm.normalize('temp 098.60'), 'temp 98.6')
+        self.assertEquals(norm.normalize('120/80'), '120/80')
+        self.assertEquals(norm.normalize('?'), '?')
+
+    def test_values_kept(self):
+        norm = QueryNormalizer()
+        for raw, folded in [
+                ('-5', '-5'), ('temp -2', 'temp -2'), ('.5', '0.5'), ('-0.50', '-0.5'), ('+5', '5'),
+                ('5%', '5 %'), ('$100', '$ 100'), (u'\u20ac20', u'\u20ac 20'.encode('utf-8')),
+                ('120-80', '120-80'), ('x-ray', 'x-ray')]:
+            self.assertEquals(norm.normalize(raw), folded)
+        self.assertNotEquals(norm.normalize('5'), norm.normalize('-5'))
+        self.assertNotEquals(norm.normalize('5'), norm.normalize('.5'))
+
+    def test_configurable(self):
+        norm = QueryNormalizer(lower=False, punctuation=False, numbers=False)
+        self.assertEquals(norm.normalize(' John   Smith! '), 'John Smith!')
+        self.assertEquals(norm.normalize('220.0'), '220.0')
+
+    def test_barzer_remote_parses(self):
+        server = StubBarzerServer().start()
+        try:
+            barzer = Barzer(instances={'default': server.instance_config()})
+            for raw in ('Yes', 'yes!!', ' YES ', 'yess', '220', '220.0', ' John Smith ', '-5'):
+                barzer.get_json(raw)
+            self.assertEquals(barzer.stats['remote_parses'], 4)
+            # the folded form is the cache key, barzer gets the raw query
+            self.assertEquals(server.stats['query:Yes'], 1)
+            self.assertEquals(server.stats['query:John Smith'], 1)
+            self.assertEquals(server.stats['query:-5'], 1)
+        finally:
+            server.stop()
+
+if __name__ == '__main__':
+    unittest.main()
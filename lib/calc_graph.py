@@ -1,8 +1,10 @@
 # pylint: disable=line-too-long, missing-docstring, invalid-name, superfluous-parens
 """ core calc graph objects """
 import sys  # pylint: disable=unused-import
+import heapq
 import cg_index
 import json
+from lib.barzer.parse_context import ParseContext
 
 
 class NodeValueNotSet(Exception):
@@ -81,6 +83,8 @@ class CGChildIterator(object):
     """ basic consecutive iterator
     this can be extended to skip over filled values etc
     """
+    __slots__ = ('children', 'pos')
+
     def __init__(self, children):
         self.children = children
         self.pos = 0
@@ -178,6 +182,10 @@ class CGNodeMeta(type):
 class CGNode(object):
     __metaclass__ = CGNodeMeta
     """ baseclass for the calc graph node """
+    # subclasses that declare __slots__ for all their attributes never
+    # allocate the instance dict
+    __slots__ = ('op', 'children', 'value', 'child_iter', '__dict__', '__weakref__')
+
     def __init__(
             self,
             op=None,
@@ -304,6 +312,53 @@ class CGNode(object):
         return ret
 
 
+class CGPropagation(object):
+    """ incremental, event driven re-evaluation of a DAG
+
+    nodes are known by their rank, a topological ordinal: every node ranks
+    below its parents. `changed` marks the parents of a node dirty, `run`
+    re-evaluates the dirty nodes in rank order, each exactly once, marking
+    the parents of those that changed. the work is proportional to the
+    changed nodes and their ancestors and does not recurse
+    """
+    def __init__(self, parents, evaluate):
+        """
+        Args:
+            parents (sequence(tuple(int))) - explicit parent edges, parent
+                ranks by rank. may be shared by any number of propagations
+            evaluate (callable(int)) - re-evaluates the node of a rank,
+                returns True if its value changed
+        """
+        self.parents = parents
+        self.evaluate = evaluate
+        self.dirty = []
+        self.marked = set()
+        self.evaluations = 0
+
+    def changed(self, rank):
+        """ schedules the parents of a changed node """
+        for parent in self.parents[rank]:
+            if parent not in self.marked:
+                self.marked.add(parent)
+                heapq.heappush(self.dirty, parent)
+
+    def run(self):
+        """ re-evaluates everything dirty, returns the number of evaluations """
+        evaluated = 0
+        while self.dirty:
+            rank = heapq.heappop(self.dirty)
+            self.marked.discard(rank)
+            evaluated += 1
+            if self.evaluate(rank):
+                self.changed(rank)
+        self.evaluations += evaluated
+        return evaluated
+
+    def clear(self):
+        del self.dirty[:]
+        self.marked.clear()
+
+
 class CGNodeBasic(CGNode):
     """ plain numeric node """
     node_type_id = 'basic'
@@ -399,6 +454,12 @@ class CG(object):
         return self.root.value
 
     def step(self, input_val=None):
+        """ single conversation turn
+        Args:
+            input_val (str|ParseContext) - user input, parsed at most once per turn
+        """
+        if input_val:
+            input_val = ParseContext.make(input_val)
         step_response = self.root.step(input_val=input_val)
         if self.is_active():
             if self.root.is_set():
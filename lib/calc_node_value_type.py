@@ -23,10 +23,13 @@ class NodeValueType(object):
     # attempted
     ALL_BEADS_NOT_MATCHED = (False, None, False)
     ALL_BEADS_NOT_ELIGIBLE = (False, None, True)
+    # bead classes `match_value` can match, None for any
+    bead_types = None
 
     def __init__(self, name=None, **kwargs):  # pylint: disable=unused-argument
         if name:
             self.type = barzer_objects.BeadFactory.get_type_by_name(name)
+            self.bead_types = self.type
 
     def as_dict(self):
         return {'type': getattr(self, 'type', None)}
@@ -46,7 +49,7 @@ class NodeValueType(object):
         """ returns a tuple:
             {is bead a match, what's beads interpreted value}
         """
-        if self.type == type(bead):
+        if getattr(self, 'type', None) is not None and self.type == type(bead):
             return True, bead
         else:
             return False, None
@@ -57,6 +60,8 @@ class NodeValueType(object):
 
 class NodeValueTypeString(NodeValueType):
     node_value_type = 'string'
+    # strings are matched over all beads only
+    bead_types = ()
     DEFAULT_MAX_BEADS = 128
     DEFAULT_OTHER_TYPES = (
         barzer_objects.Fluff,
@@ -83,25 +88,36 @@ class NodeValueTypeString(NodeValueType):
              concat (boolean) when true consecutive tokens will be concatenated
         """
         super(NodeValueTypeString, self).__init__()
+        self.string_types = (barzer_objects.Token,) + tuple(
+            barzer_objects.BeadFactory.get_type_by_name(x) if isinstance(x, basestring) else x
+            for x in other_types or self.DEFAULT_OTHER_TYPES)
         self.concat = concat
         self.max_beads = max_beads or self.DEFAULT_MAX_BEADS
         self.min_len = min_len or self.DEFAULT_MIN_LEN
         self.max_len = max_len or self.DEFAULT_MAX_LEN
         self.pattern = re.compile(pattern) if pattern else None
 
+    def _is_string_bead(self, beads):
+        """ per position flag - bead can be part of a string """
+        if isinstance(beads, barzer_objects.LazyBeads):
+            names = barzer_objects.BeadFactory.names_for(self.string_types)
+            return [x in names for x in beads.type_names()]
+        return [isinstance(b, self.string_types) for b in beads]
+
     def _yield_candidate_strings(self, beads):
-        lo, hi = 0, 0
-        for hi, b in enumerate(beads):
-            if (isinstance(b, barzer_objects.Token) or
-                    any(isinstance(b, self.DEFAULT_OTHER_TYPES))):
+        """ runs of consecutive string beads (single beads when not concatenating) """
+        lo = 0
+        flags = self._is_string_bead(beads)
+        for hi, is_string in enumerate(flags):
+            if is_string:
                 if not self.concat:
-                    yield [b]
+                    yield beads[hi:hi + 1]
             else:
-                if hi > lo:
+                if self.concat and hi > lo:
                     yield beads[lo:hi]
-                lo = hi
-        if hi >= lo:
-            yield beads[lo:hi + 1]
+                lo = hi + 1
+        if self.concat and len(flags) > lo:
+            yield beads[lo:]
 
     def concat_beads(self, beads):  # pylint: disable=no-self-use
         if len(beads) == 1:
@@ -144,6 +160,7 @@ class NodeValueTypeNumber(NodeValueType):
         super(NodeValueTypeNumber, self).__init__()
         self.lo, self.hi = lo, hi
         self.type = barzer_objects.Number
+        self.bead_types = (barzer_objects.Number, barzer_objects.Range, barzer_objects.ERC, barzer_objects.EVR)
 
     def match_number(self, num):
         if self.lo is not None:
@@ -193,6 +210,7 @@ class NodeValueTypeNumber(NodeValueType):
 
 class NodeValueTypeYesNo(NodeValueType):
     node_value_type = 'bool'
+    bead_types = barzer_objects.EntityBase
 
     def __init__(self, **kwargs):  # pylint: disable=unused-argument
         """
@@ -217,6 +235,7 @@ class NodeValueTypeYesNo(NodeValueType):
 
 class NodeValueTypeEntity(NodeValueType):
     node_value_type = 'entity'
+    bead_types = barzer_objects.EntityBase
 
     def __init__(self, eclass=None, subclass=None, id=None, **kwargs):  # pylint: disable=unused-argument
         """
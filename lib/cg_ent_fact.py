@@ -4,8 +4,11 @@
 import sys # pylint: disable=unused-import
 from functools import partial
 from lib.barzer import barzer_objects
-from lib import calc_graph, calc_node_value_type
+from lib.barzer.parse_context import ParseContext
+from lib.barzer.fast_path import fast_path as default_fast_path
+from lib import calc_graph, calc_node_value_type, convo_state
 from lib import barzer
+import lib.barzer.barzer_svc  # pylint: disable=unused-import
 
 class CompareExpression(object):
     """ arithmetic entity value expression """
@@ -32,32 +35,28 @@ class CompareExpression(object):
         return self.func(val)
 
     def __init__(self, data):
+        self.op = data.get('op', '=')
+        self.values = data.get('values')
         self.func = partial(
-            self.router[data.get('op', '=')], data.get('values'))
+            self.router[self.op], self.values)
 
-class CGEntityNode(calc_graph.CGNode):
-    """ """
-    node_type_id = 'entity'
+class EntityTemplate(object):
+    """ conversation independent part of an entity node: the entity, its value
+    type, expression and question. compiled once per protocol, shared by the
+    nodes of every conversation and never modified
+    """
+    __slots__ = ('ent', 'value_type', 'expression', 'question_prefix', 'ent_question', '__weakref__')
 
-    def __init__(
-            self, data, expression=None,
-            ent_question=None, barzer_svc=None
-        ):
+    def __init__(self, data, expression=None, ent_question=None):
         """
         Arguments:
-            ent (barzer.Entity|dict) - dict is passed to the Entity
+            data (barzer.Entity|dict) - dict is passed to the Entity
                 constructor
             expression (arithmetic expression over value)
         """
-        super(CGEntityNode, self).__init__()
-        self.activated = False
-
         self.ent = data if isinstance(
             data, barzer_objects.Entity) else barzer_objects.Entity(data)
 
-        self.ent_value = None
-        self.confidence = 0.5
-
         self.value_type = None
 
         if expression:
@@ -68,7 +67,6 @@ class CGEntityNode(calc_graph.CGNode):
             expression = data.get('expression')
             self.expression = CompareExpression(
                 expression) if expression else None
-            self.question_prefix = data.get('q_prefix')
         else:
             self.expression = None
 
@@ -80,15 +78,71 @@ class CGEntityNode(calc_graph.CGNode):
 
         self.question_prefix = self.value_type.default_question_prefix()
         self.ent_question = ent_question
+
+
+class CGEntityNode(convo_state.StateNode, calc_graph.CGNode):
+    """ """
+    node_type_id = 'entity'
+    __slots__ = (
+        'template', 'state', 'ordinal', 'barzer_svc', 'fast_path',
+        'active_value_type', 'special_response', 'activation_hook')
+
+    def __init__(
+            self, data, expression=None,
+            ent_question=None, barzer_svc=None, fast_path=None,
+            state=None, ordinal=0
+        ):
+        """
+        Arguments:
+            data (EntityTemplate|barzer.Entity|dict) - anything but a
+                template is compiled into one for this node alone
+            expression (arithmetic expression over value)
+            state (convo_state.ConvoState) - conversation state holding
+                this node at `ordinal`, a private one when not given
+        """
+        if state is None:
+            state, ordinal = convo_state.private_state()
+        self.state, self.ordinal = state, ordinal
+        super(CGEntityNode, self).__init__()
+        self.template = data if isinstance(
+            data, EntityTemplate) else EntityTemplate(data, expression, ent_question)
+
         self.barzer_svc = barzer_svc or barzer.barzer_svc.barzer
+        self.fast_path = fast_path or default_fast_path
         self.active_value_type = self.value_type
         self.special_response = None
+        # called with (node, is_activated) whenever the activation changes
+        self.activation_hook = None
+
+    ent = property(lambda self: self.template.ent)
+    value_type = property(lambda self: self.template.value_type)
+    expression = property(lambda self: self.template.expression)
+    question_prefix = property(lambda self: self.template.question_prefix)
+    ent_question = property(lambda self: self.template.ent_question)
+
+    def get_activated(self):
+        return self.state.is_active(self.ordinal)
+
+    def set_activated(self, activated):
+        self.state.set_active(self.ordinal, activated)
+
+    activated = property(get_activated, set_activated)
+
+    def get_ent_value(self):
+        return self.state.get_ent_value(self.ordinal)
+
+    def set_ent_value(self, ent_value):
+        self.state.set_ent_value(self.ordinal, ent_value)
+
+    ent_value = property(get_ent_value, set_ent_value)
 
     def as_dict(self):
         result = {
             'type': self.node_type_id,
         }
-        for attr in self.__dict__:
+        for attr in ('ent', 'value', 'ent_value', 'confidence', 'activated', 'expression',
+                     'value_type', 'active_value_type', 'question_prefix', 'ent_question',
+                     'special_response', 'barzer_svc', 'fast_path'):
             if getattr(self, attr, None) is not None:
                 result[attr] = str(getattr(self, attr))
         return result
@@ -103,12 +157,16 @@ class CGEntityNode(calc_graph.CGNode):
         return self.ent.ent_id()
 
     def deactivate(self):
+        if self.activated and self.activation_hook:
+            self.activation_hook(self, False)
         self.activated = False
         self.active_value_type = self.value_type
 
     def activate(self, value_type=None):
         if not self.activated:
             self.activated = True
+            if self.activation_hook:
+                self.activation_hook(self, True)
         self.active_value_type = value_type or self.value_type
 
     def is_ent_val_ready(self):
@@ -168,7 +226,7 @@ class CGEntityNode(calc_graph.CGNode):
     def analyze_beads(self, beads):
         """ analyzes beads. if applicable tries to fill value
         Args:
-            beads list(Beads)
+            beads list(Beads)|LazyBeads - only the bead types the value type can match are decoded
         Returns:
             bool(if computation could be completed)
         """
@@ -177,24 +235,22 @@ class CGEntityNode(calc_graph.CGNode):
             return self.set_val_and_compute(bead_val)
 
         if check_singles:
-            for bead in beads:
-                if isinstance(bead, (barzer_objects.EntityBase)):
-                    if bead.match_ent(self.ent):
-                        if not self.expression:
-                            self.ent_value, self.confidence = True, 1.0
-                            return self.compute_expression()
+            for bead in barzer_objects.beads_of_type(beads, barzer_objects.EntityBase):
+                if bead.match_ent(self.ent):
+                    if not self.expression:
+                        self.ent_value, self.confidence = True, 1.0
+                        return self.compute_expression()
+                    else:
+                        is_match, bead_val = self.active_value_type.match_value(bead)
+                        if is_match:
+                            return self.set_val_and_compute(bead_val)
                         else:
-                            is_match, bead_val = self.active_value_type.match_value(bead)
-                            if is_match:
-                                return self.set_val_and_compute(bead_val)
-                            else:
-                                self.set_special_response(bead_val)
+                            self.set_special_response(bead_val)
 
         if self.is_activated() and self.active_value_type:
-            print self.ent_id()
             # if nothing matched explicitly and node is activated
             prospect_values = list()
-            for bead in beads:
+            for bead in barzer_objects.beads_of_type(beads, self.active_value_type.bead_types):
                 is_match, bead_val = self.active_value_type.match_value(bead)
                 if is_match:
                     return self.set_val_and_compute(bead_val)
@@ -217,8 +273,8 @@ class CGEntityNode(calc_graph.CGNode):
                         self.get_pure_question())
                     return
                 else:
-                    # one value returned
-                    val = bead_val[0]
+                    # one value returned (or nothing to match at all)
+                    val = bead_val[0] if bead_val else None
             else:
                 val = bead_val
 
@@ -239,8 +295,10 @@ class CGEntityNode(calc_graph.CGNode):
             return None
         else:
             if input_val:
-                beads = barzer_objects.BeadFactory.make_beads_from_barz(
-                    self.barzer_svc.get_json(input_val))
+                ctx = ParseContext.make(input_val)
+                if self.activated:
+                    ctx.fast_parse(self.fast_path, [self.active_value_type])
+                beads = ctx.get_beads(self.barzer_svc)
                 calc_completed = self.analyze_beads(beads)
                 return calc_graph.CGStepResponse(
                     text=self.get_bot_response(beads),
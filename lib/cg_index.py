@@ -1,16 +1,63 @@
 from collections import defaultdict
+from lib.barzer import barzer_objects
 
 
 class Index(object):
+    """ entity id -> entity facts, plus the facts currently waiting for an answer """
 
-    def __init__(self):
-        self.__store = defaultdict(set)
+    def __init__(self, ent_index=None, facts=None):
+        """
+        Args:
+            ent_index (dict) - ent_id -> fact ids, compiled once and shared by
+                the conversations of a protocol
+            facts (dict) - fact id -> entity fact of this conversation
+        """
+        self.__store = ent_index if ent_index is not None else defaultdict(tuple)
+        self.facts = facts if facts is not None else {}
+        self.active = set()
+        # ids of the facts no decision depends on any more
+        self.pruned = set()
 
     def add(self, entity_fact):
-        self.__store[entity_fact.ent_id()].add(entity_fact)
+        """ registers a fact of an index that is not compiled """
+        self.facts[entity_fact.id] = entity_fact
+        self.__store[entity_fact.ent_id()] += (entity_fact.id,)
 
     def get(self, ent_id):
-        return self.__store[ent_id]
+        return frozenset(
+            self.facts[fact_id] for fact_id in self.__store.get(ent_id, ()) if fact_id not in self.pruned)
+
+    def matchable(self):
+        """ whether an entity bead could still be dispatched to a fact """
+        return any(fact_id not in self.pruned for fact_ids in self.__store.itervalues() for fact_id in fact_ids)
+
+    def prune(self, fact):
+        """ the fact is no longer dispatched """
+        self.pruned.add(fact.id)
+        self.active.discard(fact)
+
+    def set_active(self, entity_fact, active):
+        if active:
+            self.active.add(entity_fact)
+        else:
+            self.active.discard(entity_fact)
+
+    def dispatch(self, beads):
+        """ facts a turn has to analyze: the active ones and the ones whose
+        entity appears in `beads`. the cost depends on the input, not on the
+        protocol size
+        """
+        facts = list(self.active)
+        seen = set(facts)
+        for bead in barzer_objects.beads_of_type(beads, barzer_objects.EntityBase):
+            for fact_id in self.__store.get(bead.ent_id(), ()):
+                if fact_id in self.pruned:
+                    continue
+                fact = self.facts[fact_id]
+                if fact not in seen:
+                    seen.add(fact)
+                    facts.append(fact)
+        return facts
 
     def __str__(self):
         return str(self.__store)
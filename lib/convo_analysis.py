@@ -0,0 +1,154 @@
+# pylint: disable=missing-docstring, invalid-name
+""" ahead of time analysis of an AND/OR protocol
+
+built once per compiled protocol from its bitset program. for every fact it
+records
+
+    terminals   the terminals the fact takes part in deciding
+    fan_in      how many nodes use the fact
+    ask_rank    (entity facts) the order a walk from the first terminal down
+                the first children meets them, the order questions tie in
+
+for every terminal the entity facts below it, and for every composite its
+operator and children
+
+and for every composite its plans: the clauses that make it true, that is
+the minimal sets of entity facts to confirm, with their facts in ask order.
+the next question under a composite is the first unanswered fact of the
+live plan with the fewest unanswered facts, a scan of the precomputed plans
+instead of a walk down the priority queues of every level
+"""
+from operator import itemgetter
+from lib.convo_state import FALSE, UNSET
+
+
+def values_of(plan):
+    """ buffer -> tuple of the values of the facts of `plan`, read in C """
+    if len(plan) == 1:
+        fact = plan[0]
+        return lambda values: (values[fact],)
+    return itemgetter(*plan)
+
+
+class ProtocolAnalysis(object):
+
+    def __init__(self, bitset, terminals, fan_in, ask_rank, plans, composites):
+        """
+        Args:
+            bitset (convo_bitset.BitsetProgram)
+            terminals (tuple(tuple(int))) - fact ordinal -> terminal ordinals
+            fan_in (tuple(int)) - fact ordinal -> number of parents
+            ask_rank (dict) - entity fact ordinal -> ask order
+            plans (dict) - composite ordinal -> plans, each a tuple of the
+                entity fact ordinals that make it true, in ask order
+            composites (dict) - composite ordinal -> (operator, child ordinals)
+        """
+        self.bitset = bitset
+        self.terminals = terminals
+        self.fan_in = fan_in
+        self.ask_rank = ask_rank
+        self.plans = plans
+        self.composites = composites
+        # terminal ordinal -> entity fact ordinals below it, in ask order
+        facts_of = dict((t, []) for t in bitset.terminals)
+        for ordinal in sorted(ask_rank, key=ask_rank.get):
+            for t in terminals[ordinal]:
+                facts_of[t].append(ordinal)
+        self.facts_of = dict((t, tuple(facts)) for t, facts in facts_of.iteritems())
+        self.readers = dict(
+            (ordinal, tuple((plan, values_of(plan)) for plan in composite_plans))
+            for ordinal, composite_plans in plans.iteritems())
+        # terminal ordinal -> its bit in a reachability mask
+        self.terminal_bits = dict((t, 1 << i) for i, t in enumerate(bitset.terminals))
+        self.all_terminals = (1 << len(bitset.terminals)) - 1
+
+    @classmethod
+    def compile(cls, protocol):
+        """
+        Args:
+            protocol (convo_fact.Protocol)
+        Returns:
+            ProtocolAnalysis, None if the protocol has no bitset program
+        """
+        bitset = protocol.bitset
+        if bitset is None:
+            return None
+        ranks = protocol.parent_ranks
+        terminals = [()] * len(ranks)
+        for fact in reversed(protocol.order):
+            found = set()
+            for parent in ranks[fact.ordinal]:
+                if parent == protocol.ordinal:
+                    found.add(fact.ordinal)
+                else:
+                    found.update(terminals[parent])
+            terminals[fact.ordinal] = tuple(sorted(found))
+
+        ask_rank, seen = {}, set()
+        stack = list(reversed(protocol.terminals))
+        while stack:
+            fact = stack.pop()
+            if fact.id in seen:
+                continue
+            seen.add(fact.id)
+            if fact.ordinal in bitset.index:
+                ask_rank[fact.ordinal] = len(ask_rank)
+            else:
+                stack.extend(reversed(getattr(fact, 'facts', ())))
+
+        composites = {}
+        for fact in protocol.order:
+            if fact.ordinal in bitset.masks:
+                composites[fact.ordinal] = (fact.operator, tuple(
+                    f.ordinal for f in fact.facts if f.ordinal in bitset.index or f.ordinal in bitset.masks))
+
+        ordinal_of = [None] * len(bitset.index)
+        for ordinal, position in bitset.index.iteritems():
+            ordinal_of[position] = ordinal
+        plans = {}
+        for ordinal, clauses in bitset.true_clauses.iteritems():
+            composite_plans = []
+            for mask in clauses:
+                facts, rest = [], mask
+                while rest:
+                    position = rest.bit_length() - 1
+                    facts.append(ordinal_of[position])
+                    rest ^= 1 << position
+                facts.sort(key=ask_rank.get)
+                composite_plans.append(tuple(facts))
+            composite_plans.sort(key=lambda plan: [ask_rank[f] for f in plan])
+            plans[ordinal] = tuple(composite_plans)
+
+        return cls(bitset, tuple(terminals), tuple(len(r) for r in ranks), ask_rank, plans, composites)
+
+    def table(self):
+        """ the analysis as plain tuples and dicts, see `from_table` """
+        return self.terminals, self.fan_in, self.ask_rank, self.plans, self.composites
+
+    @classmethod
+    def from_table(cls, bitset, table):
+        return cls(bitset, *table)
+
+    def next_question(self, ordinal, values):
+        """ the best plan of a composite. the values of a plan's facts are read
+        straight from the state buffer, masking with protocol wide bitsets
+        would cost more than plans are long
+        Args:
+            values - fact ordinal -> convo_state tri-state code, the buffer of
+                a ConvoState
+        Returns:
+            (int, int) - unanswered facts of the plan and the first of them
+                to ask, (0, None) when the composite is true. None when no
+                plan is left
+        """
+        best = None
+        for plan, read in self.readers[ordinal]:
+            plan_values = read(values)
+            if FALSE in plan_values:
+                continue
+            remaining = plan_values.count(UNSET)
+            if not remaining:
+                return 0, None
+            if best is None or remaining < best[0]:
+                best = remaining, plan[plan_values.index(UNSET)]
+        return best
@@ -0,0 +1,232 @@
+# pylint: disable=missing-docstring, invalid-name
+""" compiled protocols in a binary file, memory mapped by the server
+
+scripts/compile_protocols.py writes one artifact per protocol json, after
+validating and merging its facts (convo_builder). the server maps an
+artifact read only on the first conversation over the protocol, decodes it
+into the objects of a convo_fact.Protocol and closes it again: the decoded
+protocol is per process, what the artifact saves is the parsing, merging
+and compiling. the tables a compiled protocol derives from its facts (parent
+ranks, entity index, bitset program and analysis) are stored as well, so
+decoding only builds the facts
+
+layout, little endian, sections 4 byte aligned in this order:
+
+    header      magic, format version, the section sizes and the string
+                holding the json of the graph node around the protocol
+    strings     n + 1 offsets into the string blob
+    nodes       the facts in order: kind, the strings of their id,
+                question, text, operator and entity json, their edges
+    edges       child node indexes of the composites
+    terminals   node indexes
+    aliases     (string, node index): ids of merged copies
+    blob        utf-8 of the strings, each distinct string stored once
+    tables      marshal of Protocol.tables(), unaligned. marshal is read
+                by the python that wrote it, the artifacts are compiled by
+                the python of the server (scripts/start_bot.sh)
+"""
+import json
+import marshal
+import mmap
+import os
+import struct
+from lib import convo_fact
+from lib.convo_builder import FactPool, entity_key
+
+MAGIC = 'ZPRT'
+# bumped on every layout change, older artifacts are refused
+VERSION = 2
+EXTENSION = '.zpc'
+
+HEADER = struct.Struct('<4sHxxIIIIIII')
+NODE = struct.Struct('<BxxxIIIIIII')
+NONE = 0xffffffff
+
+FACT, ENTITY, COMPOSITE = 0, 1, 2
+KINDS = {convo_fact.Fact: FACT, convo_fact.EntityFact: ENTITY, convo_fact.CompositeFact: COMPOSITE}
+
+
+class ArtifactError(ValueError):
+    """ not an artifact of this format version """
+
+
+class _Strings(object):
+    """ interned strings of an artifact being written """
+
+    def __init__(self):
+        self.index = {}
+        self.blob = []
+
+    def __call__(self, s):
+        if s is None:
+            return NONE
+        if not isinstance(s, unicode):
+            s = str(s).decode('utf-8')
+        i = self.index.get(s)
+        if i is None:
+            i = self.index[s] = len(self.blob)
+            self.blob.append(s.encode('utf-8'))
+        return i
+
+
+def dump(graph):
+    """
+    Args:
+        graph (dict) - convo protocol graph node, its `data` compiled into a
+            convo_fact.Protocol
+    Returns:
+        str - the artifact
+    """
+    protocol = graph['data']
+    strings = _Strings()
+    node_of = dict((f.id, i) for i, f in enumerate(protocol.order))
+    nodes, edges = [], []
+    for fact in protocol.order:
+        kind = KINDS[fact.__class__]
+        children = [node_of[f.id] for f in fact.facts] if kind == COMPOSITE else ()
+        nodes.append(NODE.pack(
+            kind, strings(fact.id), strings(fact.question),
+            strings(getattr(fact, 'text', None)), strings(getattr(fact, 'operator', None)),
+            strings(json.dumps(fact.entity, sort_keys=True) if kind == ENTITY else None),
+            len(edges), len(children)))
+        edges.extend(children)
+    terminals = [node_of[t.id] for t in protocol.terminals]
+    aliases = []
+    for fact_id, fact in sorted(protocol.facts.iteritems()):
+        if fact.id != fact_id:
+            aliases.extend((strings(fact_id), node_of[fact.id]))
+    outer = strings(json.dumps(dict((k, v) for k, v in graph.iteritems() if k != 'data'), sort_keys=True))
+    tables = marshal.dumps(protocol.tables(), 2)
+
+    offsets = [0]
+    for s in strings.blob:
+        offsets.append(offsets[-1] + len(s))
+    parts = [
+        HEADER.pack(MAGIC, VERSION, len(strings.blob), len(nodes), len(edges), len(terminals),
+                    len(aliases) // 2, outer, len(tables)),
+        struct.pack('<{}I'.format(len(offsets)), *offsets),
+        ''.join(nodes),
+        struct.pack('<{}I'.format(len(edges)), *edges),
+        struct.pack('<{}I'.format(len(terminals)), *terminals),
+        struct.pack('<{}I'.format(len(aliases)), *aliases),
+        ''.join(strings.blob),
+        tables]
+    return ''.join(parts)
+
+
+def write(path, graph):
+    """ writes the artifact of `graph` to `path`, replacing the file at once so
+    that servers mapping the old one keep reading it
+    """
+    tmp = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp, 'wb') as fp:
+        fp.write(dump(graph))
+    os.rename(tmp, path)
+
+
+class Artifact(object):
+    """ a memory mapped artifact """
+
+    def __init__(self, path):
+        """
+        Raises:
+            ArtifactError
+        """
+        self.path = path
+        try:
+            with open(path, 'rb') as fp:
+                self.mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except (EnvironmentError, ValueError), e:
+            # an empty file can not be mapped
+            raise ArtifactError('{}: {}'.format(path, e))
+        try:
+            self.layout()
+        except Exception:
+            self.mm.close()
+            raise
+
+    def layout(self):
+        """ the section offsets, from the header """
+        path = self.path
+        if len(self.mm) < HEADER.size:
+            raise ArtifactError('{}: truncated'.format(path))
+        (magic, version, n_strings, n_nodes, n_edges, n_terminals, n_aliases, outer,
+         n_tables) = HEADER.unpack_from(self.mm)
+        if magic != MAGIC:
+            raise ArtifactError('{}: not a compiled protocol'.format(path))
+        if version != VERSION:
+            raise ArtifactError('{}: format version {}, expected {}'.format(path, version, VERSION))
+        self.counts = n_strings, n_nodes, n_edges, n_terminals, n_aliases
+        offset = HEADER.size
+        # string offsets, read on the first decode
+        self.offsets = None
+        self.strings = offset
+        offset += 4 * (n_strings + 1)
+        self.nodes = offset
+        offset += NODE.size * n_nodes
+        self.edges = offset
+        offset += 4 * n_edges
+        self.terminals = offset
+        offset += 4 * n_terminals
+        self.aliases = offset
+        self.blob = offset + 8 * n_aliases
+        if len(self.mm) < self.blob or self.blob + self.offset(n_strings) + n_tables != len(self.mm):
+            raise ArtifactError('{}: truncated'.format(path))
+        self.tables = len(self.mm) - n_tables
+        self.outer = outer
+
+    def offset(self, i):
+        """ of string `i` in the blob, without reading the others """
+        return struct.unpack_from('<I', self.mm, self.strings + 4 * i)[0]
+
+    def string(self, i):
+        if i == NONE:
+            return None
+        if self.offsets is None:
+            self.offsets = struct.unpack_from('<{}I'.format(self.counts[0] + 1), self.mm, self.strings)
+        return self.mm[self.blob + self.offsets[i]:self.blob + self.offsets[i + 1]].decode('utf-8')
+
+    def graph(self, pool=None):
+        """ the graph node of the protocol, its `data` a convo_fact.Protocol
+        Args:
+            pool (convo_builder.FactPool) - entity templates to share
+        Raises:
+            ArtifactError - the artifact does not decode
+        """
+        try:
+            graph = json.loads(self.string(self.outer))
+            graph['data'] = self.protocol(pool)
+        except Exception, e:  # pylint: disable=broad-except
+            # corrupt strings, edges or tables fail in all sorts of ways
+            if isinstance(e, ArtifactError):
+                raise
+            raise ArtifactError('{}: does not decode, {}: {}'.format(self.path, e.__class__.__name__, e))
+        return graph
+
+    def protocol(self, pool=None):
+        pool = pool or FactPool()
+        _, n_nodes, n_edges, n_terminals, n_aliases = self.counts
+        string, mm = self.string, self.mm
+        edges = struct.unpack_from('<{}I'.format(n_edges), mm, self.edges)
+        facts, order = {}, []
+        for i in xrange(n_nodes):
+            kind, fact_id, question, text, operator, entity, first, n = NODE.unpack_from(mm, self.nodes + i * NODE.size)
+            data = {'node_id': string(fact_id), 'question': string(question)}
+            if kind == ENTITY:
+                data['data'] = json.loads(string(entity))
+                fact = convo_fact.EntityFact(data, template=pool.template(entity_key(data['data']), data['data']))
+            elif kind == COMPOSITE:
+                data.update(operator=string(operator), text=string(text))
+                fact = convo_fact.CompositeFact(data, facts=[order[c] for c in edges[first:first + n]])
+            else:
+                fact = convo_fact.Fact(data)
+            facts[fact.id] = fact
+            order.append(fact)
+        aliases = struct.unpack_from('<{}I'.format(2 * n_aliases), mm, self.aliases)
+        for i in xrange(0, len(aliases), 2):
+            facts[string(aliases[i])] = order[aliases[i + 1]]
+        terminals = tuple(order[t] for t in struct.unpack_from('<{}I'.format(n_terminals), mm, self.terminals))
+        return convo_fact.Protocol.from_facts(facts, order, terminals, marshal.loads(mm[self.tables:]))
+
+    def close(self):
+        self.mm.close()
@@ -0,0 +1,135 @@
+# pylint: disable=missing-docstring, invalid-name, no-member
+""" vectorized evaluation of many conversations over one protocol
+
+for simulations and what-if analytics. `BatchConvo` holds the fact state
+of N sessions of a compiled convo_fact.Protocol as NumPy matrices, one row
+per session and one column per fact ordinal:
+
+    answers     float64  entity answers, NaN while unanswered
+    values      int8     tri-state fact values (convo_state.UNSET/FALSE/TRUE)
+    confidence  float64
+
+`evaluate` computes every fact of every session in one call: expression
+thresholds, AND/OR composites, confidence products and maxes, then
+`next_questions` follows the highest scores down to the entity fact each
+session would be asked about next. answers of facts without an expression
+are taken as the fact's truth value
+"""
+import numpy as np
+from lib import convo_fact
+from lib.convo_state import UNSET, FALSE, TRUE
+
+COMPARE = {
+    '=': lambda x, values: x == values,
+    '<': lambda x, values: x < values,
+    '>': lambda x, values: x > values,
+    '<=': lambda x, values: x <= values,
+    '>=': lambda x, values: x >= values,
+    '!=': lambda x, values: x != values,
+    'in': lambda x, values: np.isin(x, values),
+    'out': lambda x, values: ~np.isin(x, values),
+    '<>': lambda x, values: (x >= values[0]) & (x <= values[1]),
+    '><': lambda x, values: (x < values[0]) | (x > values[1]),
+}
+
+
+class BatchConvo(object):
+    """ fact states of `sessions` conversations of one protocol """
+
+    def __init__(self, protocol, sessions):
+        """
+        Args:
+            protocol (convo_fact.Protocol|dict) - made of entity facts and
+                AND/OR composites
+            sessions (int)
+        """
+        self.protocol = protocol if isinstance(protocol, convo_fact.Protocol) else convo_fact.Protocol(protocol)
+        self.sessions = sessions
+        size = len(self.protocol.order)
+
+        self.entities, self.composites = [], []
+        # children by ordinal, padded with `size`: a column that always scores -1
+        max_children = max([len(f.facts) for f in self.protocol.order if hasattr(f, 'facts')] or [1])
+        self.children = np.full((size + 1, max_children), size, dtype=np.intp)
+        self.is_composite = np.zeros(size + 1, dtype=bool)
+        for fact in self.protocol.order:
+            if isinstance(fact, convo_fact.EntityFact):
+                self.entities.append((fact.ordinal, fact.template.expression))
+            elif getattr(fact, 'operator', None) in ('AND', 'OR'):
+                kids = np.array([c.ordinal for c in fact.facts if c.ordinal is not None], dtype=np.intp)
+                self.composites.append((fact.ordinal, fact.operator == 'AND', kids))
+                self.children[fact.ordinal, :len(kids)] = kids
+                self.is_composite[fact.ordinal] = True
+            else:
+                raise ValueError('{}: only entity facts and AND/OR composites can be batched'.format(fact.id))
+        self.terminals = np.array([t.ordinal for t in self.protocol.terminals], dtype=np.intp)
+        self.columns = dict((f.id, f.ordinal) for f in self.protocol.order)
+
+        self.answers = np.full((sessions, size), np.nan)
+        self.values = np.full((sessions, size), UNSET, dtype=np.int8)
+        self.confidence = np.full((sessions, size), 0.5)
+
+    def answer(self, fact_id, answers, sessions=None):
+        """ sets the answers of an entity fact
+        Args:
+            answers (array) - numbers, bools for facts without expression,
+                NaN for no answer
+            sessions (array) - rows to set, all of them by default
+        """
+        column = self.columns[fact_id]
+        if sessions is None:
+            self.answers[:, column] = answers
+        else:
+            self.answers[sessions, column] = answers
+
+    def evaluate(self):
+        """ recomputes the values and confidences of every fact of every session """
+        values, confidence = self.values, self.confidence
+        for ordinal, expression in self.entities:
+            answers = self.answers[:, ordinal]
+            answered = ~np.isnan(answers)
+            if expression is not None:
+                with np.errstate(invalid='ignore'):
+                    truth = COMPARE[expression.op](answers, expression.values)
+            else:
+                truth = answers != 0
+            values[:, ordinal] = np.where(answered, np.where(truth, TRUE, FALSE), UNSET)
+            confidence[:, ordinal] = np.where(answered, 1.0, 0.5)
+
+        for ordinal, is_and, kids in self.composites:
+            kid_values = values[:, kids]
+            if is_and:
+                true = (kid_values == TRUE).all(axis=1)
+                false = (kid_values == FALSE).any(axis=1)
+                conf = confidence[:, kids].prod(axis=1)
+            else:
+                true = (kid_values == TRUE).any(axis=1)
+                false = (kid_values == FALSE).all(axis=1)
+                conf = confidence[:, kids].max(axis=1)
+            values[:, ordinal] = np.where(true, TRUE, np.where(false, FALSE, UNSET))
+            confidence[:, ordinal] = np.where(true | false, 1.0, conf)
+
+    def scores(self):
+        """ priority of every fact, the padding column scores -1 """
+        scores = np.where(self.values == UNSET, self.confidence, 0.0)
+        return np.hstack([scores, np.full((self.sessions, 1), -1.0)])
+
+    def next_questions(self):
+        """ ordinal of the entity fact every session asks about next """
+        scores = self.scores()
+        rows = np.arange(self.sessions)
+        current = self.terminals[scores[:, self.terminals].argmax(axis=1)]
+        while self.is_composite[current].any():
+            kids = self.children[current]
+            best = kids[rows, scores[rows[:, None], kids].argmax(axis=1)]
+            current = np.where(self.is_composite[current], best, current)
+        return current
+
+    def decided(self):
+        """ index into the protocol terminals of the first true one, -1 while undecided """
+        true = self.values[:, self.terminals] == TRUE
+        return np.where(true.any(axis=1), true.argmax(axis=1), -1)
+
+    def terminal_values(self):
+        """ sessions x terminals tri-state matrix """
+        return self.values[:, self.terminals]
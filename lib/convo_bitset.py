@@ -0,0 +1,166 @@
+# pylint: disable=missing-docstring, invalid-name
+""" AND/OR protocols compiled to bitmasks
+
+every entity fact of a protocol gets a bit. a conversation's knowledge is
+two integers: the facts known true and the facts known false. every
+composite is compiled into
+
+    true clauses    it is true once all the facts of one clause are known true
+    false clauses   it is false once all the facts of one clause are known false
+
+(the DNF and the CNF of the composite over its facts). single fact clauses
+are folded into one `any` mask, so a flat AND over n facts is one true
+clause and one false `any` mask. composites are monotone (there is no NOT),
+so this is exactly what evaluating the AND/OR operators over tri-state
+children gives, in a handful of bitwise operations
+"""
+
+
+def absorb(clauses):
+    """ drops clauses that contain another clause """
+    if len(clauses) < 2:
+        # the popcounts below cost as much as the masks are wide
+        return list(clauses)
+    result = []
+    for c in sorted(set(clauses), key=lambda m: bin(m).count('1')):
+        if not any(r & c == r for r in result):
+            result.append(c)
+    return result
+
+
+def cross(left, right, limit):
+    """ pairwise unions of two clause lists, None beyond `limit` clauses """
+    if len(left) * len(right) > limit:
+        return None
+    return absorb([a | b for a in left for b in right])
+
+
+class ClauseMasks(object):
+    """ compiled truth and falsity conditions of one node """
+    __slots__ = ('true_any', 'true_all', 'false_any', 'false_all')
+
+    def __init__(self, true_clauses, false_clauses):
+        self.true_any, self.true_all = self.fold(true_clauses)
+        self.false_any, self.false_all = self.fold(false_clauses)
+
+    @classmethod
+    def folded(cls, true_any, true_all, false_any, false_all):
+        """ masks folded already, see `fields` """
+        masks = cls.__new__(cls)
+        masks.true_any, masks.true_all, masks.false_any, masks.false_all = true_any, true_all, false_any, false_all
+        return masks
+
+    def fields(self):
+        return self.true_any, self.true_all, self.false_any, self.false_all
+
+    @staticmethod
+    def fold(clauses):
+        single, multi = 0, []
+        for c in clauses:
+            if c & (c - 1):
+                multi.append(c)
+            else:
+                single |= c
+        return single, tuple(multi)
+
+    def value(self, known_true, known_false):
+        """ True, False or None (undecided) """
+        if known_true & self.true_any:
+            return True
+        for c in self.true_all:
+            if known_true & c == c:
+                return True
+        if known_false & self.false_any:
+            return False
+        for c in self.false_all:
+            if known_false & c == c:
+                return False
+        return None
+
+
+class BitsetProgram(object):
+    """ bitmask form of a compiled convo_fact.Protocol made of AND/OR composites """
+    # clauses per node, protocols that expand beyond it are not compiled
+    MAX_CLAUSES = 256
+
+    def __init__(self, index, masks, terminals, true_clauses=None):
+        """
+        Args:
+            index (dict) - entity fact ordinal -> position of its bit
+            masks (dict) - composite ordinal -> ClauseMasks
+            terminals (tuple(int)) - terminal ordinals in protocol order
+            true_clauses (dict) - composite ordinal -> tuple of the clauses
+                that make it true, unfolded
+        """
+        # positions rather than masks, n masks of up to n bits would take quadratic memory
+        self.index = index
+        self.masks = masks
+        self.terminals = terminals
+        self.true_clauses = true_clauses or {}
+
+    @classmethod
+    def compile(cls, protocol, max_clauses=None):
+        """
+        Args:
+            protocol (convo_fact.Protocol)
+        Returns:
+            BitsetProgram, None if the protocol has other operators or
+            expands beyond `max_clauses`
+        """
+        limit = max_clauses or cls.MAX_CLAUSES
+        index, masks, clauses, true_clauses = {}, {}, {}, {}
+        for fact in protocol.order:
+            if getattr(fact, 'ent_ordinal', None) is not None:
+                bit = 1 << len(index)
+                index[fact.ordinal] = len(index)
+                clauses[fact.id] = ([bit], [bit])
+                continue
+            operator = getattr(fact, 'operator', None)
+            children = [clauses[f.id] for f in fact.facts if f.id in clauses]
+            if operator not in ('AND', 'OR') or not children:
+                return None
+            # AND: true needs one true clause of every child, false needs a false one of any child
+            conj, disj = (0, 1) if operator == 'AND' else (1, 0)
+            product = [0]
+            union = []
+            for child in children:
+                product = cross(product, child[conj], limit)
+                if product is None:
+                    return None
+                union.extend(child[disj])
+            union = absorb(union)
+            if len(union) > limit:
+                return None
+            clauses[fact.id] = (product, union) if operator == 'AND' else (union, product)
+            masks[fact.ordinal] = ClauseMasks(*clauses[fact.id])
+            true_clauses[fact.ordinal] = tuple(clauses[fact.id][0])
+        return cls(index, masks, tuple(t.ordinal for t in protocol.terminals), true_clauses)
+
+    def table(self):
+        """ the program as plain tuples and dicts, see `from_table` """
+        masks = dict((ordinal, m.fields()) for ordinal, m in self.masks.iteritems())
+        return self.index, masks, self.terminals, self.true_clauses
+
+    @classmethod
+    def from_table(cls, table):
+        index, masks, terminals, true_clauses = table
+        return cls(index, dict((ordinal, ClauseMasks.folded(*m)) for ordinal, m in masks.iteritems()),
+                   terminals, true_clauses)
+
+    def bit(self, ordinal):
+        """ the bit of entity fact `ordinal` """
+        return 1 << self.index[ordinal]
+
+    def value(self, ordinal, known_true, known_false):
+        return self.masks[ordinal].value(known_true, known_false)
+
+    def decide(self, known_true, known_false):
+        """ ordinals of the true terminals and of those that can still become true """
+        true, reachable = [], []
+        for ordinal in self.terminals:
+            value = self.masks[ordinal].value(known_true, known_false)
+            if value:
+                true.append(ordinal)
+            if value is not False:
+                reachable.append(ordinal)
+        return true, reachable
@@ -0,0 +1,196 @@
+# pylint: disable=missing-docstring, invalid-name
+""" compilation of the facts of a convo protocol from its json
+
+one pass over the facts that the terminals reach, in time linear in the
+facts and their edges (plus sorting the ids of every level, which keeps the
+order and so the state ordinals of a protocol stable):
+
+    validate    unique ids, known node types, the fields of every type,
+                children and terminals that exist, no cycles
+    order       children before parents, by level (the longest path down to
+                an entity fact) then id, the facts no terminal reaches left out
+    merge       identical facts are compiled once: entity facts with the same
+                entity and question, composites with the same operator, text,
+                question and (merged) children, in any order for AND/OR. the
+                ids of the dropped copies resolve to the fact kept, the first
+                in order
+
+entity templates are shared through a FactPool, by all the protocols
+compiled with the same pool (the protocols of a server)
+"""
+import weakref
+from lib import cg_ent_fact
+
+
+# operators whose children can be merged in any order
+COMMUTATIVE = ('AND', 'OR')
+
+
+class ProtocolError(ValueError):
+    """ the protocol json does not describe a valid fact graph """
+
+
+def entity_key(entity):
+    """ hashable form of entity json, equal for equal data """
+    if isinstance(entity, dict):
+        return tuple(sorted((k, entity_key(v)) for k, v in entity.iteritems()))
+    if isinstance(entity, list):
+        return tuple(entity_key(v) for v in entity)
+    return entity
+
+
+class FactPool(object):
+    """ entity templates shared by the protocols compiled with the pool. the
+    pool does not keep them alive: a template is dropped with the last
+    protocol (version) using it
+    """
+
+    def __init__(self):
+        # entity_key -> cg_ent_fact.EntityTemplate
+        self.templates = weakref.WeakValueDictionary()
+
+    def template(self, key, entity):
+        """ the template of `entity`, compiled on the first use of its `key` """
+        # protocols compile concurrently, a race only compiles a template twice
+        template = self.templates.get(key)
+        if template is None:
+            template = self.templates[key] = cg_ent_fact.EntityTemplate(entity)
+        return template
+
+
+class ProtocolBuilder(object):
+    # fields every fact of a node type has to have
+    REQUIRED = {
+        'entity': ('data',),
+        'composite': ('operator', 'text', 'facts'),
+        None: (),
+    }
+
+    def __init__(self, fact_map, pool=None):
+        """
+        Args:
+            fact_map (dict) - node type -> Fact class, see convo_fact.Protocol
+            pool (FactPool) - entity templates to share, a private one if None
+        """
+        self.fact_map = fact_map
+        self.pool = pool or FactPool()
+
+    def build(self, data):
+        """
+        Args:
+            data (dict) - `facts` and `terminals` of a convo protocol
+        Returns:
+            (dict, list, tuple) - fact id -> Fact (the ids of merged copies
+                included), the facts in order, the terminal facts
+        Raises:
+            ProtocolError
+        """
+        raw = self.validate(data)
+        terminals = data.get('terminals')
+        if not terminals:
+            raise ProtocolError('protocol has no terminals')
+        for t in terminals:
+            if t not in raw:
+                raise ProtocolError('unknown terminal {}'.format(t))
+
+        facts, order = {}, []
+        # merge key -> the fact kept
+        kept = {}
+        for fact_id in self.order(raw, terminals):
+            fact = self.make(raw[fact_id], facts)
+            key = self.key(raw[fact_id], fact)
+            if key is not None:
+                fact = kept.setdefault(key, fact)
+            facts[fact_id] = fact
+            if fact.id == fact_id:
+                order.append(fact)
+
+        merged, seen = [], set()
+        for t in terminals:
+            if facts[t].id not in seen:
+                seen.add(facts[t].id)
+                merged.append(facts[t])
+        return facts, order, tuple(merged)
+
+    def validate(self, data):
+        """ fact id -> fact json """
+        raw = {}
+        for fact in data.get('facts', ()):
+            fact_id = fact.get('node_id')
+            if fact_id is None:
+                raise ProtocolError('fact without node_id: {!r}'.format(fact))
+            if fact_id in raw:
+                raise ProtocolError('duplicate fact {}'.format(fact_id))
+            node_type = fact.get('node_type')
+            if node_type not in self.fact_map:
+                raise ProtocolError('fact {} has unknown node_type {}'.format(fact_id, node_type))
+            for field in self.REQUIRED.get(node_type, ()):
+                if field not in fact:
+                    raise ProtocolError('fact {} has no {}'.format(fact_id, field))
+            if node_type == 'composite' and not fact['facts']:
+                raise ProtocolError('composite {} has no facts'.format(fact_id))
+            raw[fact_id] = fact
+        return raw
+
+    @staticmethod
+    def order(raw, terminals):
+        """ ids of the facts the terminals reach, by level then id """
+        level = {}
+        # depth first, iterative: (fact id, index of the next child to visit)
+        for t in terminals:
+            if t in level:
+                continue
+            stack, visiting = [(t, 0)], set([t])
+            while stack:
+                fact_id, i = stack[-1]
+                children = raw[fact_id].get('facts') or ()
+                if i < len(children):
+                    stack[-1] = (fact_id, i + 1)
+                    child = children[i]
+                    if child in level:
+                        continue
+                    if child not in raw:
+                        raise ProtocolError('fact {} uses unknown fact {}'.format(fact_id, child))
+                    if child in visiting:
+                        raise ProtocolError('cycle through fact {}'.format(child))
+                    visiting.add(child)
+                    stack.append((child, 0))
+                    continue
+                stack.pop()
+                visiting.discard(fact_id)
+                level[fact_id] = 1 + max(level[c] for c in children) if children else 0
+
+        levels = [[] for _ in xrange(1 + max(level.itervalues()))]
+        for fact_id, l in level.iteritems():
+            levels[l].append(fact_id)
+        return [fact_id for ids in levels for fact_id in sorted(ids)]
+
+    def make(self, data, facts):
+        """ the Fact of `data`, its children taken from the compiled `facts` """
+        node_type = data.get('node_type')
+        _type = self.fact_map[node_type]
+        if node_type == 'entity':
+            return _type(data, template=self.pool.template(entity_key(data['data']), data['data']))
+        if node_type == 'composite':
+            children, seen = [], set()
+            for fact_id in data['facts']:
+                child = facts[fact_id]
+                if child.id not in seen:
+                    seen.add(child.id)
+                    children.append(child)
+            return _type(data, facts=children)
+        return _type(data)
+
+    @staticmethod
+    def key(data, fact):
+        """ what identical facts have in common, None for facts never merged """
+        node_type = data.get('node_type')
+        if node_type == 'entity':
+            # the pool compiles one template per entity
+            return node_type, fact.template, fact.question
+        if node_type == 'composite':
+            children = [f.id for f in fact.facts]
+            if fact.operator in COMMUTATIVE:
+                children.sort()
+            return node_type, fact.operator, fact.text, fact.question, tuple(children)
+        return None
@@ -1,59 +1,151 @@
 # pylint: disable=missing-docstring, invalid-name, line-too-long
-from collections import defaultdict, deque
-import pqdict
-from toposort import toposort
+from collections import defaultdict
 from lib import cg_ent_fact
+from lib.barzer.barzer_objects import EntityId
 from lib.barzer.barzer_svc import barzer as default_barzer_instance
+from lib.barzer.fast_path import fast_path as default_fast_path
+from lib.barzer.parse_context import ParseContext
 from lib import calc_graph
 from lib import cg_index
+from lib import convo_analysis
+from lib import convo_bitset
+from lib import convo_builder
+from lib import convo_schedule
+from lib import convo_state
 
 
 class Fact(object):
-    def __init__(self, data, protocol=None):
+    def __init__(self, data):
         self.id = data['node_id']
         self.question = data.get('question')
+        # ids of the composite facts (or the protocol) this fact feeds into
+        self.parents = ()
+        # position in the conversation state, None when unreachable
+        self.ordinal = None
 
 
 class EntityFact(Fact):
-    def __init__(self, data, protocol=None):
+    def __init__(self, data, template=None):
         super(EntityFact, self).__init__(data)
         self.entity = data['data']
+        self.template = template or cg_ent_fact.EntityTemplate(self.entity)
+        # state position of the entity node
+        self.ent_ordinal = None
 
 
 class CompositeFact(Fact):
-    def __init__(self, data, protocol=None):
-        super(CompositeFact, self).__init__(data, protocol)
+    def __init__(self, data, facts=()):
+        super(CompositeFact, self).__init__(data)
         self.operator = data['operator']
         self.text = data['text']
-        if protocol:
-            self.facts = [protocol.facts[fact_id] for fact_id in data['facts'] if fact_id in protocol.facts]
+        self.op = OPERATORS[self.operator]() if self.operator in OPERATORS else None
+        self.facts = list(facts)
 
 
 class Protocol(object):
+    """ compiled protocol: facts in topological order with their entities,
+    value types, expressions, operators and parents resolved, identical facts
+    merged (see convo_builder). it is built once
+    and shared, read only, by all conversations that `instantiate` it; a
+    conversation only holds the values, confidences, activations and
+    priority queues, packed into a convo_state.ConvoState
+    """
     FACT_MAP = {
         'entity': EntityFact,
         'composite': CompositeFact,
         None: Fact
     }
 
-    def __init__(self, data):
-        self.facts = {}
-
-        # topologically sorting facts
-        G = defaultdict(set)
-        for fact in data['facts']:
-            self.facts[fact['node_id']] = fact
-            if fact.get('facts'):
-                for dependant_fact_id in fact['facts']:
-                    G[fact['node_id']].add(dependant_fact_id)
-
-        for facts_of_equal_priority in toposort(G):
-            for fact_id in facts_of_equal_priority:
-                fact = self.facts[fact_id]
-                _type = self.FACT_MAP.get(fact.get('node_type'))
-                self.facts[fact_id] = _type(fact, protocol=self)
-
-        self.terminals = set(self.facts[t] for t in data['terminals'])
+    def __init__(self, data, pool=None):
+        """
+        Args:
+            data (dict) - `facts` and `terminals` of a convo protocol
+            pool (convo_builder.FactPool) - entity templates shared with the
+                other protocols compiled with it
+        Raises:
+            convo_builder.ProtocolError
+        """
+        self.link(*convo_builder.ProtocolBuilder(self.FACT_MAP, pool).build(data))
+
+    @classmethod
+    def from_facts(cls, facts, order, terminals, tables=None):
+        """ protocol over facts built and merged already, see convo_artifact """
+        protocol = cls.__new__(cls)
+        protocol.link(facts, order, terminals, tables)
+        return protocol
+
+    def link(self, facts, order, terminals, tables=None):
+        """ resolves parents and state ordinals and compiles the bitset program
+        Args:
+            facts (dict) - fact id -> Fact, ids of merged copies resolve to the fact kept
+            order (list(Fact)) - the facts, children before parents
+            terminals (tuple(Fact))
+            tables (dict) - `tables()` of the same protocol, saved rather
+                than derived again
+        """
+        self.facts = facts
+        self.terminals = terminals
+        self.order = tuple(order)
+
+        # state ordinals: facts, the protocol node, then the entity nodes
+        for i, fact in enumerate(self.order):
+            fact.ordinal = i
+        self.ordinal = size = len(self.order)
+        for fact in self.order:
+            if isinstance(fact, EntityFact):
+                size += 1
+                fact.ent_ordinal = size
+        self.layout = convo_state.StateLayout(size + 1)
+        if tables is not None:
+            self.load_tables(tables)
+            return
+
+        # children before parents
+        parents = defaultdict(list)
+        for t in self.terminals:
+            parents[t.id].append(ConvoProtocol.protocol_id)
+        for fact in reversed(self.order):
+            for child in getattr(fact, 'facts', ()):
+                parents[child.id].append(fact.id)
+        for fact in self.order:
+            fact.parents = tuple(parents.get(fact.id, ()))
+        self.ent_index = defaultdict(list)
+        for fact in self.order:
+            if isinstance(fact, EntityFact):
+                self.ent_index[fact.template.ent.ent_id()].append(fact.id)
+        self.ent_index = dict((ent_id, tuple(ids)) for ent_id, ids in self.ent_index.iteritems())
+        # propagation edges by ordinal, the protocol node is the last one
+        self.parent_ranks = tuple(
+            tuple(self.ordinal if p == ConvoProtocol.protocol_id else self.facts[p].ordinal for p in fact.parents)
+            for fact in self.order) + ((),)
+        # None unless all composites are AND/OR
+        self.bitset = convo_bitset.BitsetProgram.compile(self)
+        self.analysis = convo_analysis.ProtocolAnalysis.compile(self)
+
+    def tables(self):
+        """ what `link` derives from the facts, as plain tuples, dicts, ints and strings """
+        return {
+            'parent_ranks': self.parent_ranks,
+            'ent_index': tuple((tuple(ent_id), ids) for ent_id, ids in self.ent_index.iteritems()),
+            'bitset': self.bitset.table() if self.bitset else None,
+            'analysis': self.analysis.table() if self.analysis else None,
+        }
+
+    def load_tables(self, tables):
+        self.parent_ranks = tables['parent_ranks']
+        ids = [fact.id for fact in self.order] + [ConvoProtocol.protocol_id]
+        for fact, ranks in zip(self.order, self.parent_ranks):
+            fact.parents = tuple(ids[p] for p in ranks)
+        self.ent_index = dict((EntityId.make(*ent_id), ids) for ent_id, ids in tables['ent_index'])
+        self.bitset = self.analysis = None
+        if tables['bitset'] is not None:
+            self.bitset = convo_bitset.BitsetProgram.from_table(tables['bitset'])
+        if tables['analysis'] is not None:
+            self.analysis = convo_analysis.ProtocolAnalysis.from_table(self.bitset, tables['analysis'])
+
+    def instantiate(self, barzer_svc=None, fast_path=None, scheduler=None):
+        """ fresh conversation state over this protocol """
+        return ConvoProtocol(self, barzer_svc=barzer_svc, fast_path=fast_path, scheduler=scheduler)
 
 
 class AndOperator(calc_graph.CGOperator):
@@ -86,56 +178,69 @@ class OrOperator(calc_graph.CGOperator):
         return max([ch.confidence for ch in children])
 
 
-class ConvoFact(calc_graph.CGNode):
+OPERATORS = {
+    'AND': AndOperator,
+    'OR': OrOperator,
+}
 
-    def __init__(self, protocol, fact, parents=None, barzer_svc=None):
-        super(ConvoFact, self).__init__()
-        self.confidence = 0.5
-        self.id = fact.id
-        self.question = fact.question
-        self.parents = set(parents or [])
+
+class ConvoFact(convo_state.StateNode, calc_graph.CGNode):
+    __slots__ = ('protocol', 'fact', 'barzer_svc')
+
+    def __init__(self, protocol, fact, barzer_svc=None):
         self.protocol = protocol
+        self.fact = fact
+        super(ConvoFact, self).__init__()
+        self.barzer_svc = barzer_svc or protocol.barzer_svc
 
-        if barzer_svc:
-            self.barzer_svc = barzer_svc
-        elif parents:
-            self.barzer_svc = parents[0].barzer_svc
-        else:
-            self.barzer_svc = protocol.barzer_svc
+    id = property(lambda self: self.fact.id)
+    question = property(lambda self: self.fact.question)
+    state = property(lambda self: self.protocol.state)
+    ordinal = property(lambda self: self.fact.ordinal)
+
+    @property
+    def parents(self):
+        return [self.protocol if p == self.protocol.id else self.protocol.facts[p] for p in self.fact.parents]
 
     def step(self, input_val=None):
         return calc_graph.CGStepResponse(
             text=self.question
         )
 
-    def activate(self):
-        self.current_child().activate()
-
-    def remove_parent(self, _id):
-        if _id in self.parents:
-            self.parents.remove(_id)
+    def leaf(self):
+        """ the entity fact the priority queues lead to """
+        return self.protocol.nodes[self.protocol.queue.leaf(self.ordinal)]
 
-    def add_parent(self, p):
-        self.parents.add(p)
+    def activate(self):
+        leaf = self.leaf()
+        if leaf is not self:
+            leaf.activate()
 
     def update(self, value, confidence):
-        if not self.value.equal(value) or self.confidence != confidence:
-            self.value = value
-            self.confidence = confidence
-
-            for parent in self.parents:
-                parent.pq[self] = self.score()
-                self.protocol.add_fact_to_update(parent)
-
-            if self.value.is_false() and self.children:
-                for ch in self.children:
-                    ch.remove_parent(self.id)
+        """ stores the value and confidence, True when they changed. parents
+        are re-evaluated by the protocol's propagation, decided parents are
+        final and left alone. the new score is picked up by the scheduler
+        before the next question is chosen
+        """
+        if self.value.value == value.value and self.confidence == confidence:
+            return False
+        decided = not self.value.is_set() and value.is_set()
+        self.value = value
+        self.confidence = confidence
+
+        self.protocol.queue.changed(self.ordinal)
+        if self.protocol.id in self.fact.parents:
+            self.protocol.child_changed(self)
+        self.protocol.propagation.changed(self.ordinal)
+        if decided and self.children:
+            self.protocol.prune(self)
+        return True
 
     def score(self):
         if self.value.is_set():
             return 0
         else:
-            return len(self.parents)
+            return len(self.fact.parents)
 
     def to_dict(self):
         data = {'id': self.id, 'value': self.value.to_dict(), 'confidence': self.confidence}
@@ -145,11 +250,19 @@ class ConvoFact(calc_graph.CGNode):
 
 
 class ConvoEntityFact(ConvoFact):
-    def __init__(self, protocol, fact, parents=None, barzer_svc=None):
-        super(ConvoEntityFact, self).__init__(protocol, fact, parents, barzer_svc)
-        self.ent = cg_ent_fact.CGEntityNode(data=fact.entity, barzer_svc=self.barzer_svc)
-        self.index = self.protocol.index
-        self.index.add(self)
+    __slots__ = ('ent',)
+
+    def __init__(self, protocol, fact, barzer_svc=None):
+        super(ConvoEntityFact, self).__init__(protocol, fact, barzer_svc)
+        self.ent = cg_ent_fact.CGEntityNode(
+            data=fact.template, barzer_svc=self.barzer_svc, fast_path=protocol.fast_path,
+            state=protocol.state, ordinal=fact.ent_ordinal)
+        self.ent.activation_hook = self.activation_changed
+
+    index = property(lambda self: self.protocol.index)
+
+    def activation_changed(self, node, active):  # pylint: disable=unused-argument
+        self.index.set_active(self, active)
 
     def ent_id(self):
         return self.ent.ent_id()
@@ -162,6 +275,15 @@ class ConvoEntityFact(ConvoFact):
         self.update(value=self.ent.value, confidence=self.ent.confidence)
         return resp
 
+    def update(self, value, confidence):
+        changed = super(ConvoEntityFact, self).update(value, confidence)
+        if changed:
+            self.protocol.set_known(self)
+        return changed
+
+    def leaf(self):
+        return self
+
     def activate(self):
         for fact in self.index.get(self.ent_id()):
             fact.ent.activate()
@@ -174,7 +296,7 @@ class ConvoEntityFact(ConvoFact):
         self.update(value=self.ent.value, confidence=self.ent.confidence)
 
     def analyze_input(self, input_val):
-        return self.analyze_beads(self.barzer_svc.get_beads(input_val))
+        return self.analyze_beads(ParseContext.make(input_val).get_beads(self.barzer_svc))
 
     def score(self):
         if self.value.is_set():
@@ -184,55 +306,100 @@ class ConvoEntityFact(ConvoFact):
 
 
 class ConvoCompositeFact(ConvoFact):
-    OPERATOR_MAP = {
-        'AND': AndOperator,
-        'OR': OrOperator,
-    }
-
-    def __init__(self, protocol, fact, parents=None, barzer_svc=None):
-        super(ConvoCompositeFact, self).__init__(protocol, fact, parents, barzer_svc=barzer_svc)
-        self.text = fact.text
+    __slots__ = ()
+    OPERATOR_MAP = OPERATORS
 
-        op = self.OPERATOR_MAP.get(fact.operator)
-        if op:
-            self.op = op()
+    def __init__(self, protocol, fact, barzer_svc=None):
+        super(ConvoCompositeFact, self).__init__(protocol, fact, barzer_svc=barzer_svc)
+        self.op = fact.op
 
-        self.pq = pqdict.maxpq()
-        self.set_children([
-            protocol.create_or_update_fact(f, [self]) for f in fact.facts])
+        self.set_children([protocol.facts[f.id] for f in fact.facts if f.id in protocol.facts])
 
         self.value = self.op.calc(children=self.get_children())
         self.confidence = self.op.confidence(children=self.get_children())
 
+    text = property(lambda self: self.fact.text)
+
     def set_children(self, children):
-        self._nodes = {}
-        for ch in children:
-            self.pq[ch] = 0
-            self._nodes[ch.id] = ch
+        # with an analysis the next question is looked up, not queued
+        if not self.protocol.template.analysis:
+            for position, ch in enumerate(children):
+                self.protocol.queue.push(self.ordinal, ch.ordinal, position)
         super(ConvoCompositeFact, self).set_children(children)
 
+    def leaf(self):
+        if self.protocol.template.analysis:
+            plan = self.protocol.plan(self.ordinal)
+            return self if plan is None or plan[1] is None else self.protocol.nodes[plan[1]]
+        return super(ConvoCompositeFact, self).leaf()
+
     def current_child(self):
-        return self.pq.top()
+        child = self.protocol.queue.top(self.ordinal)
+        return None if child is None else self.protocol.nodes[child]
 
     def update(self):
-        value = self.op.calc(children=self.get_children())
+        bitset = self.protocol.template.bitset
+        if bitset:
+            value = calc_graph.CGNodeValue(bitset.value(self.ordinal, self.protocol.known_true, self.protocol.known_false))
+        else:
+            value = self.op.calc(children=self.get_children())
         if value.is_set():
             confidence = 1.0
         else:
             confidence = self.op.confidence(children=self.get_children())
-        super(ConvoCompositeFact, self).update(value, confidence)
+        return super(ConvoCompositeFact, self).update(value, confidence)
 
     def score(self):
         if self.value.is_set():
             return 0
+        elif self.protocol.template.analysis:
+            # what the confidence of an AND over the facts left to ask would be
+            plan = self.protocol.plan(self.ordinal)
+            return 0 if plan is None else 0.5 ** plan[0]
         else:
             return self.confidence
 
     def step(self, input_val=None):
-        return self.current_child().step(input_val)
-
-
-class ConvoProtocol(calc_graph.CGNode):
+        leaf = self.leaf()
+        if leaf is self:
+            # decided, nothing left to ask
+            return calc_graph.CGStepResponse(
+                text=self.text if self.value.is_true() else self.protocol.NO_DIAGNOSIS
+            )
+        return leaf.step(input_val)
+
+
+class ConvoFacts(dict):
+    """ fact id -> node of a conversation. the ids of merged copies resolve,
+    through the protocol, to the node of the fact kept: they are looked up
+    rather than copied into every conversation, and iterating yields every
+    node once
+    """
+    __slots__ = ('aliases',)
+
+    def __init__(self, aliases):
+        """
+        Args:
+            aliases (dict) - `facts` of the Protocol
+        """
+        super(ConvoFacts, self).__init__()
+        self.aliases = aliases
+
+    def __missing__(self, fact_id):
+        return dict.__getitem__(self, self.aliases[fact_id].id)
+
+    def __contains__(self, fact_id):
+        return dict.__contains__(self, fact_id) or (
+            fact_id in self.aliases and dict.__contains__(self, self.aliases[fact_id].id))
+
+    def get(self, fact_id, default=None):
+        try:
+            return self[fact_id]
+        except KeyError:
+            return default
+
+
+class ConvoProtocol(convo_state.StateNode, calc_graph.CGNode):
     node_type_id = 'convo_protocol'
 
     FACT_MAP = {
@@ -240,37 +407,102 @@ class ConvoProtocol(calc_graph.CGNode):
         EntityFact: ConvoEntityFact
     }
 
-    def __init__(self, data, barzer_svc=None):
-        protocol = Protocol(data)
-        self.id = 'protocol'
-        self.index = cg_index.Index()
+    protocol_id = 'protocol'
+    # the answer once every terminal turned false
+    NO_DIAGNOSIS = 'Your answers do not match any diagnosis. Please visit your doctor'
+
+    def __init__(self, data, barzer_svc=None, fast_path=None, scheduler=None):
+        """
+        Args:
+            data (Protocol|dict) - compiled protocol, a dict is compiled for
+                this conversation alone
+            scheduler (callable) - ConvoProtocol -> object whose `next_fact()`
+                picks the questions instead of the scores of the facts, see
+                convo_gain.GainScheduler
+        """
+        protocol = data if isinstance(data, Protocol) else Protocol(data)
+        self.id = self.protocol_id
+        self.template = protocol
+        self.state = protocol.layout.new_state()
+        self.ordinal = protocol.ordinal
+        self.index = cg_index.Index(ent_index=protocol.ent_index)
 
         super(ConvoProtocol, self).__init__()
         self.terminals = {}
-        self.facts = defaultdict(set)
+        self.facts = ConvoFacts(protocol.facts)
         self.barzer_svc = barzer_svc or default_barzer_instance
-
-        self.visited_facts = set()
-        self.facts_to_update = deque()
+        self.fast_path = fast_path or default_fast_path
+
+        self.propagation = calc_graph.CGPropagation(protocol.parent_ranks, self.evaluate)
+        # nodes by ordinal, for the scheduler and the propagation
+        self.nodes = [None] * (protocol.ordinal + 1)
+        self.nodes[self.ordinal] = self
+        self.queue = convo_schedule.Scheduler(protocol.parent_ranks, self.score_of)
+        # terminals currently true
+        self.decided = set()
+        # entity fact bits of the protocol's bitset program
+        self.known_true = self.known_false = 0
+        # terminals that can still become true, bits of the protocol's analysis
+        self.reachable = protocol.analysis.all_terminals if protocol.analysis else 0
+        # composite ordinal -> its best plan for the current known bits
+        self.plans = {}
+        self.scheduler = None
+
+        # children are created before the composites that use them
+        for f in protocol.order:
+            _type = self.FACT_MAP.get(f.__class__)
+            if _type:
+                self.facts[f.id] = self.nodes[f.ordinal] = _type(self, f)
+        self.index.facts = self.facts
 
         for t in protocol.terminals:
-            self.facts[t.id] = self.terminals[t.id] = ConvoCompositeFact(protocol=self, fact=t, parents=[self])
+            self.terminals[t.id] = self.facts[t.id]
 
         self.set_children(self.terminals.values())
-        self.pq = pqdict.maxpq()
-        for t in self.terminals.values():
-            self.pq[t] = t.score()
-
-    def create_or_update_fact(self, f, parents):
-        if f.id in self.facts:
-            self.facts[f.id].add_parents(parents)
-        else:
-            _type = self.FACT_MAP.get(f.__class__)
-            if _type:
-                self.facts[f.id] = _type(self, f, parents)
-                self.facts[_type].add(self.facts[f.id])
-
-        return self.facts[f.id]
+        self.queue_terminals()
+        self.scheduler = scheduler(self) if scheduler else None
+
+    def snapshot(self):
+        """ copy of the conversation state, see `restore` """
+        return self.state.snapshot()
+
+    def restore(self, snapshot):
+        """ puts the conversation back into a `snapshot` of the same protocol """
+        # the scheduler starts over once the state is back, see below
+        scheduler, self.scheduler = self.scheduler, None
+        self.state.restore(snapshot)
+        self.propagation.clear()
+        self.decided = set(t for t in self.terminals.values() if t.value.is_true())
+        self.known_true = self.known_false = 0
+        self.plans = {}
+        analysis = self.template.analysis
+        if analysis:
+            self.reachable = analysis.all_terminals
+            for t in self.terminals.itervalues():
+                if t.value.is_false():
+                    self.reachable &= ~analysis.terminal_bits[t.ordinal]
+        self.index.active.clear()
+        self.index.pruned.clear()
+        self.queue.clear()
+        for fact in self.facts.itervalues():
+            if isinstance(fact, ConvoCompositeFact):
+                if analysis:
+                    continue
+                for position, ch in enumerate(fact.children):
+                    self.queue.push(fact.ordinal, ch.ordinal, position)
+            else:
+                self.set_known(fact)
+                if fact.ent.activated:
+                    self.index.set_active(fact, True)
+        self.queue_terminals()
+        # parents first, so that whether a fact is still needed is known
+        for f in reversed(self.template.order):
+            fact = self.nodes[f.ordinal]
+            if isinstance(fact, ConvoCompositeFact) and fact.value.is_set():
+                self.prune(fact)
+        self.scheduler = scheduler
+        if scheduler:
+            scheduler.reset()
 
     def get_nodes(self):
         res = {}
@@ -279,37 +511,145 @@ class ConvoProtocol(calc_graph.CGNode):
                 res[k] = v
         return res
 
-    def add_fact_to_update(self, fact):
-        if fact.id not in self.visited_facts:
-            self.facts_to_update.append(fact)
-            self.visited_facts.add(fact.id)
+    def evaluate(self, rank):
+        """ propagation callback. the protocol node has nothing to compute and
+        decided composites are final
+        """
+        if rank == self.ordinal:
+            return False
+        fact = self.facts[self.template.order[rank].id]
+        if fact.value.is_set():
+            return False
+        return fact.update()
+
+    def is_needed(self, fact):
+        """ whether some parent of `fact` is undecided and not pruned """
+        for parent in fact.parents:
+            if not parent.value.is_set() and parent.id not in self.index.pruned:
+                return True
+        return False
+
+    def prune(self, composite):
+        """ detaches the children of a decided composite. facts left without
+        an undecided parent leave the dispatch index, and the children of
+        such composites are detached in turn
+        """
+        stack = [composite]
+        while stack:
+            node = stack.pop()
+            for ch in node.children:
+                self.queue.remove(node.ordinal, ch.ordinal)
+                if ch.id in self.index.pruned or self.is_needed(ch):
+                    continue
+                self.index.prune(ch)
+                if isinstance(ch, ConvoCompositeFact):
+                    stack.append(ch)
+                else:
+                    ch.deactivate()
+
+    def queue_terminals(self):
+        """ terminals tie in the order the protocol lists them """
+        for position, t in enumerate(self.template.terminals):
+            self.queue.push(self.ordinal, t.ordinal, position)
+
+    def score_of(self, ordinal):
+        return self.nodes[ordinal].score()
+
+    def child_changed(self, child):
+        if child.value.is_true():
+            self.decided.add(child)
+        else:
+            self.decided.discard(child)
+        if child.value.is_false() and self.template.analysis:
+            self.reachable &= ~self.template.analysis.terminal_bits[child.ordinal]
+
+    def set_known(self, fact):
+        """ mirrors the value of an entity fact into the known bits """
+        if self.template.bitset:
+            bit = self.template.bitset.bit(fact.ordinal)
+            value = fact.value.value
+            self.known_true = self.known_true | bit if value is True else self.known_true & ~bit
+            self.known_false = self.known_false | bit if value is False else self.known_false & ~bit
+        analysis = self.template.analysis
+        if analysis:
+            # the plans of the terminals the fact takes part in may have changed
+            self.plans = {}
+            for t in analysis.terminals[fact.ordinal]:
+                self.queue.changed(t)
+        if self.scheduler:
+            self.scheduler.resolved(fact)
+
+    def plan(self, ordinal):
+        """ unanswered facts and the next one to ask of a composite's best plan,
+        see ProtocolAnalysis.next_question
+        """
+        try:
+            return self.plans[ordinal]
+        except KeyError:
+            plan = self.plans[ordinal] = self.template.analysis.next_question(ordinal, self.state.buf)
+            return plan
+
+    def reachable_terminals(self):
+        """ ids of the terminals that can still become true """
+        analysis = self.template.analysis
+        if analysis:
+            return [self.template.order[t].id for t in analysis.bitset.terminals
+                    if self.reachable & analysis.terminal_bits[t]]
+        if self.template.bitset:
+            _, reachable = self.template.bitset.decide(self.known_true, self.known_false)
+            return [self.template.order[ordinal].id for ordinal in reachable]
+        return [t.id for t in self.template.terminals if not self.facts[t.id].value.is_false()]
 
     def update_facts(self):
-        while len(self.facts_to_update) > 0:
-            f = self.facts_to_update.popleft()
-            if not f.id == self.id:
-                f.update()
-        self.visited_facts = set()
+        self.propagation.run()
 
     def step(self, input_val=None):
-        self.current_child().activate()
+        fact = self.next_fact()
+        if fact is not self:
+            fact.activate()
 
         if input_val:
-            for f in self.facts[ConvoEntityFact]:
-                f.analyze_input(input_val)
+            ctx = ParseContext.make(input_val)
+            ctx.fast_parse(self.fast_path, self.active_value_types(), self.index.matchable())
+            beads = ctx.get_beads(self.barzer_svc)
+            for f in self.index.dispatch(beads):
+                f.analyze_beads(beads)
                 f.deactivate()
         self.update_facts()
 
-        resp = self.current_child().step()
-
-        for _id, t in self.terminals.items():
-            if t.value.is_true():
-                self.value.set_val(True)
-                return calc_graph.CGStepResponse(
-                    text=t.text
-                )
-
-        return resp
+        if self.decided:
+            t = min(self.decided, key=lambda t: t.ordinal)
+            if self.scheduler:
+                self.scheduler.completed()
+            self.value.set_val(True)
+            return calc_graph.CGStepResponse(
+                text=t.text
+            )
+
+        fact = self.next_fact()
+        if fact is self or not self.reachable_terminals():
+            # nothing left to ask, or every terminal turned false (the
+            # queues still lead to a decided one then)
+            if self.scheduler:
+                self.scheduler.completed()
+            self.value.set_val(False)
+            return calc_graph.CGStepResponse(
+                text=self.NO_DIAGNOSIS
+            )
+        return fact.step()
+
+    def active_value_types(self):
+        """ value types of the entity facts waiting for an answer """
+        return [f.ent.active_value_type for f in self.index.active]
 
     def current_child(self):
-        return self.pq.top()
+        return self.nodes[self.queue.top(self.ordinal)]
+
+    def next_fact(self):
+        """ the entity fact to ask about next, a decided terminal or the protocol
+        itself when nothing is left to ask
+        """
+        if self.scheduler:
+            return self.scheduler.next_fact()
+        terminal = self.queue.top(self.ordinal)
+        return self if terminal is None else self.nodes[terminal].leaf()
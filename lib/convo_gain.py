@@ -0,0 +1,208 @@
+# pylint: disable=missing-docstring, invalid-name
+""" information gain question scheduling
+
+a GainScheduler asks about the entity fact whose answer is expected to
+settle most of the undecided terminals. how unsettled a terminal is, is the
+entropy of the probability that it becomes true, computed bottom up over the
+AND/OR structure from per fact priors, facts taken as independent. a
+terminal the answer decides counts fully, one it only makes more or less
+likely counts in part, and an answer that makes a terminal true settles all
+of them since it ends the conversation
+
+priors are learned from ended conversations (FactPriors.observe), those
+that reached a true terminal and those where every terminal turned false,
+so that the priors are not skewed towards the answers of diagnoses. the
+probabilities of a conversation are memoized: an answered fact re-computes
+its ancestors only, and the gains of the facts that share no terminal with
+it are kept
+
+    scheduler = functools.partial(GainScheduler, priors=priors)
+    convo = protocol.instantiate(scheduler=scheduler)
+"""
+import heapq
+import math
+from lib.convo_state import TRUE, UNSET
+
+
+def entropy(p):
+    if p <= 0.0 or p >= 1.0:
+        return 0.0
+    return -p * math.log(p, 2) - (1 - p) * math.log(1 - p, 2)
+
+
+class FactPriors(object):
+    """ how often the entity facts of a protocol were true in ended
+    conversations, by fact id so that they outlive compiled protocols
+    """
+
+    def __init__(self, weight=1.0):
+        """
+        Args:
+            weight (float) - pseudo count of true and of false answers every
+                fact starts from
+        """
+        self.weight = weight
+        # fact id -> [false answers, true answers]
+        self.counts = {}
+
+    def observe(self, convo):
+        """ counts the answered entity facts of a conversation """
+        for fact in convo.template.order:
+            if getattr(fact, 'ent_ordinal', None) is None:
+                continue
+            value = convo.state.get_value(fact.ordinal)
+            if value is not None:
+                self.counts.setdefault(fact.id, [0, 0])[value] += 1
+
+    def probability(self, fact_id):
+        """ of the fact being true """
+        false, true = self.counts.get(fact_id, (0, 0))
+        return (true + self.weight) / (false + true + 2.0 * self.weight)
+
+
+class GainScheduler(object):
+    """ picks the next question of a ConvoProtocol by expected information gain """
+
+    def __init__(self, convo, priors=None):
+        """
+        Args:
+            convo (convo_fact.ConvoProtocol) - over an AND/OR protocol
+            priors (FactPriors) - uniform when not given
+        """
+        if convo.template.analysis is None:
+            raise ValueError('information gain needs an AND/OR protocol')
+        self.convo = convo
+        self.analysis = convo.template.analysis
+        self.priors = priors or FactPriors()
+        self.reset()
+
+    def reset(self):
+        """ recomputes all probabilities, after the conversation state was replaced """
+        template = self.convo.template
+        # the priors observed this conversation's end
+        self.observed = False
+        # fact ordinal -> probability of being true
+        self.prob = [0.0] * (template.ordinal + 1)
+        # entity fact ordinal -> `outcomes` of asking about it
+        self.gains = {}
+        for fact in template.order:
+            self.prob[fact.ordinal] = self.probability(fact.ordinal, self.prob)
+
+    def probability(self, ordinal, prob):
+        """ of fact `ordinal` being true, given the probabilities `prob` of its children """
+        value = self.convo.state.buf[ordinal]
+        if value != UNSET:
+            return 1.0 if value == TRUE else 0.0
+        composite = self.analysis.composites.get(ordinal)
+        if composite is None:
+            return self.priors.probability(self.convo.template.order[ordinal].id)
+        operator, children = composite
+        if operator == 'AND':
+            p = 1.0
+            for child in children:
+                p *= prob[child]
+            return p
+        q = 1.0
+        for child in children:
+            q *= 1.0 - prob[child]
+        return 1.0 - q
+
+    def ancestors(self, ordinal, prob):
+        """ re-computes the ancestors of `ordinal` into `prob`, children first """
+        ranks = self.convo.template.parent_ranks
+        top = self.convo.template.ordinal
+        heap = list(ranks[ordinal])
+        heapq.heapify(heap)
+        done = set()
+        while heap:
+            node = heapq.heappop(heap)
+            if node in done or node == top:
+                continue
+            done.add(node)
+            prob[node] = self.probability(node, prob)
+            for parent in ranks[node]:
+                heapq.heappush(heap, parent)
+
+    def resolved(self, fact):
+        """ the entity fact `fact` was answered """
+        self.prob[fact.ordinal] = self.probability(fact.ordinal, self.prob)
+        self.ancestors(fact.ordinal, self.prob)
+        for t in self.analysis.terminals[fact.ordinal]:
+            for f in self.analysis.facts_of[t]:
+                self.gains.pop(f, None)
+
+    def outcomes(self, ordinal):
+        """ what answering entity fact `ordinal` does to the terminals above it
+        Returns:
+            (float, float, float, bool) - the probability of a true answer,
+                the entropy the terminals lose on a true and on a false
+                answer, and whether a true answer makes one of them true
+        """
+        p = self.prob[ordinal]
+        drops, ends = [], False
+        for value in (1.0, 0.0):
+            prob = _Overlay(self.prob)
+            prob[ordinal] = value
+            self.ancestors(ordinal, prob)
+            drop = 0.0
+            for t in self.undecided(self.analysis.terminals[ordinal]):
+                drop += entropy(self.prob[t]) - entropy(prob[t])
+                ends = ends or (value and prob[t] == 1.0)
+            drops.append(drop)
+        return p, drops[0], drops[1], ends
+
+    def gain(self, ordinal, total):
+        """ expected entropy drop of asking about entity fact `ordinal`. a true
+        terminal ends the conversation, which settles all `total` entropy
+        """
+        outcomes = self.gains.get(ordinal)
+        if outcomes is None:
+            outcomes = self.gains[ordinal] = self.outcomes(ordinal)
+        p, if_true, if_false, ends = outcomes
+        return p * (total if ends else if_true) + (1 - p) * if_false
+
+    def undecided(self, terminals):
+        reachable, bits = self.convo.reachable, self.analysis.terminal_bits
+        values = self.convo.state.buf
+        return [t for t in terminals if reachable & bits[t] and values[t] == UNSET]
+
+    def next_fact(self):
+        """ the unanswered entity fact with the highest gain, ties in ask order """
+        values, pruned = self.convo.state.buf, self.convo.index.pruned
+        order = self.convo.template.order
+        ask_rank = self.analysis.ask_rank
+        best, best_key = None, None
+        terminals = self.undecided(self.analysis.bitset.terminals)
+        total = sum(entropy(self.prob[t]) for t in terminals)
+        for t in terminals:
+            for f in self.analysis.facts_of[t]:
+                if values[f] != UNSET or order[f].id in pruned:
+                    continue
+                key = (self.gain(f, total), -ask_rank[f])
+                if best_key is None or key > best_key:
+                    best, best_key = f, key
+        return self.convo if best is None else self.convo.nodes[best]
+
+    def completed(self):
+        """ the conversation ended: a terminal is true or none can be any more """
+        if not self.observed:
+            self.observed = True
+            self.priors.observe(self.convo)
+
+
+class _Overlay(object):
+    """ changed probabilities over the memoized ones """
+    __slots__ = ('base', 'changed')
+
+    def __init__(self, base):
+        self.base = base
+        self.changed = {}
+
+    def __getitem__(self, ordinal):
+        try:
+            return self.changed[ordinal]
+        except KeyError:
+            return self.base[ordinal]
+
+    def __setitem__(self, ordinal, p):
+        self.changed[ordinal] = p
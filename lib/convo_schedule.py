@@ -0,0 +1,133 @@
+# pylint: disable=missing-docstring, invalid-name
+""" next question scheduling, shared by all levels of a protocol
+
+every node with children (the composites and the protocol itself) keeps its
+queued children in buckets keyed by score. scores come from a handful of
+values (0 once a fact is decided, the confidence of unanswered facts and
+their products), so finding the best bucket is a max over a few keys. ties
+go to the lowest position, the order the protocol lists the children in
+
+score changes are not applied as they happen: `changed` marks a fact and
+the next query re-scores every marked fact once, however many times it
+changed during the turn. the fact a walk from a node leads to is cached
+until a flush moves a fact under it, so asking for the next question of the
+whole protocol again within a turn is a dict lookup
+"""
+import heapq
+
+
+class Scheduler(object):
+    """ priority queues of one conversation, indexed by node ordinal """
+    __slots__ = ('parents', 'score', 'keys', 'members', 'buckets', 'tops', 'leaves', 'dirty')
+
+    def __init__(self, parents, score):
+        """
+        Args:
+            parents (tuple(tuple(int))) - parent ordinals of every node ordinal
+            score (callable) - ordinal -> current score of the node
+        """
+        self.parents = parents
+        self.score = score
+        self.clear()
+
+    def clear(self):
+        size = len(self.parents)
+        # score each node is queued under, the same for all of its parents
+        self.keys = [None] * size
+        # parent -> {queued child ordinal: position}, None for nodes without children
+        self.members = [None] * size
+        # parent -> {score: heap of (position, child)}, stale entries are dropped lazily
+        self.buckets = [None] * size
+        # parent -> best child, or None when nothing is queued
+        self.tops = {}
+        # node -> the node its walk down the queues ends at
+        self.leaves = {}
+        self.dirty = set()
+
+    def push(self, parent, child, position):
+        """ queues `child` under `parent`, `position` breaks score ties """
+        members = self.members[parent]
+        if members is None:
+            members = self.members[parent] = {}
+            self.buckets[parent] = {}
+        key = self.keys[child]
+        if key is None:
+            key = self.keys[child] = self.score(child)
+        members[child] = position
+        heapq.heappush(self.buckets[parent].setdefault(key, []), (position, child))
+        self.invalidate(parent)
+
+    def remove(self, parent, child):
+        members = self.members[parent]
+        if members and child in members:
+            del members[child]
+            self.invalidate(parent)
+
+    def contains(self, parent, child):
+        members = self.members[parent]
+        return members is not None and child in members
+
+    def changed(self, ordinal):
+        """ the score of `ordinal` is to be read again before the next query """
+        self.dirty.add(ordinal)
+
+    def flush(self):
+        """ re-scores the facts marked since the last query """
+        dirty, self.dirty = self.dirty, set()
+        for child in dirty:
+            key = self.score(child)
+            if key == self.keys[child]:
+                continue
+            self.keys[child] = key
+            for parent in self.parents[child]:
+                members = self.members[parent]
+                position = members.get(child) if members else None
+                if position is not None:
+                    heapq.heappush(self.buckets[parent].setdefault(key, []), (position, child))
+                    self.invalidate(parent)
+
+    def invalidate(self, parent):
+        self.tops.pop(parent, None)
+        if self.leaves:
+            self.leaves = {}
+
+    def top(self, parent):
+        """ the best child queued under `parent`, None if there is none """
+        if self.dirty:
+            self.flush()
+        try:
+            return self.tops[parent]
+        except KeyError:
+            pass
+        buckets, members, keys = self.buckets[parent], self.members[parent], self.keys
+        best = None
+        while buckets:
+            key = max(buckets)
+            heap = buckets[key]
+            while heap and (heap[0][1] not in members or keys[heap[0][1]] != key):
+                heapq.heappop(heap)
+            if heap:
+                best = heap[0][1]
+                break
+            del buckets[key]
+        self.tops[parent] = best
+        return best
+
+    def leaf(self, ordinal):
+        """ the node the best children lead to from `ordinal`, `ordinal` itself
+        when nothing is queued under it
+        """
+        if self.dirty:
+            self.flush()
+        try:
+            return self.leaves[ordinal]
+        except KeyError:
+            pass
+        node = ordinal
+        while True:
+            child = self.top(node)
+            if child is None:
+                break
+            node = child
+        self.leaves[ordinal] = node
+        return node
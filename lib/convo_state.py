@@ -0,0 +1,254 @@
+# pylint: disable=missing-docstring, invalid-name
+""" packed per conversation node state
+
+the mutable state of a conversation lives in a single bytearray, laid out
+as parallel arrays indexed by node ordinal:
+
+    values      int8[n]     tri-state node value: unset, false, true
+    ent_kinds   int8[n]     what the ent_value slot holds
+    active      bit[n]      activation bitmask
+    confidence  float64[n]
+    ent_values  float64[n]  number or bool ent_value, or an index into
+                            `objects` for entities and strings. the slots
+                            freed in `objects` are None and reused
+
+a snapshot is a copy of the buffer (plus the rarely used object table) and a
+fresh state is a copy of the layout's initial buffer
+"""
+import struct
+
+UNSET, FALSE, TRUE = 0, 1, 2
+TRI_STATE = {None: UNSET, False: FALSE, True: TRUE}
+TRI_VALUE = (None, False, True)
+
+ENT_NONE, ENT_BOOL, ENT_INT, ENT_FLOAT, ENT_OBJECT = range(5)
+# ints beyond this are not exact as float64 and go to the object table
+MAX_EXACT_INT = 2 ** 53
+
+DOUBLE = struct.Struct('<d')
+
+
+class StateLayout(object):
+    """ offsets of the arrays for `size` nodes, shared by all conversations of a protocol """
+    __slots__ = ('size', 'kinds', 'active', 'confidence', 'ent_values', 'initial')
+
+    def __init__(self, size, confidence=0.5):
+        self.size = size
+        self.kinds = size
+        self.active = 2 * size
+        # doubles are 8 aligned
+        self.confidence = (self.active + (size + 7) // 8 + 7) & ~7
+        self.ent_values = self.confidence + 8 * size
+        initial = bytearray(self.ent_values + 8 * size)
+        for i in xrange(size):
+            DOUBLE.pack_into(initial, self.confidence + 8 * i, confidence)
+        self.initial = str(initial)
+
+    def new_state(self):
+        return ConvoState(self)
+
+
+class ConvoState(object):
+    """ node values, confidences, activations and entity values of one conversation """
+    __slots__ = ('layout', 'buf', 'objects', 'free')
+
+    def __init__(self, layout, snapshot=None):
+        """
+        Args:
+            layout (StateLayout)
+            snapshot (tuple) - result of `snapshot()` to start from
+        """
+        self.layout = layout
+        if snapshot is None:
+            self.buf = bytearray(layout.initial)
+            self.objects = []
+            # indexes of the freed slots of `objects`
+            self.free = []
+        else:
+            self.restore(snapshot)
+
+    def snapshot(self):
+        """ immutable copy of the state: (buffer, object table) """
+        return str(self.buf), tuple(self.objects)
+
+    def restore(self, snapshot):
+        buf, objects = snapshot
+        if len(buf) != len(self.layout.initial):
+            raise ValueError('snapshot of {} bytes does not fit a {} node layout'.format(len(buf), self.layout.size))
+        self.buf = bytearray(buf)
+        self.objects = list(objects)
+        self.free = [slot for slot, value in enumerate(self.objects) if value is None]
+
+    def get_value(self, i):
+        """ None when unset, True or False otherwise """
+        return TRI_VALUE[self.buf[i]]
+
+    def set_value(self, i, value):
+        try:
+            self.buf[i] = TRI_STATE[value]
+        except (KeyError, TypeError):
+            raise TypeError('node values are tri-state, got {!r}'.format(value))
+
+    def get_confidence(self, i):
+        return DOUBLE.unpack_from(self.buf, self.layout.confidence + 8 * i)[0]
+
+    def set_confidence(self, i, confidence):
+        DOUBLE.pack_into(self.buf, self.layout.confidence + 8 * i, confidence)
+
+    def is_active(self, i):
+        return bool(self.buf[self.layout.active + (i >> 3)] & (1 << (i & 7)))
+
+    def set_active(self, i, active):
+        pos = self.layout.active + (i >> 3)
+        if active:
+            self.buf[pos] |= 1 << (i & 7)
+        else:
+            self.buf[pos] &= ~(1 << (i & 7)) & 0xff
+
+    def active_nodes(self):
+        """ ordinals of all activated nodes """
+        start = self.layout.active
+        for byte_pos in xrange((self.layout.size + 7) // 8):
+            byte = self.buf[start + byte_pos]
+            if byte:
+                for bit in xrange(8):
+                    if byte & (1 << bit):
+                        yield 8 * byte_pos + bit
+
+    def get_ent_value(self, i):
+        kind = self.buf[self.layout.kinds + i]
+        if kind == ENT_NONE:
+            return None
+        val = DOUBLE.unpack_from(self.buf, self.layout.ent_values + 8 * i)[0]
+        if kind == ENT_FLOAT:
+            return val
+        elif kind == ENT_INT:
+            return int(val)
+        elif kind == ENT_BOOL:
+            return bool(val)
+        return self.objects[int(val)]
+
+    def set_ent_value(self, i, value):
+        kinds = self.layout.kinds + i
+        old_kind = self.buf[kinds]
+        if isinstance(value, bool):
+            kind = ENT_BOOL
+        elif isinstance(value, (int, long)) and -MAX_EXACT_INT <= value <= MAX_EXACT_INT:
+            kind = ENT_INT
+        elif isinstance(value, float):
+            kind = ENT_FLOAT
+        elif value is None:
+            kind = ENT_NONE
+        else:
+            kind = ENT_OBJECT
+            if old_kind == ENT_OBJECT:
+                slot = int(self.get_ent_slot(i))
+                self.objects[slot] = value
+            elif self.free:
+                slot = self.free.pop()
+                self.objects[slot] = value
+            else:
+                slot = len(self.objects)
+                self.objects.append(value)
+            value = slot
+        if old_kind == ENT_OBJECT and kind != ENT_OBJECT:
+            slot = int(self.get_ent_slot(i))
+            self.objects[slot] = None
+            self.free.append(slot)
+        self.buf[kinds] = kind
+        DOUBLE.pack_into(self.buf, self.layout.ent_values + 8 * i, value or 0)
+
+    def get_ent_slot(self, i):
+        return DOUBLE.unpack_from(self.buf, self.layout.ent_values + 8 * i)[0]
+
+    def __len__(self):
+        return self.layout.size
+
+
+class StateValue(object):
+    """ CGNodeValue interface over the tri-state value of a node """
+    __slots__ = ('state', 'ordinal')
+    val_type = None
+    is_array = False
+
+    def __init__(self, state, ordinal):
+        self.state = state
+        self.ordinal = ordinal
+
+    def is_set(self):
+        return self.state.buf[self.ordinal] != UNSET
+
+    def is_true(self):
+        return self.state.buf[self.ordinal] == TRUE
+
+    def is_false(self):
+        return self.state.buf[self.ordinal] == FALSE
+
+    def set_val(self, val):
+        self.state.set_value(self.ordinal, val)
+        return self
+
+    def unset(self):
+        self.state.set_value(self.ordinal, None)
+
+    def equal(self, another_cg_value):
+        if self.is_set() and another_cg_value.is_set():
+            return self.value == another_cg_value.value
+        else:
+            return False
+
+    @property
+    def value(self):
+        return self.state.get_value(self.ordinal)
+
+    @property
+    def val_(self):
+        if not self.is_set():
+            raise AttributeError('val_')
+        return self.value
+
+    def as_dict(self):
+        return {'value_type': self.val_type, 'is_array': self.is_array, 'value': self.value}
+
+    def to_dict(self):
+        if self.is_set():
+            return {'value': self.value}
+        else:
+            return 'NOT SET'
+
+    def __str__(self):
+        if self.is_set():
+            return str(self.value)
+        else:
+            return '<VALUE NOT SET>'
+
+
+class StateNode(object):
+    """ mixin for nodes whose value and confidence live in a ConvoState
+
+    subclasses set `state` and `ordinal` before CGNode.__init__ assigns the
+    initial value
+    """
+    __slots__ = ()
+
+    def get_value(self):
+        return StateValue(self.state, self.ordinal)
+
+    def set_value(self, value):
+        self.state.set_value(self.ordinal, value.value if value is not None and value.is_set() else None)
+
+    value = property(get_value, set_value)
+
+    def get_confidence(self):
+        return self.state.get_confidence(self.ordinal)
+
+    def set_confidence(self, confidence):
+        self.state.set_confidence(self.ordinal, confidence)
+
+    confidence = property(get_confidence, set_confidence)
+
+
+def private_state():
+    """ state of a node that is not part of a compiled protocol """
+    return ConvoState(StateLayout(1)), 0
+
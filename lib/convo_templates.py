@@ -0,0 +1,180 @@
+# pylint: disable=missing-docstring, invalid-name
+""" compiled protocols of a server, loaded on first use and reloaded on change
+
+a protocol is the `<name>.zpc` artifact of scripts/compile_protocols.py
+when there is one at least as new as `<name>.json`, the json otherwise.
+nothing is read until a conversation asks for the protocol. every time one
+does, the files are stat-ed (at most every `interval` seconds per protocol)
+and a protocol whose files changed is compiled again, as a new version
+
+a conversation holds on to the Template it started with, so it finishes on
+that version while new conversations get the newest one. the store only
+keeps the newest version of every protocol plus, until their last
+conversation is released, the replaced versions with conversations left
+
+compiling happens outside the store's lock, conversations over the other
+protocols (and over the current version of the one being compiled, when
+there is one) are not held up by it
+"""
+import json
+import os
+import threading
+import time
+from lib import convo_artifact, convo_fact
+
+
+class Template(object):
+    """ one compiled version of a protocol """
+    __slots__ = ('name', 'version', 'signature', 'graph', 'sessions')
+
+    def __init__(self, name, version, signature, graph):
+        self.name = name
+        self.version = version
+        # what the files looked like when compiled, see TemplateStore.signature
+        self.signature = signature
+        # graph data, its convo protocol a compiled convo_fact.Protocol
+        self.graph = graph
+        # conversations started on this version and not released yet
+        self.sessions = 0
+
+
+class TemplateStore(object):
+
+    def __init__(self, path, pool=None, interval=1.0):
+        """
+        Args:
+            path (str) - directory of the protocol json and artifacts
+            pool (convo_builder.FactPool) - entity templates shared by the
+                protocols, a template goes with the last version using it
+            interval (float) - seconds between two looks at the files of a
+                protocol, 0 to look on every conversation
+        """
+        self.path = path
+        self.pool = pool
+        self.interval = interval
+        # name -> newest Template
+        self.current = {}
+        # replaced Templates with conversations left
+        self.retired = set()
+        # name -> time the files were last looked at
+        self.checked = {}
+        # name -> last version compiled, versions are never reused
+        self.versions = {}
+        # name -> lock held while the protocol compiles
+        self.compiling = {}
+        self.lock = threading.Lock()
+
+    def names(self):
+        """ the protocols in the directory, without loading them """
+        names = set()
+        for fn in os.listdir(self.path):
+            name, ext = os.path.splitext(fn)
+            if ext in ('.json', convo_artifact.EXTENSION):
+                names.add(name)
+        return sorted(names)
+
+    def files(self, name):
+        base = os.path.join(self.path, name)
+        return base + '.json', base + convo_artifact.EXTENSION
+
+    @staticmethod
+    def stat(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime, st.st_size
+
+    def signature(self, name):
+        """ (json, artifact) modification time and size, None for a missing file """
+        return tuple(self.stat(path) for path in self.files(name))
+
+    def get(self, name):
+        """ the newest version of protocol `name`, compiled if its files changed
+        Raises:
+            KeyError - no such protocol, or it never compiled
+        """
+        return self.newest(name)
+
+    def newest(self, name, sessions=0):
+        """ see `get`, `sessions` added to the count of the Template returned """
+        if os.path.basename(name) != name or name.startswith('.'):
+            raise KeyError(name)
+        with self.lock:
+            template = self.current.get(name)
+            now = time.time()
+            compiling = self.compiling.setdefault(name, threading.Lock())
+            # the current version serves while a new one compiles
+            if template and (now - self.checked.get(name, 0) < self.interval or compiling.locked()):
+                template.sessions += sessions
+                return template
+            self.checked[name] = now
+        with compiling:
+            signature = self.signature(name)
+            with self.lock:
+                # compiled by another conversation while this one waited
+                template = self.current.get(name)
+                if template and template.signature == signature:
+                    template.sessions += sessions
+                    return template
+                if signature == (None, None):
+                    self.retire(name)
+                    raise KeyError(name)
+            try:
+                graph = self.load(name, signature)
+            except Exception, e:  # pylint: disable=broad-except
+                if not template:
+                    print 'can not load protocol', name, e
+                    raise KeyError(name)
+                # keep serving the last version that compiled
+                print 'can not reload protocol', name, e
+                graph = None
+            with self.lock:
+                if graph is not None:
+                    self.retire(name)
+                    version = self.versions[name] = self.versions.get(name, 0) + 1
+                    template = self.current[name] = Template(name, version, signature, graph)
+                template.sessions += sessions
+                return template
+
+    def load(self, name, signature):
+        source, artifact = self.files(name)
+        json_stat, artifact_stat = signature
+        if artifact_stat and (json_stat is None or json_stat[0] <= artifact_stat[0]):
+            try:
+                mapped = convo_artifact.Artifact(artifact)
+                try:
+                    return mapped.graph(self.pool)
+                finally:
+                    mapped.close()
+            except convo_artifact.ArtifactError, e:
+                if json_stat is None:
+                    raise
+                print 'can not map protocol', artifact, e
+        data = json.load(open(source))
+        if isinstance(data, dict) and data.get('node_type') == 'convo_protocol':
+            return dict(data, data=convo_fact.Protocol(data['data'], pool=self.pool))
+        return data
+
+    def retire(self, name):
+        template = self.current.pop(name, None)
+        if template and template.sessions:
+            self.retired.add(template)
+
+    def acquire(self, name):
+        """ the newest version of `name`, counted as used by one more conversation """
+        return self.newest(name, sessions=1)
+
+    def release(self, template):
+        """ a conversation on `template` ended, the last one frees a replaced version """
+        with self.lock:
+            template.sessions -= 1
+            if not template.sessions:
+                self.retired.discard(template)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'current': dict((name, t.version) for name, t in self.current.iteritems()),
+                'retired': sorted((t.name, t.version, t.sessions) for t in self.retired),
+            }
@@ -23,6 +23,25 @@ class CalcGraphTestCase(unittest.TestCase):
         cg.step()
         self.assertTrue(cg.value.value)
 
+    def test_propagation(self):
+        # 0, 1 -> 2 -> 4; 1 -> 3 -> 4 (a diamond over 1)
+        parents = [(2,), (2, 3), (4,), (4,), ()]
+        evaluated = []
+        changes = {2: True, 3: False, 4: True}
+        engine = calc_graph.CGPropagation(parents, lambda rank: evaluated.append(rank) or changes[rank])
+        engine.changed(1)
+        engine.changed(0)
+        self.assertEquals(engine.run(), 3)
+        self.assertEquals(evaluated, [2, 3, 4])
+        self.assertEquals(engine.run(), 0)
+
+        # nothing changed, nothing above is evaluated
+        del evaluated[:]
+        changes[2] = False
+        engine.changed(0)
+        engine.run()
+        self.assertEquals(evaluated, [2])
+
 
 class CgEntFact(unittest.TestCase):
     ENT_NODE_DATA = {
@@ -105,5 +124,23 @@ class CgEntFact(unittest.TestCase):
         self.assertTrue(self.ent_node.is_set())
         print >> sys.stderr, "DEBUG >>>", self.ent_node.value.value, "<<<"
 
+class ValueTypeTestCase(unittest.TestCase):
+    def test_string_candidates(self):
+        value_type = calc_node_value_type.NodeValueTypeString()
+        beads = barzer_objects.BeadFactory.make_lazy_beads({'beads': [
+            {'type': 'entity', 'class': 1, 'subclass': 105, 'id': 'YES'},
+            {'type': 'token', 'value': 'John'},
+            {'type': 'token', 'value': 'Smith'},
+        ]})
+        self.assertEquals(value_type.match_all_beads(beads), (True, 'John Smith', False))
+        self.assertEquals(beads.decoded(), 2)
+
+    def test_string_max_beads(self):
+        value_type = calc_node_value_type.NodeValueTypeString(max_beads=2)
+        beads = barzer_objects.BeadFactory.make_lazy_beads({'beads': [{'type': 'token', 'value': 'x'}] * 3})
+        self.assertEquals(value_type.match_all_beads(beads), value_type.ALL_BEADS_NOT_MATCHED)
+        self.assertEquals(beads.decoded(), 0)
+
+
 if __name__ == '__main__':
     unittest.main()
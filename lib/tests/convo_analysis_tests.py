@@ -0,0 +1,74 @@
+# pylint: disable=missing-docstring
+import itertools
+import random
+import unittest
+from lib import calc_graph, convo_fact
+from lib.barzer.local_extractor import LocalBarzer
+from lib.convo_state import ConvoState
+from lib.tests.protocol_fixtures import entity, random_protocol
+
+
+class AnalysisTestCase(unittest.TestCase):
+
+    def test_minimal_plans(self):
+        rnd = random.Random(3)
+        for _ in xrange(30):
+            protocol = convo_fact.Protocol(random_protocol(rnd))
+            analysis, bitset = protocol.analysis, protocol.bitset
+            entities = [f.ordinal for f in protocol.order if f.ordinal in bitset.index]
+            for _ in xrange(10):
+                values = dict((o, rnd.choice([True, False, None])) for o in entities)
+                known_true = sum(bitset.bit(o) for o in entities if values[o] is True)
+                known_false = sum(bitset.bit(o) for o in entities if values[o] is False)
+                unanswered = [bitset.bit(o) for o in entities if values[o] is None]
+                state = ConvoState(protocol.layout)
+                for o in entities:
+                    state.set_value(o, values[o])
+                for ordinal in bitset.masks:
+                    # the fewest unanswered facts that make the composite true once confirmed
+                    fewest = None
+                    for n in xrange(len(unanswered) + 1):
+                        if any(bitset.value(ordinal, known_true | sum(c), known_false)
+                               for c in itertools.combinations(unanswered, n)):
+                            fewest = n
+                            break
+                    plan = analysis.next_question(ordinal, state.buf)
+                    self.assertEquals(plan and plan[0], fewest)
+                    if fewest:
+                        self.assertEquals(values[plan[1]], None)
+
+    def test_next_question(self):
+        facts = [entity(i) for i in xrange(1, 8)]
+        facts.extend([
+            {'node_id': 'long', 'node_type': 'composite', 'operator': 'AND', 'text': 'long',
+             'facts': ['e1', 'e2', 'e3']},
+            {'node_id': 'three', 'node_type': 'composite', 'operator': 'AND', 'text': 'three',
+             'facts': ['e4', 'e5', 'e6']},
+            {'node_id': 'two', 'node_type': 'composite', 'operator': 'AND', 'text': 'two',
+             'facts': ['e1', 'e7']},
+            {'node_id': 'short', 'node_type': 'composite', 'operator': 'OR', 'text': 'short',
+             'facts': ['three', 'two']}])
+        data = {'facts': facts, 'terminals': ['long', 'short']}
+        protocol = convo_fact.Protocol(data)
+        analysis = protocol.analysis
+        ordinal = dict((f.id, f.ordinal) for f in protocol.order)
+        self.assertEquals(analysis.terminals[ordinal['e1']], tuple(sorted([ordinal['long'], ordinal['short']])))
+        self.assertEquals(analysis.fan_in[ordinal['e1']], 2)
+        self.assertEquals(analysis.next_question(ordinal['short'], ConvoState(protocol.layout).buf), (2, ordinal['e1']))
+
+        cg = calc_graph.CG()
+        cg.root = protocol.instantiate(barzer_svc=LocalBarzer.from_protocols([data]))
+        cg.step()
+        self.assertEquals(cg.root.next_fact().id, 'e1')
+        cg.step('i have symptom 1')
+        self.assertEquals(cg.root.next_fact().id, 'e7')
+        self.assertEquals(sorted(cg.root.reachable_terminals()), ['long', 'short'])
+
+    def test_not_analyzed(self):
+        data = random_protocol(random.Random(1))
+        data['facts'][-1]['operator'] = 'XOR'
+        self.assertEquals(convo_fact.Protocol(data).analysis, None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+# pylint: disable=missing-docstring
+import os
+import random
+import shutil
+import struct
+import tempfile
+import unittest
+from lib import convo_artifact, convo_fact
+from lib.convo_artifact import Artifact, ArtifactError
+from lib.tests.protocol_fixtures import composite, copied, random_protocol
+
+
+class ArtifactTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def roundtrip(self, data):
+        path = os.path.join(self.dir, 'protocol.zpc')
+        graph = {'node_type': 'convo_protocol', 'node_id': u'protocol \u2013 1', 'data': convo_fact.Protocol(data)}
+        convo_artifact.write(path, graph)
+        loaded = Artifact(path).graph()
+        self.assertEquals(loaded['node_id'], graph['node_id'])
+        return graph['data'], loaded['data']
+
+    def test_roundtrip(self):
+        rnd = random.Random(1)
+        for _ in xrange(20):
+            data = random_protocol(rnd)
+            data['facts'].extend([copied(0, 'x.e0'), composite('x', 'OR', ['x.e0', 'e0', data['terminals'][0]])])
+            data['terminals'].append('x')
+            compiled, loaded = self.roundtrip(data)
+            self.assertEquals([f.id for f in loaded.order], [f.id for f in compiled.order])
+            self.assertEquals([f.id for f in loaded.terminals], [f.id for f in compiled.terminals])
+            self.assertEquals(loaded.parent_ranks, compiled.parent_ranks)
+            self.assertEquals(loaded.ent_index, compiled.ent_index)
+            self.assertEquals(sorted(loaded.facts), sorted(compiled.facts))
+            self.assertIs(loaded.facts['x.e0'], loaded.facts['e0'])
+            self.assertEquals(loaded.tables(), compiled.tables())
+            self.assertEquals([f.parents for f in loaded.order], [f.parents for f in compiled.order])
+            for a, b in zip(loaded.order, compiled.order):
+                self.assertEquals((a.question, getattr(a, 'operator', None), getattr(a, 'text', None)),
+                                  (b.question, getattr(b, 'operator', None), getattr(b, 'text', None)))
+                self.assertEquals(getattr(a, 'entity', None), getattr(b, 'entity', None))
+
+    def test_invalid(self):
+        path = os.path.join(self.dir, 'protocol.zpc')
+        data = random_protocol(random.Random(1))
+        convo_artifact.write(path, {'node_type': 'convo_protocol', 'data': convo_fact.Protocol(data)})
+        with open(path, 'rb') as fp:
+            artifact = fp.read()
+        for broken in [
+                '',
+                artifact[:-1],
+                artifact[:10],
+                'JSON' + artifact[4:],
+                artifact[:4] + struct.pack('<H', convo_artifact.VERSION + 1) + artifact[6:]]:
+            with open(path, 'wb') as fp:
+                fp.write(broken)
+            with self.assertRaises(ArtifactError):
+                Artifact(path)
+
+        # tables of the right size that do not unmarshal
+        n_tables = convo_artifact.HEADER.unpack_from(artifact)[-1]
+        with open(path, 'wb') as fp:
+            fp.write(artifact[:-n_tables] + 'x' * n_tables)
+        mapped = Artifact(path)
+        with self.assertRaises(ArtifactError):
+            mapped.graph()
+        mapped.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+# pylint: disable=missing-docstring
+import json
+import unittest
+import numpy as np
+from lib import convo_fact
+from lib.convo_batch import BatchConvo
+from lib.convo_state import TRUE, FALSE, UNSET
+
+
+class BatchTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.protocol = convo_fact.Protocol(json.load(open('lib/tests/test2.json')))
+
+    def test_evaluate(self):
+        batch = BatchConvo(self.protocol, 3)
+        # session 0: flu, session 1: flu ruled out by temperature, session 2: nothing said
+        batch.answer('node.high_temperature', [250, 150, np.nan])
+        batch.answer('node.low_temperature', [250, 150, np.nan])
+        batch.answer('node.headache', [True, np.nan, np.nan])
+        batch.evaluate()
+        flu, emergency = [list(self.protocol.terminals).index(self.protocol.facts[t]) for t in ('flu', '911')]
+        self.assertEquals(batch.terminal_values()[:, flu].tolist(), [TRUE, FALSE, UNSET])
+        self.assertEquals(batch.decided().tolist(), [flu, -1, -1])
+        column = batch.columns['911']
+        self.assertEquals(batch.confidence[1, column], 0.25)
+        self.assertEquals(batch.confidence[2, column], 0.125)
+
+        asked = [self.protocol.order[o].id for o in batch.next_questions()]
+        self.assertTrue(asked[1] in ('node.high_pressure', 'node.high_pulse'))
+        self.assertTrue(isinstance(self.protocol.facts[asked[2]], convo_fact.EntityFact))
+
+    def test_matches_conversation(self):
+        convo = self.protocol.instantiate()
+        for fact_id, value in (('node.high_temperature', 120), ('node.low_temperature', 120), ('node.high_pulse', 150)):
+            fact = convo.facts[fact_id]
+            fact.ent.set_val_and_compute(value)
+            fact.update(fact.ent.value, fact.ent.confidence)
+        convo.update_facts()
+
+        batch = BatchConvo(self.protocol, 1)
+        for fact_id, value in (('node.high_temperature', 120), ('node.low_temperature', 120), ('node.high_pulse', 150)):
+            batch.answer(fact_id, [value])
+        batch.evaluate()
+        for fact in self.protocol.order:
+            self.assertEquals(batch.values[0, fact.ordinal], {None: UNSET, False: FALSE, True: TRUE}[convo.facts[fact.id].value.value])
+            self.assertAlmostEquals(batch.confidence[0, fact.ordinal], convo.facts[fact.id].confidence)
+
+    def test_not_batchable(self):
+        data = json.load(open('lib/tests/test2.json'))
+        data['facts'][0]['operator'] = 'XOR'
+        self.assertRaises(ValueError, BatchConvo, data, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
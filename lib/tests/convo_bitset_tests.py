@@ -0,0 +1,55 @@
+# pylint: disable=missing-docstring
+import json
+import random
+import unittest
+from lib import calc_graph, convo_fact
+from lib.barzer.local_extractor import LocalBarzer
+from lib.convo_bitset import BitsetProgram
+from lib.tests.protocol_fixtures import random_protocol
+
+
+def kleene(fact, values):
+    """ what AndOperator/OrOperator compute over tri-state children """
+    if fact.id in values:
+        return values[fact.id]
+    children = [kleene(f, values) for f in fact.facts]
+    if fact.operator == 'AND':
+        return True if all(c is True for c in children) else (False if False in children else None)
+    return True if True in children else (False if all(c is False for c in children) else None)
+
+
+class BitsetTestCase(unittest.TestCase):
+
+    def test_equivalence(self):
+        rnd = random.Random(7)
+        for _ in xrange(50):
+            protocol = convo_fact.Protocol(random_protocol(rnd))
+            bitset = protocol.bitset
+            entities = [f for f in protocol.order if isinstance(f, convo_fact.EntityFact)]
+            composites = [f for f in protocol.order if isinstance(f, convo_fact.CompositeFact)]
+            for _ in xrange(20):
+                values = dict((f.id, rnd.choice([True, False, None])) for f in entities)
+                known_true = sum(bitset.bit(f.ordinal) for f in entities if values[f.id] is True)
+                known_false = sum(bitset.bit(f.ordinal) for f in entities if values[f.id] is False)
+                for c in composites:
+                    self.assertEquals(bitset.value(c.ordinal, known_true, known_false), kleene(c, values))
+
+    def test_not_compiled(self):
+        data = random_protocol(random.Random(1))
+        data['facts'][-1]['operator'] = 'XOR'
+        self.assertEquals(convo_fact.Protocol(data).bitset, None)
+        self.assertEquals(BitsetProgram.compile(convo_fact.Protocol(random_protocol(random.Random(1))), max_clauses=1), None)
+
+    def test_reachable(self):
+        data = json.load(open('lib/tests/test2.json'))
+        cg = calc_graph.CG()
+        cg.root = convo_fact.ConvoProtocol(data, barzer_svc=LocalBarzer.from_protocols([data]))
+        self.assertTrue(cg.root.template.bitset)
+        cg.step()
+        self.assertEquals(sorted(cg.root.reachable_terminals()), ['911', 'flu'])
+        cg.step('temperature 90')
+        self.assertEquals(cg.root.reachable_terminals(), ['911'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+# pylint: disable=missing-docstring
+import copy
+import unittest
+from lib import convo_fact
+from lib.convo_builder import FactPool, ProtocolError
+from lib.tests.protocol_fixtures import composite, copied, entity
+
+
+class BuilderTestCase(unittest.TestCase):
+
+    def test_merge(self):
+        # every terminal spells out its own copy of syndrome AND(e1, e2)
+        data = {'facts': [
+            entity(1), entity(2), entity(3), copied(1, 'x.e1'), copied(2, 'x.e2'),
+            composite('syndrome', 'AND', ['e1', 'e2'], 'syndrome'),
+            composite('x.syndrome', 'AND', ['x.e1', 'x.e2'], 'syndrome'),
+            composite('first', 'AND', ['syndrome', 'e3']),
+            composite('second', 'OR', ['x.syndrome', 'e3', 'x.e1', 'e1']),
+            composite('unused', 'OR', ['e1', 'e2'])],
+            'terminals': ['first', 'second']}
+        protocol = convo_fact.Protocol(data)
+        self.assertEquals([f.id for f in protocol.order], ['e1', 'e2', 'e3', 'syndrome', 'first', 'second'])
+        self.assertIs(protocol.facts['x.e1'], protocol.facts['e1'])
+        self.assertIs(protocol.facts['x.syndrome'], protocol.facts['syndrome'])
+        self.assertEquals([f.id for f in protocol.facts['second'].facts], ['syndrome', 'e3', 'e1'])
+        self.assertEquals(protocol.facts['syndrome'].parents, ('second', 'first'))
+        self.assertEquals(protocol.ent_index[protocol.facts['e1'].template.ent.ent_id()], ('e1',))
+        self.assertNotIn('unused', protocol.facts)
+
+        # a different text is a different diagnosis
+        data['facts'][6]['text'] = 'other'
+        protocol = convo_fact.Protocol(data)
+        self.assertIsNot(protocol.facts['x.syndrome'], protocol.facts['syndrome'])
+        self.assertIs(protocol.facts['x.syndrome'].facts[0], protocol.facts['e1'])
+
+    def test_commutative(self):
+        data = {'facts': [
+            entity(1), entity(2),
+            composite('both', 'AND', ['e1', 'e2'], 'both'), composite('x.both', 'AND', ['e2', 'e1'], 'both'),
+            composite('t', 'OR', ['both', 'e1']), composite('x.t', 'OR', ['e1', 'x.both'], 't')],
+            'terminals': ['t', 'x.t']}
+        protocol = convo_fact.Protocol(data)
+        self.assertEquals([f.id for f in protocol.order], ['e1', 'e2', 'both', 't'])
+        self.assertEquals([t.id for t in protocol.terminals], ['t'])
+
+    def test_conversation_aliases(self):
+        data = {'facts': [entity(1), copied(1, 'x.e1'), composite('t', 'OR', ['e1', 'x.e1'])], 'terminals': ['t']}
+        convo = convo_fact.Protocol(data).instantiate()
+        self.assertIs(convo.facts['x.e1'], convo.facts['e1'])
+        self.assertIs(convo.facts.get('x.e1'), convo.facts['e1'])
+        self.assertIn('x.e1', convo.facts)
+        self.assertNotIn('e2', convo.facts)
+        self.assertIsNone(convo.facts.get('e2'))
+        self.assertEquals(sorted(convo.facts), ['e1', 't'])
+
+    def test_pool(self):
+        data = {'facts': [entity(1), entity(2), composite('t', 'AND', ['e1', 'e2'])], 'terminals': ['t']}
+        pool = FactPool()
+        first = convo_fact.Protocol(data, pool=pool)
+        second = convo_fact.Protocol(copy.deepcopy(data), pool=pool)
+        self.assertIsNot(first.facts['e1'], second.facts['e1'])
+        self.assertIs(first.facts['e1'].template, second.facts['e1'].template)
+        self.assertEquals(len(pool.templates), 2)
+        self.assertIsNot(convo_fact.Protocol(data).facts['e1'].template, first.facts['e1'].template)
+
+    def test_invalid(self):
+        valid = [entity(1), entity(2), composite('t', 'AND', ['e1', 'e2'])]
+        invalid = [
+            (valid + [entity(1)], ['t']),
+            (valid, ['missing']),
+            (valid, []),
+            (valid + [composite('u', 'AND', ['e1', 'e3'])], ['t', 'u']),
+            (valid + [composite('u', 'AND', [])], ['t', 'u']),
+            (valid + [{'node_id': 'u', 'node_type': 'composite', 'facts': ['e1']}], ['t']),
+            (valid + [{'node_id': 'u', 'node_type': 'question'}], ['t']),
+            (valid + [composite('u', 'AND', ['e1', 'v']), composite('v', 'OR', ['e2', 'w']),
+                      composite('w', 'OR', ['u'])], ['t', 'w']),
+        ]
+        for facts, terminals in invalid:
+            with self.assertRaises(ProtocolError):
+                convo_fact.Protocol({'facts': facts, 'terminals': terminals})
+
+    def test_deep(self):
+        # a chain deeper than the recursion limit
+        facts = [entity(0), entity(1)]
+        for i in xrange(2000):
+            facts.append(composite('c{}'.format(i), 'AND', ['c{}'.format(i - 1) if i else 'e0', 'e1']))
+        protocol = convo_fact.Protocol({'facts': facts, 'terminals': ['c1999']})
+        self.assertEquals(len(protocol.order), 2002)
+        self.assertEquals(protocol.order[-1].id, 'c1999')
+
+
+if __name__ == '__main__':
+    unittest.main()
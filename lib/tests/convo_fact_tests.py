@@ -1,8 +1,12 @@
 # pylint: disable=invalid-name, missing-docstring
+import sys
 import unittest
 import pprint
 import json
+from api import ZobotServer
 from lib import calc_graph, convo_fact
+from lib.barzer.local_extractor import LocalBarzer
+from lib.tests.protocol_fixtures import entity
 
 pp = pprint.PrettyPrinter()
 
@@ -43,6 +47,111 @@ class ConvoTestCase(unittest.TestCase):
         print resp
         self.assertTrue('911' in resp[1].text)
 
+    def test_dispatch(self):
+        data = json.load(open('lib/tests/test2.json'))
+        cg = calc_graph.CG()
+        cg.root = convo_fact.ConvoProtocol(data, barzer_svc=LocalBarzer.from_protocols([data]))
+        cg.step()
+        index = cg.root.index
+        self.assertEquals(
+            sorted(f.id for f in index.active), ['node.high_temperature', 'node.low_temperature'])
+
+        beads = cg.root.barzer_svc.get_beads('i have a headache')
+        self.assertEquals(
+            sorted(f.id for f in index.dispatch(beads)),
+            ['node.headache', 'node.high_temperature', 'node.low_temperature'])
+
+        # an entity that is not being asked about is filled all the same
+        cg.step('i have a headache')
+        self.assertTrue(cg.root.facts['node.headache'].value.is_true())
+        self.assertFalse(cg.root.facts['node.high_pulse'].ent.is_activated())
+        resp = cg.step('temperature 250')
+        self.assertTrue('flu' in resp[1].text)
+
+    def test_template(self):
+        data = json.load(open('lib/tests/test2.json'))
+        data['facts'].append({'node_id': 'node.unused', 'node_type': 'entity', 'data': {'class': 1, 'subclass': 1, 'id': 'X', 'name': 'x'}})
+        protocol = convo_fact.Protocol(data)
+        self.assertFalse('node.unused' in [f.id for f in protocol.order])
+        self.assertEquals(protocol.facts['flu'].parents, ('protocol',))
+
+        barzer = LocalBarzer.from_protocols([data])
+        first, second = calc_graph.CG(), calc_graph.CG()
+        first.root = protocol.instantiate(barzer_svc=barzer)
+        second.root = protocol.instantiate(barzer_svc=barzer)
+        headache = [cg.root.facts['node.headache'] for cg in (first, second)]
+        self.assertTrue(headache[0].ent.template is headache[1].ent.template)
+        self.assertTrue(headache[0].ent.value_type is protocol.facts['node.headache'].template.value_type)
+
+        first.step()
+        second.step()
+        first.step('i have a headache')
+        self.assertTrue(headache[0].value.is_true())
+        self.assertFalse(headache[1].value.is_set())
+        self.assertTrue('flu' in first.step('temperature 250')[1].text)
+        self.assertFalse(second.root.is_set())
+
+    def test_deep_protocol(self):
+        depth = 2 * sys.getrecursionlimit()
+        facts = [entity(i, 'sym', 'node.sym{}'.format(i)) for i in xrange(depth + 1)]
+        for i in xrange(depth):
+            facts.append({
+                'node_id': 'chain{}'.format(i), 'node_type': 'composite', 'operator': 'OR', 'text': 'chain',
+                'facts': ['chain{}'.format(i - 1) if i else 'node.sym0', 'node.sym{}'.format(i + 1)]})
+        data = {'facts': facts, 'terminals': ['chain{}'.format(depth - 1)]}
+        cg = calc_graph.CG()
+        cg.root = convo_fact.ConvoProtocol(data, barzer_svc=LocalBarzer.from_protocols([data]))
+        cg.step()
+        evaluations = cg.root.propagation.evaluations
+        resp = cg.step('i have symptom 0')
+        self.assertTrue(resp[1].text.startswith('chain'))
+        self.assertEquals(cg.root.propagation.evaluations - evaluations, depth + 1)
+
+    def test_pruning(self):
+        facts = [entity(i, 'sym', 'node.sym{}'.format(i)) for i in xrange(1, 6)]
+        facts.extend([
+            {'node_id': 'either', 'node_type': 'composite', 'operator': 'OR', 'text': 'either',
+             'facts': ['node.sym1', 'node.sym2']},
+            {'node_id': 'first', 'node_type': 'composite', 'operator': 'AND', 'text': 'first',
+             'facts': ['either', 'node.sym3']},
+            {'node_id': 'second', 'node_type': 'composite', 'operator': 'AND', 'text': 'second',
+             'facts': ['node.sym4', 'node.sym5']}])
+        data = {'facts': facts, 'terminals': ['first', 'second']}
+        cg = calc_graph.CG()
+        cg.root = convo_fact.ConvoProtocol(data, barzer_svc=LocalBarzer.from_protocols([data]))
+        root = cg.root
+        cg.step()
+        cg.step('i have symptom 1')
+        self.assertTrue(root.facts['either'].value.is_true())
+        # the other side of the decided OR is not asked about nor dispatched any more
+        sym2 = root.facts['node.sym2']
+        self.assertFalse(root.index.get(sym2.ent_id()))
+        self.assertEquals(root.index.pruned, set(['node.sym1', 'node.sym2']))
+        self.assertEquals(root.facts['first'].leaf().id, 'node.sym3')
+        self.assertFalse(root.is_set())
+
+        snapshot = root.snapshot()
+        root.restore(root.template.instantiate().snapshot())
+        self.assertFalse(root.index.pruned)
+        root.restore(snapshot)
+        self.assertEquals(root.index.pruned, set(['node.sym1', 'node.sym2']))
+        self.assertTrue('first' in cg.step('i have symptom 3')[1].text)
+
+    def test_no_diagnosis(self):
+        data = json.load(open('protocols/test2.json'))
+        zobot = ZobotServer(protocols_path='protocols/', barzer_svc=LocalBarzer.from_protocols([data['data']]))
+        token = zobot.init_convo('test2')
+        zobot.say(token)
+        self.assertEquals(zobot.say(token, '50'), 'What is your blood pressure?')
+        # low temperature and pressure rule out both flu and 911
+        resp = zobot.say(token, '99')
+        self.assertTrue(resp.startswith(convo_fact.ConvoProtocol.NO_DIAGNOSIS))
+        self.assertTrue('Good bye' in resp)
+        root = zobot.conversations[token].root
+        self.assertTrue(root.is_set())
+        self.assertEquals(root.children[0].terminals['flu'].step().text, convo_fact.ConvoProtocol.NO_DIAGNOSIS)
+        self.assertTrue(zobot.say(token, '50'))
+
 
 if __name__ == '__main__':
     unittest.main()
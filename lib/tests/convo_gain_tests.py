@@ -0,0 +1,90 @@
+# pylint: disable=missing-docstring
+import functools
+import unittest
+from lib import calc_graph, convo_fact
+from lib.barzer.local_extractor import LocalBarzer
+from lib.convo_gain import FactPriors, GainScheduler
+from lib.tests.protocol_fixtures import entity
+
+
+def shared_protocol():
+    """ three AND terminals sharing e0 """
+    facts = [entity(i) for i in xrange(4)]
+    for i in xrange(1, 4):
+        facts.append({'node_id': 't{}'.format(i), 'node_type': 'composite', 'operator': 'AND',
+                      'facts': ['e{}'.format(i), 'e0'], 'text': 'diagnosis {}'.format(i)})
+    return {'facts': facts, 'terminals': ['t1', 't2', 't3']}
+
+
+class GainTestCase(unittest.TestCase):
+
+    def test_shared_fact_first(self):
+        data = shared_protocol()
+        protocol = convo_fact.Protocol(data)
+        self.assertEquals(protocol.instantiate().next_fact().id, 'e1')
+        convo = protocol.instantiate(scheduler=GainScheduler)
+        self.assertEquals(convo.next_fact().id, 'e0')
+
+    def test_priors(self):
+        data = shared_protocol()
+        data['terminals'] = ['t1']
+        protocol = convo_fact.Protocol(data)
+        priors = FactPriors()
+        for _ in xrange(20):
+            convo = protocol.instantiate()
+            convo.facts['e0'].update(calc_graph.CGNodeValue(False), 1.0)
+            priors.observe(convo)
+        self.assertEquals(priors.probability('e0'), 1.0 / 22)
+        self.assertEquals(priors.probability('e1'), 0.5)
+        self.assertEquals(protocol.instantiate().next_fact().id, 'e1')
+        # e0 is almost surely false, which settles t1 right away
+        convo = protocol.instantiate(scheduler=functools.partial(GainScheduler, priors=priors))
+        self.assertEquals(convo.next_fact().id, 'e0')
+
+    def test_conversation(self):
+        data = shared_protocol()
+        priors = FactPriors()
+        cg = calc_graph.CG()
+        cg.root = convo_fact.Protocol(data).instantiate(
+            barzer_svc=LocalBarzer.from_protocols([data]), scheduler=functools.partial(GainScheduler, priors=priors))
+        cg.step()
+        snapshot = cg.root.snapshot()
+        cg.step('i have symptom 0')
+        self.assertEquals(cg.root.next_fact().id, 'e1')
+        self.assertEquals(cg.root.scheduler.prob[cg.root.facts['t2'].ordinal], 0.5)
+        self.assertTrue('diagnosis 2' in cg.step('i have symptom 2')[1].text)
+        self.assertEquals(priors.counts, {'e0': [0, 1], 'e2': [0, 1]})
+
+        cg.root.restore(snapshot)
+        self.assertEquals(cg.root.next_fact().id, 'e0')
+        # e0 and e2 were true in the completed conversation
+        self.assertAlmostEqual(cg.root.scheduler.prob[cg.root.facts['t2'].ordinal], 4.0 / 9)
+
+    def test_no_diagnosis(self):
+        priors = FactPriors()
+        convo = convo_fact.Protocol(shared_protocol()).instantiate(
+            scheduler=functools.partial(GainScheduler, priors=priors))
+        # e0 false rules out every terminal, the conversation still counts
+        convo.facts['e0'].update(calc_graph.CGNodeValue(False), 1.0)
+        convo.update_facts()
+        self.assertEquals(convo.reachable_terminals(), [])
+        convo.step()
+        convo.step()
+        self.assertEquals(priors.counts, {'e0': [1, 0]})
+
+    def test_restore(self):
+        convo = convo_fact.Protocol(shared_protocol()).instantiate(scheduler=GainScheduler)
+        snapshot = convo.snapshot()
+        resolved = []
+        convo.scheduler.resolved = resolved.append
+        convo.restore(snapshot)
+        self.assertEquals(resolved, [])
+
+    def test_not_analyzed(self):
+        protocol = convo_fact.Protocol(shared_protocol())
+        protocol.bitset = protocol.analysis = None
+        self.assertRaises(ValueError, protocol.instantiate, scheduler=GainScheduler)
+
+
+if __name__ == '__main__':
+    unittest.main()
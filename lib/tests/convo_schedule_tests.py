@@ -0,0 +1,43 @@
+# pylint: disable=missing-docstring
+import unittest
+from lib.convo_schedule import Scheduler
+
+
+class SchedulerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        # 0..3 facts, 4 and 5 composites over them, 6 the protocol
+        parents = ((4,), (4, 5), (5,), (5,), (6,), (6,), ())
+        self.scores = [0.5, 0.5, 0.5, 0.5, 0.25, 0.125, 0]
+        self.queue = Scheduler(parents, self.scores.__getitem__)
+        for parent, children in ((4, (0, 1)), (5, (1, 2, 3)), (6, (4, 5))):
+            for position, child in enumerate(children):
+                self.queue.push(parent, child, position)
+
+    def test_top(self):
+        self.assertEquals(self.queue.top(5), 1)
+        self.assertEquals(self.queue.leaf(6), 0)
+        self.assertEquals(self.queue.top(0), None)
+
+    def test_batched(self):
+        self.scores[0] = 0
+        self.scores[4] = 0.1
+        # nothing moves until the changes are flushed
+        self.assertEquals(self.queue.leaf(6), 0)
+        self.queue.changed(0)
+        self.queue.changed(4)
+        self.assertEquals(self.queue.leaf(6), 1)
+        self.assertEquals(self.queue.top(4), 1)
+        self.assertEquals(self.queue.top(6), 5)
+
+        self.queue.remove(5, 1)
+        self.assertFalse(self.queue.contains(5, 1))
+        self.assertTrue(self.queue.contains(4, 1))
+        self.assertEquals(self.queue.leaf(6), 2)
+        self.queue.remove(6, 4)
+        self.queue.remove(6, 5)
+        self.assertEquals(self.queue.leaf(6), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
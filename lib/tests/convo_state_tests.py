@@ -0,0 +1,74 @@
+# pylint: disable=missing-docstring
+import json
+import unittest
+from lib import calc_graph, convo_fact
+from lib.barzer import barzer_objects
+from lib.barzer.local_extractor import LocalBarzer
+from lib.convo_state import ConvoState, StateLayout
+
+
+class ConvoStateTestCase(unittest.TestCase):
+
+    def test_slots(self):
+        state = ConvoState(StateLayout(10))
+        self.assertEquals([state.get_value(i) for i in (0, 9)], [None, None])
+        self.assertEquals(state.get_confidence(9), 0.5)
+        state.set_value(3, False)
+        state.set_value(9, True)
+        self.assertEquals([state.get_value(i) for i in (3, 9)], [False, True])
+        self.assertRaises(TypeError, state.set_value, 1, 5)
+
+        state.set_active(9, True)
+        state.set_active(2, True)
+        state.set_active(2, False)
+        self.assertEquals(list(state.active_nodes()), [9])
+
+        ent = barzer_objects.Entity({'class': 1, 'subclass': 2, 'id': 'X'})
+        values = [True, False, 120, 36.6, 'some text', ent, None]
+        for i, val in enumerate(values):
+            state.set_ent_value(i, val)
+        self.assertEquals([state.get_ent_value(i) for i in xrange(len(values))], values)
+        self.assertTrue(isinstance(state.get_ent_value(2), int))
+        state.set_ent_value(4, 'other text')
+        self.assertEquals(state.objects, ['other text', ent])
+
+        # freed object slots are reused
+        state.set_ent_value(4, 7)
+        self.assertEquals(state.objects, [None, ent])
+        copy = ConvoState(state.layout, state.snapshot())
+        for i in xrange(3):
+            state.set_ent_value(4, None)
+            state.set_ent_value(4, 'text {}'.format(i))
+        self.assertEquals(state.objects, ['text 2', ent])
+        self.assertEquals(state.get_ent_value(4), 'text 2')
+        copy.set_ent_value(8, 'restored')
+        self.assertEquals(copy.objects, ['restored', ent])
+
+        copy = ConvoState(state.layout, state.snapshot())
+        self.assertEquals(copy.buf, state.buf)
+        self.assertRaises(ValueError, ConvoState, StateLayout(3), state.snapshot())
+
+    def test_snapshot(self):
+        data = json.load(open('lib/tests/test2.json'))
+        protocol = convo_fact.Protocol(data)
+        barzer = LocalBarzer.from_protocols([data])
+        cg = calc_graph.CG()
+        cg.root = protocol.instantiate(barzer_svc=barzer)
+        cg.step()
+        cg.step('i have a headache')
+        snapshot = cg.root.snapshot()
+
+        restored = calc_graph.CG()
+        restored.root = protocol.instantiate(barzer_svc=barzer)
+        restored.step()
+        restored.root.restore(snapshot)
+        self.assertTrue(restored.root.facts['node.headache'].value.is_true())
+        self.assertEquals(
+            sorted(f.id for f in restored.root.index.active), sorted(f.id for f in cg.root.index.active))
+        self.assertTrue('flu' in restored.step('temperature 250')[1].text)
+        # the snapshot is a copy
+        self.assertFalse(cg.root.is_set())
+
+
+if __name__ == '__main__':
+    unittest.main()
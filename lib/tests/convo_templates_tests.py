@@ -0,0 +1,181 @@
+# pylint: disable=missing-docstring
+import gc
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import weakref
+from lib import convo_artifact, convo_fact
+from lib.convo_builder import FactPool
+from lib.convo_templates import TemplateStore
+from lib.tests.protocol_fixtures import composite, entity
+
+
+def graph(*terminals, **kwargs):
+    first = kwargs.get('first', 1)
+    facts = [entity(first), entity(first + 1)] + [
+        composite(t, 'AND', ['e{}'.format(first), 'e{}'.format(first + 1)]) for t in terminals]
+    return {'node_type': 'convo_protocol', 'node_id': 'protocol', 'data': {'facts': facts, 'terminals': list(terminals)}}
+
+
+class TemplateStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.store = TemplateStore(self.dir, interval=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, name, data, mtime):
+        path = os.path.join(self.dir, name + '.json')
+        with open(path, 'w') as fp:
+            json.dump(data, fp)
+        os.utime(path, (mtime, mtime))
+
+    @staticmethod
+    def entities(pool):
+        return sorted(dict(key)['id'] for key in pool.templates.keys())
+
+    def terminals(self, template):
+        return [t.id for t in template.graph['data'].terminals]
+
+    def test_versions(self):
+        now = time.time()
+        self.write('flu', graph('a'), now - 10)
+        self.assertEquals(self.store.names(), ['flu'])
+        self.assertEquals(self.store.current, {})
+
+        first = self.store.acquire('flu')
+        self.assertEquals((first.version, self.terminals(first)), (1, ['a']))
+        self.assertIs(self.store.get('flu'), first)
+        protocol = weakref.ref(first.graph['data'])
+
+        self.write('flu', graph('a', 'b'), now - 5)
+        second = self.store.acquire('flu')
+        self.assertEquals((second.version, self.terminals(second)), (2, ['a', 'b']))
+        self.assertEquals(self.store.stats(), {'current': {'flu': 2}, 'retired': [('flu', 1, 1)]})
+
+        # a version that does not compile keeps the last one
+        with open(os.path.join(self.dir, 'flu.json'), 'w') as fp:
+            fp.write('{')
+        self.assertIs(self.store.get('flu'), second)
+
+        # the last conversation on the first version frees it
+        self.store.release(first)
+        del first
+        gc.collect()
+        self.assertEquals(self.store.stats(), {'current': {'flu': 2}, 'retired': []})
+        self.assertIsNone(protocol())
+
+        os.remove(os.path.join(self.dir, 'flu.json'))
+        with self.assertRaises(KeyError):
+            self.store.get('flu')
+        self.assertEquals(self.store.stats(), {'current': {}, 'retired': [('flu', 2, 1)]})
+        with self.assertRaises(KeyError):
+            self.store.get('../flu')
+
+    def test_broken(self):
+        # a protocol that never compiled is not found, rather than an error
+        with open(os.path.join(self.dir, 'flu.json'), 'w') as fp:
+            fp.write('{')
+        with self.assertRaises(KeyError):
+            self.store.acquire('flu')
+        self.write('flu', graph('a'), time.time())
+        self.assertEquals(self.store.acquire('flu').sessions, 1)
+
+    def test_pool(self):
+        pool = FactPool()
+        store = TemplateStore(self.dir, pool=pool, interval=0)
+        now = time.time()
+        self.write('flu', graph('a'), now - 10)
+        self.write('cold', graph('a', first=2), now - 10)
+        first = store.acquire('flu')
+        store.get('cold')
+        self.assertEquals(self.entities(pool), ['e1', 'e2', 'e3'])
+        self.write('flu', graph('a', first=4), now - 5)
+        store.get('flu')
+        self.assertEquals(self.entities(pool), ['e1', 'e2', 'e3', 'e4', 'e5'])
+        # the entities of the first version go with its last conversation,
+        # but for those another protocol shares
+        store.release(first)
+        del first
+        gc.collect()
+        self.assertEquals(self.entities(pool), ['e2', 'e3', 'e4', 'e5'])
+
+    def test_compile_unlocked(self):
+        now = time.time()
+        self.write('flu', graph('a'), now - 10)
+        self.write('cold', graph('a'), now - 10)
+        self.store.get('cold')
+        self.store.get('flu')
+        self.write('flu', graph('a', 'b'), now - 5)
+        started, done = threading.Event(), threading.Event()
+        waited = []
+        load = self.store.load
+
+        def slow_load(name, signature):
+            if name == 'flu':
+                started.set()
+                waited.append(done.wait(5))
+            return load(name, signature)
+
+        self.store.load = slow_load
+        thread = threading.Thread(target=self.store.get, args=('flu',))
+        thread.start()
+        started.wait(5)
+        try:
+            # other protocols are served while flu compiles, and so is its
+            # current version
+            self.assertEquals(self.store.acquire('cold').sessions, 1)
+            self.assertEquals(self.store.get('flu').version, 1)
+        finally:
+            done.set()
+            thread.join()
+        self.assertEquals(waited, [True])
+        self.assertEquals(self.store.stats()['current'], {'cold': 1, 'flu': 2})
+
+    def test_artifact(self):
+        now = time.time()
+        self.write('flu', graph('a'), now - 10)
+        path = os.path.join(self.dir, 'flu' + convo_artifact.EXTENSION)
+        convo_artifact.write(path, dict(graph('b'), data=convo_fact.Protocol(graph('b')['data'])))
+        os.utime(path, (now - 5, now - 5))
+        self.assertEquals(self.terminals(self.store.get('flu')), ['b'])
+
+        # the json changed after the artifact was compiled
+        self.write('flu', graph('c'), now)
+        self.assertEquals(self.terminals(self.store.get('flu')), ['c'])
+
+    def test_broken_artifact(self):
+        now = time.time()
+        self.write('flu', graph('a'), now - 10)
+        path = os.path.join(self.dir, 'flu' + convo_artifact.EXTENSION)
+        convo_artifact.write(path, dict(graph('b'), data=convo_fact.Protocol(graph('b')['data'])))
+        with open(path, 'rb') as fp:
+            artifact = fp.read()
+        n_tables = convo_artifact.HEADER.unpack_from(artifact)[-1]
+        # truncated, then with tables that do not unmarshal: the json serves
+        for broken in [artifact[:len(artifact) // 2], artifact[:-n_tables] + 'x' * n_tables]:
+            with open(path, 'wb') as fp:
+                fp.write(broken)
+            os.utime(path, (now, now))
+            store = TemplateStore(self.dir, interval=0)
+            self.assertEquals(self.terminals(store.get('flu')), ['a'])
+
+    def test_interval(self):
+        store = TemplateStore(self.dir, interval=60)
+        now = time.time()
+        self.write('flu', graph('a'), now - 10)
+        first = store.get('flu')
+        self.write('flu', graph('b'), now)
+        self.assertIs(store.get('flu'), first)
+        store.checked['flu'] = 0
+        self.assertEquals(self.terminals(store.get('flu')), ['b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+# pylint: disable=missing-docstring, invalid-name
+import unittest
+import json
+import config
+from lib import calc_graph, convo_fact
+from lib.barzer.barzer_objects import LazyBeads
+from lib.barzer.barzer_svc import Barzer
+from lib.barzer.fast_path import FastPath
+from lib.barzer.parse_context import ParseContext
+from lib.barzer.stub_server import StubBarzerServer
+
+
+def make_yes_barz():
+    ent = dict(config.RulesSettings.YES_ENTITY, type='entity')
+    return {'beads': [ent]}
+
+
+class ParseContextTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = StubBarzerServer(responses={'yes': make_yes_barz()}).start()
+        self.barzer = Barzer(instances={'default': self.server.instance_config()})
+
+    def tearDown(self):
+        self.barzer.transport.close()
+        self.server.stop()
+
+    def test_one_parse_per_turn(self):
+        cg = calc_graph.CG()
+        cg.root = convo_fact.ConvoProtocol(
+            json.load(open('lib/tests/test2.json')), barzer_svc=self.barzer, fast_path=FastPath(enabled=False))
+        cg.step()
+        self.assertEquals(self.barzer.stats['remote_parses'], 0)
+        cg.step('220')
+        self.assertEquals(self.barzer.stats['remote_parses'], 1)
+        resp = cg.step('yes')
+        self.assertEquals(self.barzer.stats['remote_parses'], 2)
+        self.assertEquals(self.server.stats['requests'], 2)
+        self.assertTrue('flu' in resp[1].text)
+
+    def test_fast_path(self):
+        fast_path = FastPath.from_settings()
+        cg = calc_graph.CG()
+        cg.root = convo_fact.ConvoProtocol(
+            json.load(open('lib/tests/test2.json')), barzer_svc=self.barzer, fast_path=fast_path)
+        cg.step()
+        cg.step('220')
+        resp = cg.step('Yeah!')
+        self.assertTrue('flu' in resp[1].text)
+        self.assertEquals(self.barzer.stats['remote_parses'], 0)
+        self.assertEquals(fast_path.stats()['number']['hits'], 1)
+        self.assertEquals(fast_path.stats()['bool']['hits'], 1)
+
+    def test_fast_path_fallback(self):
+        fast_path = FastPath.from_settings()
+        cg = calc_graph.CG()
+        cg.root = convo_fact.ConvoProtocol(
+            json.load(open('lib/tests/test2.json')), barzer_svc=self.barzer, fast_path=fast_path)
+        cg.step()
+        cg.step('my temperature is 220')
+        self.assertEquals(self.barzer.stats['remote_parses'], 1)
+        self.assertEquals(fast_path.stats()['number'], {'hits': 0, 'misses': 1, 'hit_rate': 0.0})
+
+    def test_shared_beads(self):
+        cg = calc_graph.CG([
+            {'node_type': 'entity', 'data': {'class': 459, 'subclass': 3, 'id': 'HEADACHE', 'name': 'headache'}},
+        ])
+        cg.step()
+        ctx = ParseContext('heart ache', barzer_svc=self.barzer)
+        val, ret = cg.step(ctx)
+        self.assertFalse(val.is_set())
+        self.assertTrue(ret.beads is ctx.get_beads())
+        self.assertTrue(isinstance(ret.beads, LazyBeads))
+        self.assertEquals(self.barzer.stats['remote_parses'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+# pylint: disable=missing-docstring
+""" convo protocol json shared by the tests and the benchmarks in scripts/
+
+every entity is symptom `i` of class 459/9, named "symptom <i>" so that
+LocalBarzer recognizes "i have symptom 3". its entity id and fact id are
+`<key><i>` unless the fact id is given
+"""
+
+
+def symptom(i, key='e'):
+    return {'class': 459, 'subclass': 9, 'id': '{}{}'.format(key, i), 'name': 'symptom {}'.format(i)}
+
+
+def entity(i, key='e', node_id=None):
+    return {'node_type': 'entity', 'node_id': node_id or '{}{}'.format(key, i), 'data': symptom(i, key)}
+
+
+def copied(i, node_id):
+    """ a copy of entity(i) under another id, merged by convo_builder """
+    return entity(i, node_id=node_id)
+
+
+def composite(node_id, operator, facts, text=None):
+    return {'node_id': node_id, 'node_type': 'composite', 'operator': operator,
+            'facts': facts, 'text': text or node_id}
+
+
+def random_protocol(rnd, n_facts=8, n_composites=10):
+    """ random AND/OR composites over `n_facts` entities, the last 3 terminals """
+    facts = [entity(i) for i in xrange(n_facts)]
+    ids = [f['node_id'] for f in facts]
+    for i in xrange(n_composites):
+        node_id = 'c{}'.format(i)
+        facts.append(composite(node_id, rnd.choice(['AND', 'OR']), rnd.sample(ids, rnd.randint(1, 3))))
+        ids.append(node_id)
+    return {'facts': facts, 'terminals': ids[-3:]}
@@ -0,0 +1,56 @@
+""" burst of concurrent sessions sending the same answers: thread per session vs AsyncBarzer
+
+    PYTHONPATH=. python scripts/bench_barzer_async.py --sessions 200 --latency 0.05
+"""
+import argparse
+import sys
+import threading
+import time
+from lib.barzer.barzer_async import AsyncBarzer
+from lib.barzer.barzer_svc import Barzer
+from lib.barzer.stub_server import StubBarzerServer
+
+ANSWERS = ['yes', 'no', '220', 'Yes!', 'NO']
+
+
+def report(name, server, start, threads):
+    print >> sys.stderr, '{:8} {:8.3f}s upstream requests={} client threads={}'.format(
+        name, time.time() - start, server.stats['requests'], threads)
+
+
+def run_threads(barzer, sessions):
+    threads = [threading.Thread(target=barzer.get_json, args=(ANSWERS[i % len(ANSWERS)],)) for i in xrange(sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def run_async(barzer, sessions):
+    futures = [barzer.get_json(ANSWERS[i % len(ANSWERS)]) for i in xrange(sessions)]
+    for f in futures:
+        f.result()
+
+
+def main(args):
+    server = StubBarzerServer(latency=args.latency).start()
+    instances = {'default': server.instance_config()}
+
+    start = time.time()
+    run_threads(Barzer(instances=instances), args.sessions)
+    report('threads', server, start, args.sessions)
+
+    server.stats.clear()
+    barzer = AsyncBarzer(Barzer(instances=instances), workers=args.workers)
+    start = time.time()
+    run_async(barzer, args.sessions)
+    report('async', server, start, args.workers)
+    barzer.close()
+    server.stop()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.05)
+    main(parser.parse_args())
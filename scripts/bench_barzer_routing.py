@@ -0,0 +1,59 @@
+""" latency percentiles of a single barzer vs routed replicas vs routed + hedged
+
+    PYTHONPATH=. python scripts/bench_barzer_routing.py -n 1000 --tail-ratio 0.02 --tail-latency 0.2
+"""
+import argparse
+import sys
+import time
+from lib.barzer.barzer_router import BarzerRouter
+from lib.barzer.barzer_svc import Barzer
+from lib.barzer.parse_cache import ParseCache
+from lib.barzer.stub_server import StubBarzerServer
+
+
+def percentile(samples, p):
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100.0))]
+
+
+def run(name, barzer, n):
+    samples = []
+    for i in xrange(n):
+        start = time.time()
+        barzer.get_json('query {}'.format(i))
+        samples.append(time.time() - start)
+    samples.sort()
+    print >> sys.stderr, '{:8} p50={:7.1f}ms p95={:7.1f}ms p99={:7.1f}ms {}'.format(
+        name, *([1000 * percentile(samples, p) for p in (50, 95, 99)] + [dict(barzer.router.stats)]))
+
+
+def main(args):
+    servers = [
+        StubBarzerServer(
+            latency=args.primary_latency if i == 0 else args.latency,
+            tail_latency=args.tail_latency, tail_ratio=args.tail_ratio).start()
+        for i in range(args.replicas)]
+    instances = {'default': servers[0].instance_config()}
+    for i, server in enumerate(servers[1:]):
+        instances['replica{}'.format(i)] = dict(server.instance_config(), replica_of='default')
+
+    def make_barzer(instances, **settings):
+        return Barzer(instances=instances, cache=ParseCache(size=1), router=BarzerRouter(instances, settings=settings))
+
+    run('single', make_barzer({'default': instances['default']}), args.n)
+    run('routed', make_barzer(instances), args.n)
+    run('hedged', make_barzer(instances, hedge=True), args.n)
+
+    # let the losing hedged requests drain
+    time.sleep(args.tail_latency)
+    for server in servers:
+        server.stop()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', type=int, default=500)
+    parser.add_argument('--replicas', type=int, default=3)
+    parser.add_argument('--primary-latency', type=float, default=0.005, help='latency of the `default` instance')
+    parser.add_argument('--latency', type=float, default=0.001, help='latency of the replicas')
+    parser.add_argument('--tail-latency', type=float, default=0.2)
+    parser.add_argument('--tail-ratio', type=float, default=0.02)
+    main(parser.parse_args())
@@ -0,0 +1,43 @@
+""" compares per-query urllib connections against the pooled keep-alive transport
+
+    PYTHONPATH=. python scripts/bench_barzer_transport.py -n 500 --connect-latency 0.02
+"""
+import argparse
+import sys
+import time
+import urllib
+from lib.barzer.barzer_svc import Barzer
+from lib.barzer.barzer_transport import BarzerTransport
+from lib.barzer.stub_server import StubBarzerServer
+
+QUERIES = ['yes', 'no', '220', 'i have a headache', 'temperature 100']
+
+
+def run(name, fetch, server, n):
+    server.stats.clear()
+    start = time.time()
+    for i in xrange(n):
+        fetch(QUERIES[i % len(QUERIES)])
+    elapsed = time.time() - start
+    print >> sys.stderr, '{:8} {:5} queries {:8.3f}s {:8.3f}ms/query connections={}'.format(
+        name, n, elapsed, 1000 * elapsed / n, server.stats['connections'])
+
+
+def main(args):
+    server = StubBarzerServer(latency=args.latency, connect_latency=args.connect_latency).start()
+    instances = {'default': server.instance_config()}
+    barzer = Barzer(instances=instances, transport=BarzerTransport(instances, gzip=args.gzip))
+
+    run('urllib', lambda q: urllib.urlopen(barzer.get_url(q)).read(), server, args.n)
+    run('pooled', barzer.get_json, server, args.n)
+
+    barzer.transport.close()
+    server.stop()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', type=int, default=500, help='number of queries')
+    parser.add_argument('--latency', type=float, default=0.0, help='stub per request latency')
+    parser.add_argument('--connect-latency', type=float, default=0.02, help='stub per connection latency')
+    parser.add_argument('--gzip', action='store_true')
+    main(parser.parse_args())
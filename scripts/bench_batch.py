@@ -0,0 +1,84 @@
+""" simulated conversations: one by one through ConvoProtocol vs BatchConvo
+
+gives `-n` sessions of a synthetic protocol (`--facts` entity facts, four
+per AND terminal) random answers to a random half of the facts, then
+evaluates them. one by one means instantiating a conversation, filling the
+entity nodes, propagating and asking for the next question; batched means
+one BatchConvo over all sessions. terminal values are checked to agree
+
+    PYTHONPATH=. python scripts/bench_batch.py -n 10000 --facts 20 200
+"""
+import argparse
+import time
+import numpy as np
+from lib import convo_fact
+from lib.convo_batch import BatchConvo
+from lib.convo_state import TRI_STATE
+from synthetic_protocols import grouped_protocol
+
+
+def make_answers(protocol, sessions, rnd):
+    """ fact id -> answers, NaN where unanswered. yes/no facts are only answered yes """
+    answers = {}
+    for fact in protocol.order:
+        if isinstance(fact, convo_fact.EntityFact):
+            if fact.template.expression is not None:
+                col = rnd.uniform(0, 200, sessions)
+            else:
+                col = np.ones(sessions)
+            col[rnd.random_sample(sessions) < 0.5] = np.nan
+            answers[fact.id] = col
+    return answers
+
+
+def one_by_one(protocol, answers, sessions):
+    results = []
+    for i in xrange(sessions):
+        convo = protocol.instantiate()
+        for fact_id, col in answers.iteritems():
+            if not np.isnan(col[i]):
+                fact = convo.facts[fact_id]
+                fact.ent.set_val_and_compute(True if fact.ent.expression is None else float(col[i]))
+                fact.update(fact.ent.value, fact.ent.confidence)
+        convo.update_facts()
+        convo.current_child().leaf()
+        results.append([TRI_STATE[convo.facts[t.id].value.value] for t in protocol.terminals])
+    return np.array(results, dtype=np.int8)
+
+
+def batched(protocol, answers, sessions):
+    batch = BatchConvo(protocol, sessions)
+    for fact_id, col in answers.iteritems():
+        batch.answer(fact_id, col)
+    batch.evaluate()
+    batch.next_questions()
+    return batch.terminal_values()
+
+
+def main(args):
+    rnd = np.random.RandomState(args.seed)
+    for n_facts in args.facts:
+        protocol = convo_fact.Protocol(grouped_protocol(n_facts))
+        answers = make_answers(protocol, args.n, rnd)
+        sample = min(args.n, args.sample)
+
+        start = time.time()
+        by_objects = one_by_one(protocol, answers, sample)
+        objects_elapsed = time.time() - start
+
+        start = time.time()
+        by_batch = batched(protocol, answers, args.n)
+        batch_elapsed = time.time() - start
+
+        assert (by_batch[:sample] == by_objects).all()
+        objects_rate, batch_rate = sample / objects_elapsed, args.n / batch_elapsed
+        print '{:5} facts: one by one {:8.0f} sessions/s, batched {:10.0f} sessions/s ({:.0f}x)'.format(
+            n_facts, objects_rate, batch_rate, batch_rate / objects_rate)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', type=int, default=10000, help='sessions')
+    parser.add_argument('--facts', type=int, nargs='+', default=[20, 200])
+    parser.add_argument('--sample', type=int, default=1000, help='sessions stepped one by one')
+    parser.add_argument('--seed', type=int, default=1)
+    main(parser.parse_args())
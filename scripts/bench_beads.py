@@ -0,0 +1,111 @@
+""" bead decoding throughput and retained memory
+
+decodes `-n` barz responses with BeadFactory.make_beads_from_barz and keeps
+the beads alive, then reports responses/s, ent_id() calls/s and the
+resident memory growth. `--consumers` instead feeds long utterances to
+number/yes-no/string nodes, fully decoded vs lazily decoded beads
+
+    PYTHONPATH=. python scripts/bench_beads.py -n 100000
+    PYTHONPATH=. python scripts/bench_beads.py -n 10000 --consumers --length 200
+"""
+import argparse
+import gc
+import json
+import random
+import resource
+import time
+from lib import cg_ent_fact
+from lib.barzer import barzer_objects
+from synthetic_protocols import rss_kb
+
+ENTITIES = [
+    {'class': 459, 'subclass': 9, 'id': 'temperature', 'name': 'temperature', 'scope': 'pager', 'category': 'vital'},
+    {'class': 459, 'subclass': 9, 'id': 'pressure', 'name': 'blood pressure', 'scope': 'pager', 'category': 'vital'},
+    {'class': 459, 'subclass': 9, 'id': 'pulse', 'name': 'pulse', 'scope': 'pager', 'category': 'vital'},
+    {'class': 459, 'subclass': 3, 'id': 'HEADACHE', 'name': 'headache'},
+    {'class': 1, 'subclass': 105, 'id': 'YES', 'name': 'yes', 'scope': 'Generic', 'category': 'eng_convo'},
+    {'class': 1, 'subclass': 105, 'id': 'NO', 'name': 'no', 'scope': 'Generic', 'category': 'eng_convo'},
+]
+TOKENS = ['i', 'have', 'a', 'my', 'is', 'and', 'the', 'it', 'was', 'not', 'very', 'bad']
+
+
+def make_barz(rnd, length=None):
+    """ a short utterance: a few tokens, an entity or erc, maybe a number """
+    beads = []
+    for _ in range(length or rnd.randint(1, 6)):
+        kind = rnd.random()
+        if kind < 0.5:
+            tok = rnd.choice(TOKENS)
+            beads.append({'type': 'token', 'value': tok, 'src': tok})
+        elif kind < 0.65:
+            beads.append({'type': 'number', 'value': rnd.randint(50, 250)})
+        elif kind < 0.75:
+            beads.append({'type': 'punct', 'value': rnd.choice('.,!?')})
+        elif kind < 0.9:
+            beads.append(dict(rnd.choice(ENTITIES), type='entity', rel=0))
+        else:
+            num = rnd.randint(50, 250)
+            beads.append({
+                'type': 'erc', 'ent': rnd.choice(ENTITIES[:3]),
+                'range': {'type': 'range', 'rangetype': 'integer', 'lo': num, 'hi': num}})
+    return json.loads(json.dumps({'uid': 0, 'beads': beads}))
+
+
+def bench_consumers(args):
+    """ what CGEntityNode.analyze_beads costs per value type, eager vs lazy decoding """
+    rnd = random.Random(args.seed)
+    corpus = [make_barz(rnd, args.length) for _ in xrange(min(args.unique, args.n))]
+    responses = [corpus[i % len(corpus)] for i in xrange(args.n)]
+    consumers = [
+        ('number', dict(ENTITIES[0], expression={'op': '>', 'values': 200}, value_type={'type': 'number', 'lo': 50, 'hi': 350})),
+        ('bool', ENTITIES[3]),
+        ('string', dict(ENTITIES[3], value_type={'type': 'string'})),
+    ]
+    for name, data in consumers:
+        node = cg_ent_fact.CGEntityNode(data)
+        for mode, decode in (
+                ('eager', barzer_objects.BeadFactory.make_beads_from_barz),
+                ('lazy', barzer_objects.BeadFactory.make_lazy_beads)):
+            start = time.time()
+            for barz in responses:
+                node.activate()
+                node.analyze_beads(decode(barz))
+            elapsed = time.time() - start
+            print '{:7} {:6} {:8.0f} turns/s'.format(name, mode, args.n / elapsed)
+
+
+def main(args):
+    if args.consumers:
+        return bench_consumers(args)
+    rnd = random.Random(args.seed)
+    corpus = [make_barz(rnd) for _ in xrange(args.unique)]
+    responses = [corpus[i % len(corpus)] for i in xrange(args.n)]
+
+    gc.collect()
+    before = rss_kb()
+    start = time.time()
+    decoded = [barzer_objects.BeadFactory.make_beads_from_barz(barz) for barz in responses]
+    elapsed = time.time() - start
+    gc.collect()
+    grown = rss_kb() - before
+
+    entities = [b for beads in decoded for b in beads if isinstance(b, barzer_objects.EntityBase)]
+    start = time.time()
+    for _ in range(3):
+        for b in entities:
+            b.ent_id()
+    ent_elapsed = time.time() - start
+
+    n_beads = sum(len(x) for x in decoded)
+    print '{} responses {} beads: {:.0f} responses/s, {:.0f} ent_id/s, rss +{:.1f}MB ({:.0f} bytes/bead)'.format(
+        args.n, n_beads, args.n / elapsed, 3 * len(entities) / ent_elapsed if ent_elapsed else 0,
+        grown / 1024.0, grown * 1024.0 / n_beads if n_beads else 0)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', type=int, default=100000)
+    parser.add_argument('--unique', type=int, default=5000, help='distinct responses in the corpus')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--consumers', action='store_true', help='value type consumers, eager vs lazy')
+    parser.add_argument('--length', type=int, default=200, help='beads per utterance with --consumers')
+    main(parser.parse_args())
@@ -0,0 +1,51 @@
+""" deciding every terminal: AND/OR operators over fact nodes vs bitmasks
+
+sets random tri-state answers on the entity facts of a synthetic protocol
+(`--facts` facts, four per AND terminal) and decides all terminals, once
+with the operators' calc over the conversation's fact nodes and once with
+the compiled BitsetProgram over the known-true/known-false integers
+
+    PYTHONPATH=. python scripts/bench_bitset.py --facts 20 200 2000
+"""
+import argparse
+import random
+import sys
+import time
+from lib import convo_fact
+from synthetic_protocols import grouped_protocol
+
+
+def main(args):
+    rnd = random.Random(args.seed)
+    for n_facts in args.facts:
+        protocol = convo_fact.Protocol(grouped_protocol(n_facts))
+        convo = protocol.instantiate()
+        entities = [convo.facts[f.id] for f in protocol.order if isinstance(f, convo_fact.EntityFact)]
+        terminals = [convo.facts[t.id] for t in protocol.terminals]
+        states = []
+        for _ in xrange(args.states):
+            answers = [rnd.choice([True, False, None, None]) for _ in entities]
+            states.append(answers)
+
+        op_elapsed = bit_elapsed = 0.0
+        for answers in states:
+            for fact, answer in zip(entities, answers):
+                fact.value.set_val(answer)
+                convo.set_known(fact)
+            start = time.time()
+            by_ops = [t.op.calc(children=t.children).value for t in terminals]
+            op_elapsed += time.time() - start
+            start = time.time()
+            by_bits = protocol.bitset.decide(convo.known_true, convo.known_false)
+            bit_elapsed += time.time() - start
+            assert [t.ordinal for t, v in zip(terminals, by_ops) if v] == by_bits[0]
+        print >> sys.stderr, '{:6} facts {:5} terminals: operators {:8.1f}us, bitset {:8.1f}us per decision ({:.0f}x)'.format(
+            n_facts, len(terminals), 1e6 * op_elapsed / args.states, 1e6 * bit_elapsed / args.states,
+            op_elapsed / bit_elapsed)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--facts', type=int, nargs='+', default=[20, 200, 2000])
+    parser.add_argument('--states', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    main(parser.parse_args())
@@ -0,0 +1,47 @@
+""" protocol build time and memory for large protocols
+
+generates protocols the way big ones are written: every terminal spells out
+its own copies of the symptoms and of the sub-composites it uses (same
+entity, operator and children under a terminal specific node id), on top of
+a pool of `--distinct` symptoms and syndromes shared by name. reports, per
+size, the time to compile a Protocol, the resident memory it takes, and how
+many facts are left once identical ones are merged. each size runs in its
+own process so that freed memory of one does not hide the growth of the
+next
+
+    PYTHONPATH=. python scripts/bench_builder.py --facts 10000 50000 100000
+"""
+import argparse
+import gc
+import subprocess
+import sys
+import time
+from lib import convo_fact
+from synthetic_protocols import copied_protocol, rss_kb
+
+
+def run(args):
+    data = copied_protocol(args.n, args.distinct)
+    gc.collect()
+    before = rss_kb()
+    start = time.time()
+    protocol = convo_fact.Protocol(data)
+    elapsed = time.time() - start
+    gc.collect()
+    grown = rss_kb() - before
+    print '{:7} facts: {:8.2f}s build {:8.1f}MB {:7} compiled facts'.format(
+        len(data['facts']), elapsed, grown / 1024.0, len(protocol.order))
+
+
+def main(args):
+    if args.n:
+        return run(args)
+    for n in args.facts:
+        subprocess.check_call([sys.executable, __file__, '-n', str(n), '--distinct', str(args.distinct)])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--facts', type=int, nargs='+', default=[10000, 50000, 100000])
+    parser.add_argument('--distinct', type=int, default=1000, help='symptoms the terminals pick from')
+    parser.add_argument('-n', type=int, help=argparse.SUPPRESS)
+    main(parser.parse_args())
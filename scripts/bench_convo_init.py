@@ -0,0 +1,69 @@
+""" conversation init latency and resident bytes per session
+
+opens `-n` conversations over the same protocol and keeps them alive, then
+reports init latency and resident memory growth per session. `data` builds
+every conversation from the protocol json (what api.init_convo used to do),
+`template` instantiates a protocol compiled once and also times
+ConvoProtocol.snapshot. each mode runs in its own process so that freed
+memory of one does not hide the growth of the other
+
+    PYTHONPATH=. python scripts/bench_convo_init.py -n 10000
+    PYTHONPATH=. python scripts/bench_convo_init.py -n 2000 --facts 200
+"""
+import argparse
+import gc
+import json
+import subprocess
+import sys
+import time
+from lib import convo_fact
+from synthetic_protocols import grouped_protocol, rss_kb
+
+MODES = ('data', 'template')
+
+
+def load_protocol(args):
+    if args.facts:
+        return grouped_protocol(args.facts)
+    return json.load(open(args.protocol))['data']
+
+
+def run(args):
+    data = load_protocol(args)
+    if args.mode == 'template':
+        make = convo_fact.Protocol(data).instantiate
+    else:
+        make = lambda: convo_fact.ConvoProtocol(data)  # pylint: disable=unnecessary-lambda
+    make()
+    gc.collect()
+    before = rss_kb()
+    sessions = []
+    start = time.time()
+    for _ in xrange(args.n):
+        sessions.append(make())
+    elapsed = time.time() - start
+    gc.collect()
+    grown = rss_kb() - before
+    print >> sys.stderr, '{:8} {:8.1f}us/init {:8.0f} bytes/session'.format(
+        args.mode, 1e6 * elapsed / args.n, grown * 1024.0 / args.n)
+    if args.mode == 'template':
+        start = time.time()
+        snapshots = [s.snapshot() for s in sessions]
+        elapsed = time.time() - start
+        print >> sys.stderr, '{:8} {:8.1f}us/snapshot {:6} bytes/snapshot'.format(
+            '', 1e6 * elapsed / args.n, len(snapshots[0][0]))
+
+
+def main(args):
+    if args.mode:
+        return run(args)
+    for mode in MODES:
+        subprocess.check_call([sys.executable] + sys.argv + ['--mode', mode])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', type=int, default=10000, help='conversations to open')
+    parser.add_argument('--protocol', default='protocols/test2.json')
+    parser.add_argument('--facts', type=int, help='synthetic protocol of this many entity facts instead')
+    parser.add_argument('--mode', choices=MODES, help='run a single mode in this process')
+    main(parser.parse_args())
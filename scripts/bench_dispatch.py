@@ -0,0 +1,40 @@
+""" per turn cost of ConvoProtocol.step vs protocol size
+
+builds synthetic protocols of `--facts` entity facts (grouped four per AND
+terminal) and replays the same kind of turns against each, parsing with the
+local extractor so that only the graph is measured
+
+    PYTHONPATH=. python scripts/bench_dispatch.py --facts 20 200 2000
+"""
+import argparse
+import random
+import time
+from lib import calc_graph, convo_fact
+from lib.barzer.local_extractor import LocalBarzer
+from synthetic_protocols import grouped_protocol
+
+
+def main(args):
+    rnd = random.Random(args.seed)
+    for n_facts in args.facts:
+        data = grouped_protocol(n_facts)
+        barzer = LocalBarzer.from_protocols([data])
+        turns = [
+            rnd.choice(['i have symptom {0}', 'symptom {0} is 150', 'no', 'yes', 'maybe later']).format(
+                rnd.randrange(n_facts))
+            for _ in xrange(args.turns)]
+        cg = calc_graph.CG()
+        cg.root = convo_fact.ConvoProtocol(data, barzer_svc=barzer)
+        cg.step()
+        start = time.time()
+        for text in turns:
+            cg.step(text)
+        elapsed = time.time() - start
+        print '{:6} facts: {:8.3f}ms/turn'.format(n_facts, 1000 * elapsed / len(turns))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--facts', type=int, nargs='+', default=[20, 200, 2000])
+    parser.add_argument('--turns', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=1)
+    main(parser.parse_args())
@@ -0,0 +1,123 @@
+""" turns to a terminal, score heuristic vs information gain
+
+simulates conversations over the convo protocols of `protocols/*.json`
+(and `--synthetic` random AND/OR protocols with shared facts). every
+simulated user has a hidden value per entity, numbers uniform in the value
+type's range and yes/no true with a per entity probability, and answers
+each question with it, which resolves every fact of that entity. a
+conversation ends when a terminal is true or none can be. reports the
+average number of questions for
+
+    score       the facts' scores (ConvoProtocol's default)
+    gain        GainScheduler with uniform priors
+    gain+prior  GainScheduler with priors learned from `--train` sessions
+
+    PYTHONPATH=. python scripts/bench_gain.py --sessions 500 --synthetic 3
+"""
+import argparse
+import functools
+import glob
+import json
+import random
+import sys
+from lib import calc_graph, convo_fact
+from lib.convo_gain import FactPriors, GainScheduler
+from lib.tests.protocol_fixtures import entity
+
+
+def load_protocols(args, rnd):
+    protocols = []
+    for path in sorted(glob.glob(args.protocols)):
+        data = json.load(open(path))
+        if isinstance(data, dict) and data.get('node_type') == 'convo_protocol':
+            protocols.append((path, data['data']))
+    for i in xrange(args.synthetic):
+        protocols.append(('synthetic{}'.format(i), random_protocol(rnd, args.facts)))
+    return protocols
+
+
+def random_protocol(rnd, n_facts):
+    facts = [entity(i) for i in xrange(n_facts)]
+    ids = [f['node_id'] for f in facts]
+    terminals = []
+    for i in xrange(n_facts):
+        node_id = 'c{}'.format(i)
+        facts.append({'node_id': node_id, 'node_type': 'composite', 'operator': rnd.choice(['AND', 'AND', 'OR']),
+                      'facts': rnd.sample(ids, rnd.randint(2, 3)), 'text': node_id})
+        ids.append(node_id)
+        terminals.append(node_id)
+    return {'facts': facts, 'terminals': terminals[-n_facts // 2:]}
+
+
+def make_user(protocol, rnd, truth):
+    """ hidden entity values of one simulated user """
+    values = {}
+    for fact in protocol.order:
+        template = getattr(fact, 'template', None)
+        if template is None:
+            continue
+        ent_id = template.ent.ent_id()
+        if ent_id in values:
+            continue
+        value_type = template.value_type
+        if template.expression:
+            lo = value_type.lo if getattr(value_type, 'lo', None) is not None else 0
+            hi = value_type.hi if getattr(value_type, 'hi', None) is not None else 1000
+            values[ent_id] = rnd.uniform(lo, hi)
+        else:
+            values[ent_id] = rnd.random() < truth.setdefault(ent_id, rnd.uniform(0.05, 0.95))
+    return values
+
+
+def converse(protocol, user, scheduler=None):
+    """ number of questions asked until the conversation ends """
+    convo = protocol.instantiate(scheduler=scheduler)
+    turns = 0
+    while not convo.decided and convo.reachable:
+        fact = convo.next_fact()
+        if not isinstance(fact, convo_fact.ConvoEntityFact):
+            break
+        turns += 1
+        ent_id = fact.ent_id()
+        for f in convo.index.get(ent_id) | set([fact]):
+            value = user[ent_id]
+            if f.ent.expression:
+                value = f.ent.expression(value)
+            f.update(calc_graph.CGNodeValue(bool(value)), 1.0)
+        convo.update_facts()
+    return turns, convo
+
+
+def main(args):
+    rnd = random.Random(args.seed)
+    for name, data in load_protocols(args, rnd):
+        protocol = convo_fact.Protocol(data)
+        if protocol.analysis is None:
+            print >> sys.stderr, '{}: not an AND/OR protocol, skipped'.format(name)
+            continue
+        truth = {}
+        priors = FactPriors()
+        for _ in xrange(args.train):
+            _, convo = converse(protocol, make_user(protocol, rnd, truth))
+            priors.observe(convo)
+        users = [make_user(protocol, rnd, truth) for _ in xrange(args.sessions)]
+        modes = [
+            ('score', None),
+            ('gain', GainScheduler),
+            ('gain+prior', functools.partial(GainScheduler, priors=priors))]
+        results = []
+        for mode, scheduler in modes:
+            turns = sum(converse(protocol, user, scheduler)[0] for user in users)
+            results.append('{} {:6.2f}'.format(mode, float(turns) / len(users)))
+        print '{:24} {:5} facts: {} turns/session'.format(
+            name, len(protocol.order), '  '.join(results))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--protocols', default='protocols/*.json')
+    parser.add_argument('--synthetic', type=int, default=3, help='random AND/OR protocols to add')
+    parser.add_argument('--facts', type=int, default=30, help='entity facts per synthetic protocol')
+    parser.add_argument('--sessions', type=int, default=500)
+    parser.add_argument('--train', type=int, default=500, help='sessions the priors are learned from')
+    parser.add_argument('--seed', type=int, default=1)
+    main(parser.parse_args())
@@ -0,0 +1,60 @@
+""" per turn cost of fact propagation in deep protocols
+
+builds a chain of `--depth` AND composites, each over the previous one and
+a fresh yes/no entity fact, plus `--width` independent terminals of two
+facts, and answers the facts one per turn. reports ms/turn and how many
+facts were re-evaluated per turn
+
+    PYTHONPATH=. python scripts/bench_propagation.py --depth 10 100 1000 --width 1000
+"""
+import argparse
+import time
+from lib import calc_graph, convo_fact
+from lib.barzer.local_extractor import LocalBarzer
+from synthetic_protocols import node
+
+
+def make_protocol(depth, width):
+    facts = [node(0)]
+    for i in xrange(depth):
+        facts.append(node(i + 1))
+        facts.append({
+            'node_id': 'chain{}'.format(i), 'node_type': 'composite', 'operator': 'AND',
+            'facts': ['chain{}'.format(i - 1) if i else 'node.sym0', 'node.sym{}'.format(i + 1)],
+            'text': 'chain {}'.format(i)})
+    terminals = ['chain{}'.format(depth - 1)]
+    for i in xrange(width):
+        a, b = depth + 1 + 2 * i, depth + 2 + 2 * i
+        facts.extend([node(a), node(b)])
+        facts.append({
+            'node_id': 'terminal{}'.format(i), 'node_type': 'composite', 'operator': 'AND',
+            'facts': ['node.sym{}'.format(a), 'node.sym{}'.format(b)], 'text': 'diagnosis {}'.format(i)})
+        terminals.append('terminal{}'.format(i))
+    return {'facts': facts, 'terminals': terminals}
+
+
+def main(args):
+    for depth in args.depth:
+        data = make_protocol(depth, args.width)
+        barzer = LocalBarzer.from_protocols([data])
+        barzer.get_json('symptom')  # compiles the dictionary
+        cg = calc_graph.CG()
+        cg.root = convo_fact.ConvoProtocol(data, barzer_svc=barzer)
+        cg.step()
+        turns = ['i have symptom {}'.format(i) for i in xrange(depth, -1, -1)][:args.turns]
+        engine = getattr(cg.root, 'propagation', None)
+        evaluations = engine.evaluations if engine else 0
+        start = time.time()
+        for text in turns:
+            cg.step(text)
+        elapsed = time.time() - start
+        print 'depth {:5} width {:5}: {:8.3f}ms/turn {:8.1f} evaluations/turn'.format(
+            depth, args.width, 1000 * elapsed / len(turns),
+            float((engine.evaluations if engine else 0) - evaluations) / len(turns))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--depth', type=int, nargs='+', default=[10, 100, 500])
+    parser.add_argument('--width', type=int, default=1000, help='independent two fact terminals')
+    parser.add_argument('--turns', type=int, default=200)
+    main(parser.parse_args())
@@ -0,0 +1,65 @@
+""" per turn cost as a conversation progresses
+
+builds `--terminals` terminals of the form AND(OR(`--group` facts), fact)
+and replays turns that each mention `--mentions` random facts of the OR
+groups. once an OR is decided its facts are pruned from dispatch, so later
+turns analyze fewer facts. reports ms/turn for each quarter of the
+conversation and the facts pruned by its end
+
+    PYTHONPATH=. python scripts/bench_pruning.py --terminals 100 500
+"""
+import argparse
+import random
+import time
+from lib import calc_graph, convo_fact
+from lib.barzer.local_extractor import LocalBarzer
+from synthetic_protocols import node
+
+
+def make_protocol(n_terminals, group):
+    facts, terminals, symptoms = [], [], []
+    for t in xrange(n_terminals):
+        first = t * (group + 1)
+        members = range(first, first + group)
+        symptoms.extend(members)
+        facts.extend(node(i) for i in xrange(first, first + group + 1))
+        facts.append({
+            'node_id': 'any{}'.format(t), 'node_type': 'composite', 'operator': 'OR',
+            'facts': ['node.sym{}'.format(i) for i in members], 'text': 'any {}'.format(t)})
+        facts.append({
+            'node_id': 'terminal{}'.format(t), 'node_type': 'composite', 'operator': 'AND',
+            'facts': ['any{}'.format(t), 'node.sym{}'.format(first + group)], 'text': 'diagnosis {}'.format(t)})
+        terminals.append('terminal{}'.format(t))
+    return {'facts': facts, 'terminals': terminals}, symptoms
+
+
+def main(args):
+    rnd = random.Random(args.seed)
+    for n_terminals in args.terminals:
+        data, symptoms = make_protocol(n_terminals, args.group)
+        barzer = LocalBarzer.from_protocols([data])
+        barzer.get_json('symptom')  # compiles the dictionary
+        turns = ['i have ' + ', '.join('symptom {}'.format(i) for i in rnd.sample(symptoms, args.mentions))
+                 for _ in xrange(args.turns)]
+        cg = calc_graph.CG()
+        cg.root = convo_fact.ConvoProtocol(data, barzer_svc=barzer)
+        cg.step()
+        quarters = []
+        for q in xrange(4):
+            part = turns[q * len(turns) // 4:(q + 1) * len(turns) // 4]
+            start = time.time()
+            for text in part:
+                cg.step(text)
+            quarters.append(1000 * (time.time() - start) / len(part))
+        pruned = len(getattr(cg.root.index, 'pruned', ()))
+        print '{:5} terminals: {} ms/turn by quarter, {} of {} facts pruned'.format(
+            n_terminals, ' '.join('{:7.3f}'.format(ms) for ms in quarters), pruned, len(cg.root.facts))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--terminals', type=int, nargs='+', default=[100, 500])
+    parser.add_argument('--group', type=int, default=8, help='facts per OR')
+    parser.add_argument('--mentions', type=int, default=20, help='facts mentioned per turn')
+    parser.add_argument('--turns', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    main(parser.parse_args())
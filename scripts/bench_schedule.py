@@ -0,0 +1,66 @@
+""" next question selection in wide protocols
+
+builds `--terminals` AND terminals of `--group` facts each and answers them
+one fact per turn, then times ConvoProtocol.step (which re-scores and picks
+the next question) and a lookup of the next fact to ask on the settled
+conversation
+
+    PYTHONPATH=. python scripts/bench_schedule.py --terminals 100 1000 5000
+"""
+import argparse
+import random
+import time
+from lib import calc_graph, convo_fact
+from lib.barzer.local_extractor import LocalBarzer
+from synthetic_protocols import node
+
+
+def make_protocol(n_terminals, group):
+    facts, terminals = [], []
+    for t in xrange(n_terminals):
+        members = xrange(t * group, (t + 1) * group)
+        facts.extend(node(i) for i in members)
+        facts.append({
+            'node_id': 'terminal{}'.format(t), 'node_type': 'composite', 'operator': 'AND',
+            'facts': ['node.sym{}'.format(i) for i in members], 'text': 'diagnosis {}'.format(t)})
+        terminals.append('terminal{}'.format(t))
+    return {'facts': facts, 'terminals': terminals}
+
+
+def next_fact(root):
+    if hasattr(root, 'next_fact'):
+        return root.next_fact()
+    return root.current_child().leaf()
+
+
+def main(args):
+    rnd = random.Random(args.seed)
+    for n_terminals in args.terminals:
+        data = make_protocol(n_terminals, args.group)
+        barzer = LocalBarzer.from_protocols([data])
+        barzer.get_json('symptom')  # compiles the dictionary
+        # the last fact of every terminal stays unanswered
+        answered = [t * args.group + i for t in xrange(n_terminals) for i in xrange(args.group - 1)]
+        turns = ['i have symptom {}'.format(i) for i in rnd.sample(answered, min(args.turns, len(answered)))]
+        cg = calc_graph.CG()
+        cg.root = convo_fact.ConvoProtocol(data, barzer_svc=barzer)
+        cg.step()
+        start = time.time()
+        for text in turns:
+            cg.step(text)
+        elapsed = time.time() - start
+        start = time.time()
+        for _ in xrange(args.queries):
+            next_fact(cg.root)
+        queried = time.time() - start
+        print '{:5} terminals: {:8.3f}ms/turn {:8.2f}us/next fact'.format(
+            n_terminals, 1000 * elapsed / len(turns), 1e6 * queried / args.queries)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--terminals', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--group', type=int, default=4, help='facts per terminal')
+    parser.add_argument('--turns', type=int, default=300)
+    parser.add_argument('--queries', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=1)
+    main(parser.parse_args())
@@ -0,0 +1,71 @@
+""" server startup and first conversation latency, json vs compiled artifacts
+
+writes `--protocols` generated protocols (scripts/bench_builder.py) to a
+temporary directory, as json only and as json plus the artifacts of
+scripts/compile_protocols.py, then reports for each the time
+api.ZobotServer takes to start, the resident memory it grows by, and the
+latency of the first conversation over one protocol. each run is its own
+process
+
+    PYTHONPATH=. python scripts/bench_startup.py --protocols 10 100 1000
+"""
+import argparse
+import gc
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from synthetic_protocols import copied_protocol, rss_kb
+
+MODES = ('json', 'artifact')
+
+
+def run(args):
+    from api import ZobotServer
+    gc.collect()
+    before = rss_kb()
+    start = time.time()
+    server = ZobotServer(protocols_path=args.dir + '/')
+    startup = time.time() - start
+    gc.collect()
+    grown = rss_kb() - before
+    start = time.time()
+    server.init_convo('p0')
+    first = time.time() - start
+    print '{:5} protocols {:8}: {:8.3f}s startup {:8.1f}MB {:8.1f}ms first conversation'.format(
+        len(server.available_protocols()), args.mode, startup, grown / 1024.0, 1e3 * first)
+
+
+def main(args):
+    if args.mode:
+        return run(args)
+    here = os.path.dirname(os.path.abspath(__file__))
+    for n in args.protocols:
+        root = tempfile.mkdtemp()
+        try:
+            for i in xrange(n):
+                graph = {'node_type': 'convo_protocol', 'node_id': 'p{}'.format(i),
+                         'data': copied_protocol(args.facts, args.facts // 4, seed=i)}
+                with open(os.path.join(root, 'p{}.json'.format(i)), 'w') as fp:
+                    json.dump(graph, fp)
+            sources = [os.path.join(root, 'p{}.json'.format(i)) for i in xrange(n)]
+            subprocess.check_call([sys.executable, os.path.join(here, 'bench_startup.py'), '--mode', 'json',
+                                   '--dir', root])
+            with open(os.devnull, 'w') as devnull:
+                subprocess.check_call([sys.executable, os.path.join(here, 'compile_protocols.py')] + sources,
+                                      stderr=devnull)
+            subprocess.check_call([sys.executable, os.path.join(here, 'bench_startup.py'), '--mode', 'artifact',
+                                   '--dir', root])
+        finally:
+            shutil.rmtree(root)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--protocols', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--facts', type=int, default=200, help='facts per protocol')
+    parser.add_argument('--mode', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--dir', help=argparse.SUPPRESS)
+    main(parser.parse_args())
@@ -0,0 +1,39 @@
+""" compiles convo protocol json into the artifacts api.ZobotServer loads
+
+validates every protocol (convo_builder), merges its identical facts and
+writes `<name>.zpc` next to the json, or into `--out`. graphs that are not
+convo protocols are left to be loaded as json
+
+    PYTHONPATH=. python scripts/compile_protocols.py protocols/*.json
+"""
+import argparse
+import json
+import os
+import sys
+from lib import convo_artifact, convo_fact
+from lib.convo_builder import FactPool
+
+
+def main(args):
+    pool = FactPool()
+    failed = 0
+    for path in args.file:
+        name = os.path.splitext(os.path.basename(path))[0]
+        out = os.path.join(args.out or os.path.dirname(path), name + convo_artifact.EXTENSION)
+        try:
+            graph = json.load(open(path))
+            if not isinstance(graph, dict) or graph.get('node_type') != 'convo_protocol':
+                print >> sys.stderr, '{}: not a convo protocol, skipped'.format(path)
+                continue
+            convo_artifact.write(out, dict(graph, data=convo_fact.Protocol(graph['data'], pool=pool)))
+            print >> sys.stderr, '{} -> {} ({} bytes)'.format(path, out, os.path.getsize(out))
+        except Exception, e:  # pylint: disable=broad-except
+            failed += 1
+            print >> sys.stderr, '{}: {}'.format(path, e)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--out', help='directory of the artifacts, the one of the json by default')
+    parser.add_argument('file', nargs='+')
+    sys.exit(main(parser.parse_args()))
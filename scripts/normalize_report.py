@@ -0,0 +1,33 @@
+""" measures how many remote barzer parses query normalization saves on recorded traffic
+
+    PYTHONPATH=. python scripts/normalize_report.py traffic.txt [--top 20]
+
+traffic file - one user utterance per line
+"""
+import argparse
+import sys
+from lib.barzer.query_normalizer import QueryNormalizer
+
+
+def main(args):
+    normalizer = QueryNormalizer.from_settings()
+    raw = set()
+    for fn in args.file or [None]:
+        fp = open(fn) if fn else sys.stdin
+        for line in fp:
+            line = line.rstrip('\n')
+            raw.add(line)
+            normalizer.normalize(line)
+
+    stats = normalizer.stats()
+    saved = len(raw) - stats['normalized_keys']
+    print >> sys.stderr, 'queries: {} distinct raw: {} distinct normalized: {} remote parses saved: {} ({:.1f}%)'.format(
+        stats['queries'], len(raw), stats['normalized_keys'], saved, 100.0 * saved / len(raw) if raw else 0)
+    for key, variants, count in normalizer.collapse_report(top=args.top):
+        print '{}\t{}\t{}'.format(key, variants, count)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--top', type=int, default=20, help='number of most collapsed keys to print')
+    parser.add_argument('file', nargs='*')
+    main(parser.parse_args())
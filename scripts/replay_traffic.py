@@ -0,0 +1,76 @@
+""" replays recorded conversation traffic through api.ZobotServer
+
+traffic is json lines {"token": .., "protocol": .., "input": ..} in the order
+the turns happened. with --record barzer is queried and every remote parse
+is appended to the recording, with --replay parses are served from it
+(no network)
+
+    PYTHONPATH=. python scripts/replay_traffic.py traffic.jsonl --record day.bzrr
+    PYTHONPATH=. python scripts/replay_traffic.py traffic.jsonl --replay day.bzrr --latency recorded
+"""
+import argparse
+import json
+import sys
+import time
+from api import ZobotServer
+from lib.barzer.barzer_replay import ReplayStore, ResponseRecorder
+from lib.barzer.barzer_svc import Barzer
+from lib.barzer.parse_cache import ParseCache
+
+
+def percentile(samples, p):
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100.0))]
+
+
+def parse_latency(value):
+    return value if value in (None, 'recorded') else float(value)
+
+
+def main(args):
+    cache = ParseCache(size=args.cache_size) if args.cache_size else ParseCache(size=1)
+    if args.replay:
+        barzer = Barzer(cache=cache, replay=ReplayStore(args.replay, latency=parse_latency(args.latency)))
+    else:
+        barzer = Barzer(cache=cache, recorder=ResponseRecorder(args.record) if args.record else None)
+    server = ZobotServer(protocols_path=args.protocols, barzer_svc=barzer)
+
+    samples = []
+    errors = 0
+    start = time.time()
+    for line in open(args.traffic):
+        turn = json.loads(line)
+        token = turn['token']
+        if token not in server.conversations:
+            server.init_convo(turn['protocol'], token)
+        turn_start = time.time()
+        try:
+            server.say(token, turn.get('input', '').encode('utf-8'))
+        except Exception as ex:  # pylint: disable=broad-except
+            errors += 1
+            print >> sys.stderr, 'turn failed', token, ex
+        samples.append(time.time() - turn_start)
+    elapsed = time.time() - start
+
+    samples.sort()
+    print >> sys.stderr, '{} turns in {:.2f}s ({:.0f} turns/s) errors={}'.format(
+        len(samples), elapsed, len(samples) / elapsed if elapsed else 0, errors)
+    if samples:
+        print >> sys.stderr, 'turn p50={:.2f}ms p95={:.2f}ms p99={:.2f}ms'.format(
+            *[1000 * percentile(samples, p) for p in (50, 95, 99)])
+    print >> sys.stderr, 'barzer', dict(barzer.stats), 'cache', barzer.cache.stats()
+    if barzer.replay is not None:
+        print >> sys.stderr, 'replay', dict(barzer.replay.stats)
+    if barzer.recorder is not None:
+        print >> sys.stderr, 'recorded', barzer.recorder.count
+        barzer.recorder.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('traffic', help='json lines: token, protocol, input')
+    parser.add_argument('--protocols', default='protocols/')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--record', help='append remote parses to this recording')
+    group.add_argument('--replay', help='serve parses from this recording')
+    parser.add_argument('--latency', help='seconds per replayed parse or `recorded`')
+    parser.add_argument('--cache-size', type=int, default=0, help='parse cache size, 0 to measure every parse')
+    main(parser.parse_args())
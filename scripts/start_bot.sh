@@ -1,4 +1,5 @@
 #!/bin/bash
+PYTHONPATH=. python scripts/compile_protocols.py protocols/*.json
 python api.py &
 sleep 1
 python telegram_bot.py &
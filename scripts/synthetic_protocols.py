@@ -0,0 +1,75 @@
+""" synthetic protocols and measurements shared by the bench_*.py scripts
+
+the facts come from lib/tests/protocol_fixtures.py. the benchmarks import
+this module from their own directory, run them as
+
+    PYTHONPATH=. python scripts/bench_<name>.py
+"""
+import os
+import random
+from lib.tests.protocol_fixtures import entity, symptom
+
+
+def rss_kb():
+    with open('/proc/self/statm') as fp:
+        return int(fp.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+
+
+def node(i):
+    """ entity fact `node.sym<i>` over symptom `sym<i>` """
+    return entity(i, 'sym', 'node.sym{}'.format(i))
+
+
+def grouped_protocol(n_facts, group=4):
+    """ AND terminals over `group` facts each, every other fact a number
+    with an expression
+    """
+    facts, terminals = [], []
+    for i in xrange(n_facts):
+        fact = node(i)
+        if i % 2:
+            fact['data'].update(expression={'op': '>', 'values': 100},
+                                value_type={'type': 'number', 'lo': 0, 'hi': 1000})
+        facts.append(fact)
+    for i in xrange(0, n_facts, group):
+        node_id = 'terminal{}'.format(i // group)
+        facts.append({
+            'node_id': node_id, 'node_type': 'composite', 'operator': 'AND',
+            'facts': ['node.sym{}'.format(j) for j in xrange(i, min(i + group, n_facts))],
+            'text': 'diagnosis {}'.format(i // group)})
+        terminals.append(node_id)
+    return {'facts': facts, 'terminals': terminals}
+
+
+def copied_protocol(n_facts, distinct=1000, seed=1):
+    """ about `n_facts` facts, terminals of 2 syndromes and 2 symptoms, a
+    syndrome an AND/OR of 2 or 3 symptoms. every terminal spells out its own
+    copies of the symptoms and syndromes it uses, see bench_builder.py
+    """
+    rnd = random.Random(seed)
+    syndromes = [(rnd.choice(['AND', 'OR']), rnd.sample(xrange(distinct), rnd.randint(2, 3)))
+                 for _ in xrange(distinct // 2)]
+    facts, terminals = [], []
+    while len(facts) < n_facts:
+        t = len(terminals)
+        children = []
+
+        def copy(i):
+            data = symptom(i, 'sym')
+            if i % 3 == 0:
+                data.update(expression={'op': '>', 'values': 100}, value_type={'type': 'number', 'lo': 0, 'hi': 1000})
+            node_id = 't{}.sym{}.{}'.format(t, i, len(facts))
+            facts.append({'node_type': 'entity', 'node_id': node_id, 'data': data})
+            return node_id
+        for s in rnd.sample(xrange(len(syndromes)), 2):
+            operator, symptoms = syndromes[s]
+            node_id = 't{}.syn{}'.format(t, s)
+            facts.append({'node_type': 'composite', 'node_id': node_id, 'operator': operator,
+                          'facts': [copy(i) for i in symptoms], 'text': 'syndrome {}'.format(s)})
+            children.append(node_id)
+        children.extend(copy(i) for i in rnd.sample(xrange(distinct), 2))
+        node_id = 'diagnosis{}'.format(t)
+        facts.append({'node_type': 'composite', 'node_id': node_id, 'operator': 'AND',
+                      'facts': children, 'text': 'diagnosis {}'.format(t)})
+        terminals.append(node_id)
+    return {'facts': facts, 'terminals': terminals}